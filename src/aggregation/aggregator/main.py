@@ -1,10 +1,19 @@
 import base64
+import concurrent.futures
 
 import google.cloud.firestore as firestore
 
 import covisearch.aggregation.core.infra as infra
 from covisearch.aggregation.core.domain import entities
 import covisearch.aggregation.core.domain as domain
+import covisearch.util.websitedatascraper as webdatascraper
+import covisearch.util.httpcache as httpcache
+import covisearch.util.contentcache as contentcache
+import covisearch.util.hostlimits as hostlimits
+import covisearch.util.circuitbreaker as circuitbreaker
+import covisearch.util.latencystats as latencystats
+import covisearch.util.hedging as hedging
+import covisearch.util.twitterhack as twitterhack
 
 
 # Keep this global as global vars are not reinitialized if same Cloud Function instance
@@ -16,6 +25,36 @@ db = firestore.Client()
 dummy_datetime_for_performance = \
     domain.resourcemapping._map_isoformat_timestamp_to_covisearch('2021-05-10T13:22:16.075259')
 
+# NOTE: Global for same reason as 'db'. Responses cached here are revalidated with conditional
+# requests by the next resync of a warm instance instead of being downloaded and parsed again.
+# Sources ignoring conditional requests but returning same body skip parsing and mapping using
+# content fingerprint caches.
+# Deadline keeps one hung source from stalling a whole message past the function's timeout.
+# Host limits learned from 429s, 5xx and latency of a host carry over to next resync too.
+# So do latencies of hosts, by which slow hosts are requested first and requests slower than
+# their host's p90 are hedged.
+SCRAPING_DEADLINE_SEC = 45
+# NOTE: Worker processes to parse and map responses on while other sources are still being
+# fetched. Useful only if function is deployed with more than one vCPU. 'None' parses and
+# maps on the aggregating thread.
+PARSE_WORKER_PROCESSES = None
+parse_executor = concurrent.futures.ProcessPoolExecutor(PARSE_WORKER_PROCESSES) \
+    if PARSE_WORKER_PROCESSES else None
+scraping_options = webdatascraper.ScrapingOptions(response_cache=httpcache.InMemoryResponseCacheStore(),
+                                                  parsed_data_cache=contentcache.ContentFingerprintCache(),
+                                                  deadline_sec=SCRAPING_DEADLINE_SEC,
+                                                  parse_executor=parse_executor,
+                                                  host_limiters=hostlimits.HostLimiterRegistry(),
+                                                  latency_stats=latencystats.LatencyStatsRegistry(),
+                                                  request_hedging=hedging.RequestHedging())
+webdatascraper.set_default_scraping_options(scraping_options)
+domain.set_mapped_resources_cache(contentcache.ContentFingerprintCache())
+# NOTE: Sources failing most of their last requests are skipped for a while, then probed again.
+domain.set_web_src_circuit_breakers(circuitbreaker.CircuitBreakerRegistry())
+# NOTE: Activates Twitter guest token while instance starts, so first scrape of Twitter sources
+# does not wait for it.
+twitterhack.get_guest_token_manager().start_background_refresh()
+
 
 # Starting point called by Google Cloud Function
 # Do init and call corresponding domain function
@@ -26,19 +65,17 @@ def aggregate_covid_resources(event, context):
     search_filters_str: str = base64.b64decode(event['data']).decode('utf-8')
     print('Search filters to aggregate: \'' + search_filters_str + '\'...')
 
-    search_filters_list = search_filters_str.split(',')
-
-    for search_filter_str in search_filters_list:
-        try:
-            print('Aggregating covid resources for filter \'' + search_filter_str + '\'...')
-
-            search_filter = entities.SearchFilter.create_from_url_query_string_fmt(search_filter_str)
-            domain.aggregate_covid_resources(search_filter, aggregated_res_info_repo, web_src_repo)
+    search_filters = [entities.SearchFilter.create_from_url_query_string_fmt(search_filter_str)
+                      for search_filter_str in search_filters_str.split(',')]
 
-            print('Aggregated covid resources successfully for filter \'' + search_filter_str + '\'')
-        except Exception:
-            print('Exception while aggregating covid resources for filter \'' + search_filter_str + '\'')
-            raise
+    # NOTE: All filters are scraped in one shared wave. A failed filter does not stop others, but
+    # message still fails so that it is retried.
+    failed_search_filters = domain.aggregate_covid_resources_batch(
+        search_filters, aggregated_res_info_repo, web_src_repo, scraping_options)
+    if failed_search_filters:
+        failed_search_filters_str = ','.join(
+            search_filter.to_url_query_string_fmt() for search_filter in failed_search_filters)
+        raise RuntimeError('Failed to aggregate covid resources for filters \'' + failed_search_filters_str + '\'')
 
     print('Search filters aggregated successfully: \'' + search_filters_str + '\'...')
 
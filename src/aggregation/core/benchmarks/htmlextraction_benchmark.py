@@ -0,0 +1,35 @@
+import timeit
+
+import covisearch.util.websitedatascraper as webdatascraper
+from benchmarks import samples
+
+
+# NOTE: Per-response time to extract table columns from sample HTML payloads, excluding HTML
+# parsing:
+# -'Per column': Row selector is evaluated from document root for every column through Scrapy.
+# -'Row-oriented': Row selector is evaluated once and compiled column XPaths are run per row.
+# Run from 'core' dir: python -m benchmarks.htmlextraction_benchmark
+REPEAT = 5
+NUMBER = 20
+
+
+def main():
+    print('{:<20}{:>18}{:>18}'.format('Sample', 'Per column (ms)', 'Row-oriented (ms)'))
+    for sample in samples.HTML_SAMPLES:
+        selectors = list(sample.table_column_selectors.values())
+        selector_parser = webdatascraper.HTMLSelectorParser(sample.content)
+
+        per_column_ms = _best_time_per_call_ms(
+            lambda: [selector_parser.get_all_vals_matching_selector(selector) for selector in selectors])
+        row_oriented_ms = _best_time_per_call_ms(
+            lambda: selector_parser.get_all_vals_matching_selectors(selectors))
+
+        print('{:<20}{:>18.3f}{:>18.3f}'.format(sample.name, per_column_ms, row_oriented_ms))
+
+
+def _best_time_per_call_ms(func) -> float:
+    return min(timeit.repeat(func, repeat=REPEAT, number=NUMBER)) / NUMBER * 1000
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import timeit
+
+import covisearch.util.websitedatascraper as webdatascraper
+from covisearch.util.mytypes import ContentType
+from benchmarks import samples
+
+
+# NOTE: Per-response time to extract table columns from sample JSON payloads:
+# -'jsonpath_ng': Compiled JSONPath cache is cleared before every response, which is same as
+# calling 'jsonpath_ng.parse()' once per parent selector per response.
+# -'Compiled': Process-wide compiled JSONPath cache is warm.
+# -'Fast path': Simple selectors are walked directly without jsonpath_ng.
+# Run from 'core' dir: python -m benchmarks.jsonextraction_benchmark
+REPEAT = 5
+NUMBER = 50
+
+
+def main():
+    print('{:<20}{:>16}{:>16}{:>16}'.format('Sample', 'jsonpath_ng (ms)', 'Compiled (ms)', 'Fast path (ms)'))
+    for sample in samples.JSON_SAMPLES:
+        scraping_params = _create_scraping_params(sample)
+        content = sample.content
+
+        def scrape_uncompiled():
+            webdatascraper.compile_jsonpath.cache_clear()
+            webdatascraper.scrape_data_from_response(content, scraping_params)
+
+        def scrape():
+            webdatascraper.scrape_data_from_response(content, scraping_params)
+
+        find_simple_jsonpath_matches = webdatascraper.find_simple_jsonpath_matches
+        webdatascraper.find_simple_jsonpath_matches = lambda jsonpath, json_content: None
+        try:
+            uncompiled_ms = _best_time_per_call_ms(scrape_uncompiled)
+            scrape()
+            compiled_ms = _best_time_per_call_ms(scrape)
+        finally:
+            webdatascraper.find_simple_jsonpath_matches = find_simple_jsonpath_matches
+        fast_path_ms = _best_time_per_call_ms(scrape)
+
+        print('{:<20}{:>16.3f}{:>16.3f}{:>16.3f}'.format(sample.name, uncompiled_ms, compiled_ms, fast_path_ms))
+
+
+def _create_scraping_params(sample: samples.ResponseSample) -> webdatascraper.DataScrapingParams:
+    return webdatascraper.DataScrapingParams(
+        'https://' + sample.name.replace(' ', '').lower() + '.benchmark', ContentType.JSON, None, {},
+        sample.content_type, sample.table_column_selectors, {}, {})
+
+
+def _best_time_per_call_ms(func) -> float:
+    return min(timeit.repeat(func, repeat=REPEAT, number=NUMBER)) / NUMBER * 1000
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+from typing import Dict, List
+import json
+import os
+import re
+
+from covisearch.util.mytypes import ContentType
+
+
+# NOTE: Samples in 'web source response samples' are trimmed by hand and some of them are not
+# strictly valid JSON anymore (trailing commas, extra closing brackets). Benchmarks only need
+# realistic payloads, so such samples are repaired here and re-serialized.
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'web source response samples')
+
+
+class ResponseSample:
+    def __init__(self, name: str, content_type: ContentType, table_column_selectors: Dict[str, str]):
+        self._name: str = name
+        self._content_type: ContentType = content_type
+        self._table_column_selectors: Dict[str, str] = table_column_selectors
+        self._content: str = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def content_type(self) -> ContentType:
+        return self._content_type
+
+    @property
+    def table_column_selectors(self) -> Dict[str, str]:
+        return self._table_column_selectors
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = load_sample_content(self._name, self._content_type)
+        return self._content
+
+
+JSON_SAMPLES: List[ResponseSample] = [
+    ResponseSample('Covid Citizens', ContentType.JSON, {
+        'name': 'data[*].name', 'phone': 'data[*].cleaned_phone', 'location': 'data[*].location',
+        'category': 'data[*].category', 'in_stock': 'data[*].in_stock', 'updated': 'data[*].updatedAt'}),
+    ResponseSample('Covid Win', ContentType.JSON, {
+        'name': 'data[*].name', 'phone': 'data[*].phone', 'details': 'data[*].details',
+        'city': 'data[*].city', 'availability': 'data[*].availability',
+        'last_verified': 'data[*].last_verified_at'}),
+    ResponseSample('Cowin Map Meals', ContentType.JSON, {
+        'name': '[*].0', 'address': '[*].1', 'phone': '[*].4', 'available': '[*].6',
+        'details': '[*].7', 'city': '[*].8'}),
+    ResponseSample('Cowin Map Oxygen', ContentType.JSON, {
+        'name': '[*].0', 'address': '[*].1', 'available': '[*].9', 'last_verified': '[*].10',
+        'phone': '[*].11'}),
+    ResponseSample('LifeResources', ContentType.JSON, {
+        'title': 'data[*].title', 'phone': 'data[*].phone_1', 'district': 'data[*].district',
+        'state': 'data[*].state', 'category': 'data[*].category', 'resource': 'data[*].Resource'}),
+]
+
+_INDIA_MART_ROW_SELECTOR = '//*[@data-glid]'
+
+HTML_SAMPLES: List[ResponseSample] = [
+    ResponseSample('India Mart', ContentType.HTML, {
+        'name': _INDIA_MART_ROW_SELECTOR + "||.//*[contains(@class, 'lcname')]/a/text()",
+        'phone': _INDIA_MART_ROW_SELECTOR + "||normalize-space(.//span[contains(@class, 'pns_h')])",
+        'location': _INDIA_MART_ROW_SELECTOR + '||@data-location',
+        'state': _INDIA_MART_ROW_SELECTOR + '||@data-state',
+        'product': _INDIA_MART_ROW_SELECTOR + "||.//span[contains(@class, 'mListNme')]//text()"}),
+]
+
+
+def load_sample_content(name: str, content_type: ContentType) -> str:
+    with open(os.path.join(SAMPLES_DIR, name + '.txt'), encoding='utf-8-sig') as sample_file:
+        content = sample_file.read()
+
+    if content_type is ContentType.JSON:
+        return json.dumps(_load_trimmed_json(content))
+    return content
+
+
+def _load_trimmed_json(content: str):
+    content = re.sub(r',(\s*[\]}])', r'\1', content)
+    # NOTE: raw_decode() stops after first complete JSON value and ignores extra closing brackets.
+    json_val, _ = json.JSONDecoder().raw_decode(content.strip())
+    return json_val
@@ -0,0 +1,116 @@
+from typing import List
+import argparse
+import math
+import resource
+import time
+import timeit
+
+import covisearch.util.websitedatascraper as webdatascraper
+import covisearch.util.httpsessions as httpsessions
+from benchmarks import samples
+from benchmarks.stubserver import StubSourceServer
+
+
+# NOTE: End to end scraping throughput against a local stub server serving sample payloads.
+# Scrapes N sources x M filters, i.e. N x M distinct requests, with each fetch engine and reports:
+# -Requests/s: Requests completed per second of wall time of whole scraping call.
+# -p50/p95/p99: Request latency of sources, as recorded in ScrapingReport.
+# -Parse ms/KB: Time to parse and extract table rows from sample payloads, per KB of payload.
+# -Peak RSS: Max resident memory of benchmark process so far. It never goes down, so run one
+# engine per process with '--engine' to compare engines' memory.
+# Run from 'core' dir: python -m benchmarks.scraping_benchmark --sources 20 --filters 10 --latency-ms 200
+PARSE_REPEAT = 5
+PARSE_NUMBER = 10
+ENGINES = {
+    'thread_pool': webdatascraper.FetchEngine.THREAD_POOL,
+    'asyncio': webdatascraper.FetchEngine.ASYNCIO,
+}
+
+
+def main():
+    args = _parse_args()
+    response_samples = samples.JSON_SAMPLES + samples.HTML_SAMPLES
+    engine_names = list(ENGINES.keys()) if args.engine == 'all' else [args.engine]
+
+    print('Parse ms/KB: {:.3f}'.format(_get_parse_ms_per_kb(response_samples)))
+    print('{:<14}{:>10}{:>12}{:>10}{:>10}{:>10}{:>10}{:>14}'.format(
+        'Engine', 'Requests', 'Requests/s', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Failed', 'Peak RSS (MB)'))
+
+    with StubSourceServer(response_samples, args.latency_ms / 1000, args.jitter_ms / 1000) as stub_server:
+        data_scraping_params = _create_scraping_params(stub_server, response_samples, args.sources, args.filters)
+        for engine_name in engine_names:
+            scraping_options = webdatascraper.ScrapingOptions(ENGINES[engine_name], args.max_concurrency)
+            for _ in range(args.repeat):
+                _run_scraping(engine_name, data_scraping_params, scraping_options)
+
+    httpsessions.close_all_sessions()
+
+
+def _parse_args():
+    arg_parser = argparse.ArgumentParser(description='Scraper throughput against a local stub server.')
+    arg_parser.add_argument('--sources', type=int, default=12, help='Sources, cycled over sample payloads.')
+    arg_parser.add_argument('--filters', type=int, default=5, help='Filters scraped per source.')
+    arg_parser.add_argument('--latency-ms', type=float, default=100.0, help='Artificial latency per request.')
+    arg_parser.add_argument('--jitter-ms', type=float, default=50.0, help='Max +/- jitter of latency.')
+    arg_parser.add_argument('--engine', choices=['all'] + list(ENGINES.keys()), default='all')
+    arg_parser.add_argument('--max-concurrency', type=int, default=None, help='Default is engine\'s default.')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Scraping calls per engine.')
+    return arg_parser.parse_args()
+
+
+def _create_scraping_params(stub_server: StubSourceServer, response_samples: List[samples.ResponseSample],
+                            source_count: int, filter_count: int) -> List[webdatascraper.DataScrapingParams]:
+    data_scraping_params = []
+    for source_idx in range(source_count):
+        sample = response_samples[source_idx % len(response_samples)]
+        for filter_idx in range(filter_count):
+            data_scraping_params.append(webdatascraper.DataScrapingParams(
+                stub_server.get_url(sample.name, 'source={}&filter={}'.format(source_idx, filter_idx)),
+                None, None, {}, sample.content_type, sample.table_column_selectors, {}, {}))
+    return data_scraping_params
+
+
+def _run_scraping(engine_name: str, data_scraping_params: List[webdatascraper.DataScrapingParams],
+                  scraping_options: webdatascraper.ScrapingOptions):
+    start_time = time.monotonic()
+    _, scraping_report = webdatascraper.scrape_data_from_websites_with_report(data_scraping_params, scraping_options)
+    elapsed_sec = time.monotonic() - start_time
+
+    latencies_ms = sorted(elapsed_sec * 1000 for elapsed_sec in scraping_report.elapsed_sec_by_url.values())
+    failed_count = len(scraping_report.failed_urls) + len(scraping_report.timed_out_urls) + \
+        len(scraping_report.cut_off_urls)
+    print('{:<14}{:>10}{:>12.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10}{:>14.1f}'.format(
+        engine_name, len(data_scraping_params), len(latencies_ms) / elapsed_sec,
+        _get_percentile(latencies_ms, 50), _get_percentile(latencies_ms, 95), _get_percentile(latencies_ms, 99),
+        failed_count, _get_peak_rss_mb()))
+
+
+def _get_parse_ms_per_kb(response_samples: List[samples.ResponseSample]) -> float:
+    total_parse_ms = 0.0
+    total_kb = 0.0
+    for sample in response_samples:
+        scraping_params = webdatascraper.DataScrapingParams(
+            'http://stub/' + sample.name, None, None, {}, sample.content_type, sample.table_column_selectors, {}, {})
+        content = sample.content
+        total_parse_ms += min(timeit.repeat(
+            lambda: webdatascraper.scrape_data_from_response(content, scraping_params),
+            repeat=PARSE_REPEAT, number=PARSE_NUMBER)) / PARSE_NUMBER * 1000
+        total_kb += len(content.encode('utf-8')) / 1024
+    return total_parse_ms / total_kb
+
+
+# NOTE: Nearest-rank percentile of sorted values.
+def _get_percentile(sorted_vals: List[float], percentile: float) -> float:
+    if not sorted_vals:
+        return math.nan
+    rank = max(1, int(math.ceil(percentile / 100 * len(sorted_vals))))
+    return sorted_vals[rank - 1]
+
+
+# NOTE: 'ru_maxrss' is in KB on Linux.
+def _get_peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    main()
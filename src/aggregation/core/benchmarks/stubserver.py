@@ -0,0 +1,89 @@
+from typing import Dict, List
+import http.server
+import random
+import threading
+import time
+import urllib.parse
+
+from covisearch.util.mytypes import ContentType
+from benchmarks import samples
+
+
+# NOTE: Local HTTP server serving sample payloads as web sources, with artificial latency.
+# Each request sleeps 'latency_sec' +/- up to 'jitter_sec' before responding, so fetch engines
+# can be compared under realistic source latency without network noise.
+# Path is sample name, eg: '/Covid%20Win?source=3&filter=1'. Query is ignored by server and
+# only makes each source/filter a distinct request.
+class StubSourceServer:
+    # NOTE: Default listen backlog of 5 resets connections when hundreds of requests arrive at once.
+    REQUEST_QUEUE_SIZE = 1024
+
+    def __init__(self, response_samples: List[samples.ResponseSample], latency_sec: float = 0.0,
+                 jitter_sec: float = 0.0):
+        self._contents_by_path: Dict[str, bytes] = {
+            '/' + urllib.parse.quote(sample.name): sample.content.encode('utf-8') for sample in response_samples}
+        self._content_types_by_path: Dict[str, str] = {
+            '/' + urllib.parse.quote(sample.name): self._get_http_content_type(sample.content_type)
+            for sample in response_samples}
+        self._latency_sec: float = latency_sec
+        self._jitter_sec: float = jitter_sec
+        self._server: http.server.ThreadingHTTPServer = None
+        self._server_thread: threading.Thread = None
+
+    def __enter__(self) -> 'StubSourceServer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        server_class = type('_StubHTTPServer', (http.server.ThreadingHTTPServer,),
+                            {'request_queue_size': self.REQUEST_QUEUE_SIZE, 'daemon_threads': True})
+        self._server = server_class(('127.0.0.1', 0), self._create_request_handler_class())
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def get_url(self, sample_name: str, query: str = '') -> str:
+        url = 'http://127.0.0.1:' + str(self._server.server_address[1]) + '/' + urllib.parse.quote(sample_name)
+        return url + '?' + query if query else url
+
+    def _get_delay_sec(self) -> float:
+        return max(0.0, self._latency_sec + random.uniform(-self._jitter_sec, self._jitter_sec))
+
+    def _create_request_handler_class(self):
+        stub_server = self
+
+        class _StubRequestHandler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                time.sleep(stub_server._get_delay_sec())
+                if path not in stub_server._contents_by_path:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                body = stub_server._contents_by_path[path]
+                self.send_response(200)
+                self.send_header('Content-Type', stub_server._content_types_by_path[path])
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return _StubRequestHandler
+
+    @staticmethod
+    def _get_http_content_type(content_type: ContentType) -> str:
+        if content_type is ContentType.HTML:
+            return 'text/html; charset=utf-8'
+        return 'application/json; charset=utf-8'
@@ -1,5 +1,7 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import functools
+import json
+import traceback
 
 import covisearch.aggregation.core.domain.entities as entities
 from covisearch.aggregation.core.domain.entities import \
@@ -11,20 +13,132 @@ import covisearch.util.websitedatascraper as webdatascraper
 import covisearch.util.elapsedtime as elapsedtime
 import covisearch.util.mytypes as mytypes
 import covisearch.util.geoutil as geoutil
+import covisearch.util.contentcache as contentcache
+import covisearch.util.circuitbreaker as circuitbreaker
 
 
 MAX_RESOURCES_STORAGE_LIMIT = 300
+# NOTE: Filters with fewer resources than this from primary city also get synonym cities' resources.
+MIN_RESOURCES_WITHOUT_SYNONYM_CITIES = 20
+
+# NOTE: Mapped resources cached across aggregations by fingerprint of scraped content.
+# 'None' disables caching. Set once by entry point, like scraping options of 'webdatascraper'.
+_mapped_resources_cache: contentcache.ContentFingerprintCache = None
+
+
+# NOTE: Health of web sources, keyed by source name. Sources whose breaker is open are not
+# requested, so dead sources stop adding their timeout to every aggregation.
+# 'None' requests all sources always.
+_web_src_circuit_breakers: circuitbreaker.CircuitBreakerRegistry = None
+
+
+def set_mapped_resources_cache(mapped_resources_cache: contentcache.ContentFingerprintCache):
+    global _mapped_resources_cache
+    _mapped_resources_cache = mapped_resources_cache
+
+
+def set_web_src_circuit_breakers(web_src_circuit_breakers: circuitbreaker.CircuitBreakerRegistry):
+    global _web_src_circuit_breakers
+    _web_src_circuit_breakers = web_src_circuit_breakers
 
 
 def aggregate_covid_resources(
         search_filter: SearchFilter, resource_info_repo: AggregatedResourceInfoRepo,
-        web_src_repo: resourcemapping.WebSourceRepo):
+        web_src_repo: resourcemapping.WebSourceRepo, scraping_options: webdatascraper.ScrapingOptions = None):
+
+    filter_aggregation = _FilterAggregation(search_filter, _get_web_sources_for_filter(search_filter, web_src_repo))
+    _collect_resources_from_covid_sources([filter_aggregation], scraping_options)
+    _store_aggregated_resources(filter_aggregation, resource_info_repo)
+
+
+# NOTE: Aggregates all filters, eg: of a resync message, with one shared scraping wave instead of
+# one wave per filter. So wall-clock time approaches that of slowest source rather than sum of
+# all filters' waves. Each filter's resources are still merged and written separately.
+# Failure of a filter does not stop others. Returns filters which failed.
+# 'scraping_options' are passed to scraper. 'None' uses scraper's default options, without
+# mapping in its parse executor.
+def aggregate_covid_resources_batch(
+        search_filters: List[SearchFilter], resource_info_repo: AggregatedResourceInfoRepo,
+        web_src_repo: resourcemapping.WebSourceRepo,
+        scraping_options: webdatascraper.ScrapingOptions = None) -> List[SearchFilter]:
+
+    failed_search_filters = []
+    filter_aggregations = []
+    for search_filter in search_filters:
+        try:
+            filter_aggregations.append(
+                _FilterAggregation(search_filter, _get_web_sources_for_filter(search_filter, web_src_repo)))
+        except Exception:
+            print('Exception while fetching web sources for filter \'' +
+                  search_filter.to_url_query_string_fmt() + '\'')
+            print(traceback.print_exc())
+            failed_search_filters.append(search_filter)
+
+    _collect_resources_from_covid_sources(filter_aggregations, scraping_options)
+
+    for filter_aggregation in filter_aggregations:
+        try:
+            _store_aggregated_resources(filter_aggregation, resource_info_repo)
+        except Exception:
+            print('Exception while storing covid resources for filter \'' +
+                  filter_aggregation.search_filter.to_url_query_string_fmt() + '\'')
+            print(traceback.print_exc())
+            failed_search_filters.append(filter_aggregation.search_filter)
+
+    return failed_search_filters
+
+
+# NOTE: State of a filter's aggregation while its sources are scraped along with other filters'.
+class _FilterAggregation:
+    def __init__(self, search_filter: SearchFilter, web_sources: Dict[mytypes.URL, resourcemapping.WebSource]):
+        self._search_filter: SearchFilter = search_filter
+        self._web_sources: Dict[mytypes.URL, resourcemapping.WebSource] = web_sources
+        self._duplicate_merger: entities.DuplicateResourceMerger = entities.DuplicateResourceMerger(
+            entities.get_resource_info_class(search_filter.resource_type))
+        # NOTE: Count of resources collected, before merging duplicates.
+        self._collected_resource_count: int = 0
+
+    @property
+    def search_filter(self) -> SearchFilter:
+        return self._search_filter
+
+    @property
+    def web_sources(self) -> Dict[mytypes.URL, resourcemapping.WebSource]:
+        return self._web_sources
+
+    @property
+    def duplicate_merger(self) -> entities.DuplicateResourceMerger:
+        return self._duplicate_merger
+
+    @property
+    def collected_resource_count(self) -> int:
+        return self._collected_resource_count
+
+    def add_collected_resources(self, count: int):
+        self._collected_resource_count += count
+
+
+def _get_web_sources_for_filter(
+        search_filter: SearchFilter,
+        web_src_repo: resourcemapping.WebSourceRepo) -> Dict[mytypes.URL, resourcemapping.WebSource]:
+
+    ctx = elapsedtime.start_measuring_operation('websources fetch')
+    web_sources: Dict[mytypes.URL, resourcemapping.WebSource] = \
+        web_src_repo.get_web_sources_for_filter(search_filter)
+    elapsedtime.stop_measuring_operation(ctx)
+
+    if not web_sources:
+        raise ValueError('No matching web source found for filter: ' +
+                         search_filter.to_url_query_string_fmt())
+    return web_sources
+
 
-    aggregated_resources = _collect_resources_from_covid_sources(search_filter, web_src_repo)
+def _store_aggregated_resources(filter_aggregation: _FilterAggregation,
+                                resource_info_repo: AggregatedResourceInfoRepo):
+    search_filter = filter_aggregation.search_filter
 
     ctx_3 = elapsedtime.start_measuring_operation('merging duplicates')
-    resource_info_class = entities.get_resource_info_class(search_filter.resource_type)
-    covisearch_resources = resource_info_class.merge_duplicates(aggregated_resources)
+    covisearch_resources = filter_aggregation.duplicate_merger.get_merged_resources()
     elapsedtime.stop_measuring_operation(ctx_3)
 
     ctx_6 = elapsedtime.start_measuring_operation('sorting covid resources')
@@ -46,58 +160,73 @@ def aggregate_covid_resources(
     elapsedtime.stop_measuring_operation(ctx)
 
 
-def _collect_resources_from_covid_sources(
-        search_filter: SearchFilter, web_src_repo: resourcemapping.WebSourceRepo) -> List[Dict]:
-
-    resource_info_mapper = resourcemapping.ResourceInfoMapper()
-
-    ctx = elapsedtime.start_measuring_operation('websources fetch')
-    web_sources: Dict[mytypes.URL, resourcemapping.WebSource] = \
-        web_src_repo.get_web_sources_for_filter(search_filter)
+# NOTE: Resources are streamed: each source's scraped data is mapped as soon as it is scraped
+# and its resources are folded into its filter's duplicate merger right away. So scraped and
+# mapped data of a source is dropped once merged, instead of all of it being held till all
+# sources finish.
+# Filters with too few resources in primary city are retried with synonym cities, one synonym
+# per wave, i.e. k-th wave scrapes k-th synonym of all filters still short of resources.
+def _collect_resources_from_covid_sources(filter_aggregations: List[_FilterAggregation],
+                                          scraping_options: webdatascraper.ScrapingOptions):
+    resource_info_mapper = resourcemapping.ResourceInfoMapper(_mapped_resources_cache)
+
+    _collect_resources_in_one_wave(
+        resource_info_mapper,
+        [(filter_aggregation, filter_aggregation.search_filter, filter_aggregation.web_sources)
+         for filter_aggregation in filter_aggregations], scraping_options)
+
+    synonym_cities_of_filters = {
+        id(filter_aggregation): geoutil.get_synonym_cities(filter_aggregation.search_filter.city)
+        for filter_aggregation in filter_aggregations
+        if filter_aggregation.collected_resource_count < MIN_RESOURCES_WITHOUT_SYNONYM_CITIES}
+    filter_aggregations_short_of_resources = [
+        filter_aggregation for filter_aggregation in filter_aggregations
+        if id(filter_aggregation) in synonym_cities_of_filters]
+
+    synonym_idx = 0
+    while filter_aggregations_short_of_resources:
+        synonym_city_wave = []
+        for filter_aggregation in filter_aggregations_short_of_resources:
+            synonym_cities = synonym_cities_of_filters[id(filter_aggregation)]
+            if synonym_idx >= len(synonym_cities):
+                continue
+
+            search_filter_for_synonym = SearchFilter(synonym_cities[synonym_idx],
+                                                     filter_aggregation.search_filter.resource_type, None)
+            synonym_city_wave.append((filter_aggregation, search_filter_for_synonym, _get_web_srcs_for_synonym_city(
+                search_filter_for_synonym, filter_aggregation.web_sources)))
+
+        _collect_resources_in_one_wave(resource_info_mapper, synonym_city_wave, scraping_options)
+        filter_aggregations_short_of_resources = [
+            filter_aggregation for filter_aggregation, _, _ in synonym_city_wave
+            if filter_aggregation.collected_resource_count < MIN_RESOURCES_WITHOUT_SYNONYM_CITIES]
+        synonym_idx += 1
+
+
+# NOTE: Scrapes web sources of all (filter aggregation, search filter, web sources) items of
+# wave together and adds mapped resources to each item's filter aggregation.
+def _collect_resources_in_one_wave(
+        resource_info_mapper: resourcemapping.ResourceInfoMapper,
+        wave: List[Tuple[_FilterAggregation, SearchFilter, Dict[mytypes.URL, resourcemapping.WebSource]]],
+        scraping_options: webdatascraper.ScrapingOptions):
+
+    if not wave:
+        return
+
+    ctx = elapsedtime.start_measuring_operation('data scraping and mapping data to covisearch')
+    scraped_data_stream, scraped_web_src_items = _scrape_data_from_web_sources(wave, scraping_options)
+    for params_idx, scraped_data in scraped_data_stream.iter_with_params_idxs():
+        for filter_aggregation, search_filter, web_src in scraped_web_src_items[params_idx]:
+            covisearch_resources = _map_scraped_data_to_covisearch(
+                scraped_data, search_filter, web_src, resource_info_mapper)
+            filter_aggregation.duplicate_merger.add_all(covisearch_resources)
+            filter_aggregation.add_collected_resources(len(covisearch_resources))
     elapsedtime.stop_measuring_operation(ctx)
 
-    if not web_sources:
-        raise ValueError('No matching web source found for filter: ' +
-                         search_filter.to_url_query_string_fmt())
-
-    covisearch_resources = _collect_resources_from_primary_city(
-        resource_info_mapper, search_filter, web_sources)
-
-    if len(covisearch_resources) < 20:
-        collect_resources_from_synonym_cities(
-            covisearch_resources, resource_info_mapper, search_filter, web_sources)
-
-    return covisearch_resources
-
-
-def collect_resources_from_synonym_cities(covisearch_resources, resource_info_mapper, search_filter, web_sources):
-    synonym_cities = geoutil.get_synonym_cities(search_filter.city)
-
-    for synonym_city in synonym_cities:
-        search_filter_for_synonym = SearchFilter(synonym_city,
-                                                 search_filter.resource_type, None)
-        synonym_city_web_sources = _get_web_srcs_for_synonym_city(search_filter_for_synonym, web_sources)
-
-        covisearch_resources.extend(_collect_resources_for_city(
-            resource_info_mapper, search_filter_for_synonym, synonym_city_web_sources))
-
-        if len(covisearch_resources) >= 20:
-            break
-
-
-def _collect_resources_from_primary_city(
-        resource_info_mapper, primary_city_search_filter, web_sources) -> List[Dict]:
-    return _collect_resources_for_city(resource_info_mapper, primary_city_search_filter, web_sources)
-
-
-def _collect_resources_for_city(resource_info_mapper, search_filter, web_sources) -> List[Dict]:
-    scraped_data_list: List[webdatascraper.ScrapedData] = \
-        _scrape_data_from_web_sources(web_sources)
-    ctx_2 = elapsedtime.start_measuring_operation('mapping data to covisearch')
-    covisearch_resources = _map_scraped_data_to_covisearch_resources(
-        scraped_data_list, search_filter, web_sources, resource_info_mapper)
-    elapsedtime.stop_measuring_operation(ctx_2)
-    return covisearch_resources
+    _record_health_of_web_sources(
+        {web_src.web_resource_url: web_src
+         for web_src_items in scraped_web_src_items for _, _, web_src in web_src_items},
+        scraped_data_stream.scraping_report)
 
 
 def _get_web_srcs_for_synonym_city(
@@ -114,35 +243,99 @@ def _get_web_srcs_for_synonym_city(
     return synonym_city_web_sources
 
 
-def _map_scraped_data_to_covisearch_resources(
-        scraped_data_list: List[webdatascraper.ScrapedData], search_filter: SearchFilter,
-        web_sources: Dict[str, resourcemapping.WebSource],
-        resource_info_mapper: resourcemapping.ResourceInfoMapper) -> List[Dict]:
-
-    return [
-        resource_info_mapper.map_res_info_to_covisearch(
-            web_src_res_info, search_filter, web_sources[scraped_data.url])
-        for scraped_data in scraped_data_list if scraped_data is not None
-        for web_src_res_info in scraped_data.table_rows
-    ]
-
-
-def _scrape_data_from_web_sources(web_sources: Dict[str, resourcemapping.WebSource]) -> \
-        List[webdatascraper.ScrapedData]:
-
-    data_scraping_params = [
-        webdatascraper.DataScrapingParams(
+def _map_scraped_data_to_covisearch(
+        scraped_data: webdatascraper.ScrapedData, search_filter: SearchFilter,
+        web_src: resourcemapping.WebSource, resource_info_mapper: resourcemapping.ResourceInfoMapper) -> List[Dict]:
+
+    # NOTE: Already mapped in scraper's parse executor, unless scraped data came from scraper's caches.
+    if scraped_data.mapped_table_rows is not None:
+        return resource_info_mapper.adopt_mapped_res_info_list(
+            scraped_data.mapped_table_rows, scraped_data.content_fingerprint, search_filter, web_src)
+
+    return resource_info_mapper.map_all_res_info_to_covisearch(
+        scraped_data.table_rows, scraped_data.content_fingerprint, search_filter, web_src)
+
+
+# NOTE: Returns stream along with (filter aggregation, search filter, web source)s of each
+# scraping params of stream, by params index.
+# Web sources of a wave which are scraped same way, i.e. same request, selectors and filters,
+# share one params. Eg: filters for oxygen, oxy_cylinder and oxy_refill of a source whose
+# 'resource_type_label_mapping' maps them to one label, or whose URL ignores resource type.
+# Scraped data is then fanned out to mapping of each filter. Smart match in 'relevence' tells
+# resource types apart after mapping.
+def _scrape_data_from_web_sources(
+        wave: List[Tuple[_FilterAggregation, SearchFilter, Dict[mytypes.URL, resourcemapping.WebSource]]],
+        scraping_options: webdatascraper.ScrapingOptions) -> \
+        Tuple[webdatascraper.ScrapedDataStream,
+              List[List[Tuple[_FilterAggregation, SearchFilter, resourcemapping.WebSource]]]]:
+
+    web_src_items_by_scraping_key: Dict[str, List[Tuple[_FilterAggregation, SearchFilter,
+                                                        resourcemapping.WebSource]]] = {}
+    for filter_aggregation, search_filter, web_sources in wave:
+        for web_src in _get_web_srcs_allowed_by_circuit_breakers(web_sources).values():
+            web_src_items_by_scraping_key.setdefault(_get_scraping_key(web_src), []).append(
+                (filter_aggregation, search_filter, web_src))
+
+    # NOTE: Mapping is moved to scraper's parse executor only if caller's options have one.
+    # Otherwise it stays here, where mapped resources cache is consulted first. Rows mapped for
+    # one filter do not fit others, so shared params are mapped here too.
+    map_in_parse_executor = scraping_options is not None and scraping_options.parse_executor is not None
+    data_scraping_params = []
+    scraped_web_src_items = list(web_src_items_by_scraping_key.values())
+    for web_src_items in scraped_web_src_items:
+        _, search_filter, web_src = web_src_items[0]
+        data_scraping_params.append(webdatascraper.DataScrapingParams(
             web_src.web_resource_url, web_src.request_content_type, web_src.request_body,
             web_src.additional_http_headers,
             web_src.response_content_type, web_src.data_table_extract_selectors,
-            web_src.data_table_filters, {})
-        for web_src in web_sources.values()
-    ]
-
-    ctx = elapsedtime.start_measuring_operation('data scraping')
-    scraped_data_list = webdatascraper.scrape_data_from_websites(data_scraping_params)
-    elapsedtime.stop_measuring_operation(ctx)
-    return scraped_data_list
+            web_src.data_table_filters, {}, web_src.request_timeout_sec,
+            resourcemapping.CovisearchTableRowsMapper(search_filter, web_src)
+            if map_in_parse_executor and len(web_src_items) == 1 else None,
+            web_src.data_table_partition_column, web_src.is_request_idempotent))
+
+    return webdatascraper.stream_scraped_data_from_websites(data_scraping_params, scraping_options), \
+        scraped_web_src_items
+
+
+def _get_scraping_key(web_src: resourcemapping.WebSource) -> str:
+    return json.dumps(
+        [web_src.web_resource_url, str(web_src.request_content_type), web_src.request_body,
+         web_src.additional_http_headers, str(web_src.response_content_type), web_src.data_table_extract_selectors,
+         web_src.data_table_filters, web_src.request_timeout_sec, web_src.data_table_partition_column,
+         web_src.is_request_idempotent],
+        sort_keys=True)
+
+
+def _get_web_srcs_allowed_by_circuit_breakers(
+        web_sources: Dict[mytypes.URL, resourcemapping.WebSource]) -> Dict[mytypes.URL, resourcemapping.WebSource]:
+
+    if _web_src_circuit_breakers is None:
+        return web_sources
+
+    allowed_web_sources = {}
+    for web_src_url, web_src in web_sources.items():
+        if _web_src_circuit_breakers.allow_request(web_src.name):
+            allowed_web_sources[web_src_url] = web_src
+        else:
+            print('Skipping web source \'' + web_src.name + '\' as its circuit breaker is open.')
+    return allowed_web_sources
+
+
+# NOTE: Sources skipped by their circuit breaker are in none of the report's lists and are
+# not recorded. Nor are sources cut off by scraping deadline, as they were still pending, often
+# not even requested, eg: a healthy source queued behind slow ones. Their health is unknown.
+def _record_health_of_web_sources(web_sources: Dict[mytypes.URL, resourcemapping.WebSource],
+                                  scraping_report: webdatascraper.ScrapingReport):
+    if _web_src_circuit_breakers is None:
+        return
+
+    failed_urls = set(scraping_report.failed_urls + scraping_report.timed_out_urls)
+    for web_src_url, web_src in web_sources.items():
+        if web_src_url in failed_urls:
+            _web_src_circuit_breakers.record_failure(web_src.name)
+        elif web_src_url in scraping_report.elapsed_sec_by_url:
+            _web_src_circuit_breakers.record_success(
+                web_src.name, scraping_report.elapsed_sec_by_url[web_src_url])
 
 
 # import covisearch.aggregation.core.infra as infra
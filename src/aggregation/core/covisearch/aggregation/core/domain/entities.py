@@ -108,37 +108,27 @@ class CovidResourceInfo:
 
     @classmethod
     def merge_duplicates(cls, covisearch_resources: List[Dict]) -> List[Dict]:
-        covisearch_res_by_phone: Dict[str, Dict] = {}
-        covisearch_res_without_phone: List[Dict] = []
-        phones_label = cls.PHONES_LABEL
-        for covisearch_res_info in covisearch_resources:
-            phones: List[str] = covisearch_res_info[phones_label]
-            if not phones:
-                covisearch_res_without_phone.append(covisearch_res_info)
-
-            for phone in phones:
-                if phone in covisearch_res_by_phone:
-                    old_covisearch_res_for_phone = covisearch_res_by_phone[phone]
-                    covisearch_res_by_phone[phone] = \
-                        cls._get_more_recently_verified_res_info(
-                            covisearch_res_info, covisearch_res_by_phone[phone])
-
-                    newer_resource_info = covisearch_res_by_phone[phone]
-                    older_resource_info = old_covisearch_res_for_phone \
-                        if newer_resource_info is covisearch_res_info else covisearch_res_info
-                    cls._merge_older_with_newer(older_resource_info, newer_resource_info)
-
-                else:
-                    covisearch_res_by_phone[phone] = covisearch_res_info
-
-        return cls._merge_entries_with_multiple_phones(covisearch_res_by_phone, covisearch_res_without_phone)
+        duplicate_merger = DuplicateResourceMerger(cls)
+        duplicate_merger.add_all(covisearch_resources)
+        return duplicate_merger.get_merged_resources()
 
     @classmethod
     def get_resource_subtype_search_name(cls, med_resource_type: CovidResourceType) -> str:
         return ''
 
+    # NOTE: Merges two resources sharing a phone. Returns the more recently verified one, into
+    # which the other is merged.
     @classmethod
-    def _merge_entries_with_multiple_phones(cls, covisearch_res_by_phone, covisearch_res_without_phone) -> List[Dict]:
+    def merge_duplicate_pair(cls, res_info_a: Dict, res_info_b: Dict) -> Dict:
+        newer_resource_info = cls._get_more_recently_verified_res_info(res_info_a, res_info_b)
+        older_resource_info = res_info_b if newer_resource_info is res_info_a else res_info_a
+        cls._merge_older_with_newer(older_resource_info, newer_resource_info)
+        return newer_resource_info
+
+    # NOTE: Distinct resources among resources by phone, where a resource with many phones is
+    # under each of them, followed by resources without phone.
+    @classmethod
+    def merge_entries_with_multiple_phones(cls, covisearch_res_by_phone, covisearch_res_without_phone) -> List[Dict]:
         duplicates_removed_resources = list(covisearch_res_by_phone.values())
         merged_resources = []
 
@@ -515,6 +505,38 @@ class HelplineInfo(CovidResourceInfo):
         super()._merge_older_with_newer(older_resource_info, newer_resource_info)
 
 
+# NOTE: Incremental form of 'CovidResourceInfo.merge_duplicates'. Resources can be added as each
+# source gets mapped, and a duplicate is folded into the resource it duplicates right away, so
+# only merged resources are held instead of all resources of all sources.
+class DuplicateResourceMerger:
+    def __init__(self, resource_info_class):
+        self._resource_info_class = resource_info_class
+        self._covisearch_res_by_phone: Dict[str, Dict] = {}
+        self._covisearch_res_without_phone: List[Dict] = []
+
+    def add(self, covisearch_res_info: Dict):
+        resource_info_class = self._resource_info_class
+        covisearch_res_by_phone = self._covisearch_res_by_phone
+        phones: List[str] = covisearch_res_info[resource_info_class.PHONES_LABEL]
+        if not phones:
+            self._covisearch_res_without_phone.append(covisearch_res_info)
+
+        for phone in phones:
+            if phone in covisearch_res_by_phone:
+                covisearch_res_by_phone[phone] = resource_info_class.merge_duplicate_pair(
+                    covisearch_res_info, covisearch_res_by_phone[phone])
+            else:
+                covisearch_res_by_phone[phone] = covisearch_res_info
+
+    def add_all(self, covisearch_resources: List[Dict]):
+        for covisearch_res_info in covisearch_resources:
+            self.add(covisearch_res_info)
+
+    def get_merged_resources(self) -> List[Dict]:
+        return self._resource_info_class.merge_entries_with_multiple_phones(
+            self._covisearch_res_by_phone, self._covisearch_res_without_phone)
+
+
 def get_resource_info_class(resource_type: CovidResourceType):
     res_type_classes = {
         CovidResourceType.PLASMA: PlasmaInfo,
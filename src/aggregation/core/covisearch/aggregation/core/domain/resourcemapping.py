@@ -1,21 +1,25 @@
 from enum import Enum
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Callable
 import re
 from datetime import datetime, timezone
 from dateutil import tz
 import dateutil.parser as dateutilparser
 from abc import ABC, abstractmethod
 import urllib.parse
+import threading
 
 from phonenumbers import PhoneNumberMatcher, format_number, PhoneNumberFormat
 
 from covisearch.util.mytypes import *
+from covisearch.util.mytypes import URL as URL
 import covisearch.aggregation.core.domain.entities as entities
 from covisearch.aggregation.core.domain.entities import \
     CovidResourceInfo, CovidResourceType, OxygenInfo, BloodInfo, \
     PlasmaInfo, HospitalBedsInfo, SearchFilter, HospitalBedsICUInfo
 import covisearch.util.datetimeutil
 import covisearch.util.geoutil as geoutil
+import covisearch.util.contentcache as contentcache
+import covisearch.util.websitedatascraper as webdatascraper
 
 
 # NOTE: KAPIL: Python Dict convertible to JSON provided data types are
@@ -24,34 +28,169 @@ import covisearch.util.geoutil as geoutil
 # Need to use JSONEncoder to serialize datetime, etc.
 
 
-class ResourceInfoMapper:
+# NOTE: IDs must be unique within one aggregation as relevance comparators cache by ID.
+# Allocation is locked as resources of one aggregation may be mapped from many threads.
+class ResourceIdAllocator:
     def __init__(self):
-        self._resource_id: int = 0
+        self._next_resource_id: int = 0
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        with self._lock:
+            resource_id = self._next_resource_id
+            self._next_resource_id = self._next_resource_id + 1
+            return resource_id
+
+
+class ResourceInfoMapper:
+    def __init__(self, mapped_resources_cache: contentcache.ContentFingerprintCache = None):
+        self._resource_id_allocator: ResourceIdAllocator = ResourceIdAllocator()
+        # NOTE: Mapped covisearch resources by fingerprint of scraped content + mapping inputs.
+        # 'None' disables caching.
+        self._mapped_resources_cache: contentcache.ContentFingerprintCache = mapped_resources_cache
+        # NOTE: Mapping plans by (web source, resource type, city). Web sources are cloned per
+        # filter and per synonym city and live as long as the aggregation, same as this mapper.
+        self._mapping_plans: Dict[Tuple['WebSource', CovidResourceType, str], 'ResourceMappingPlan'] = {}
+        self._mapping_plans_lock = threading.Lock()
+
+    # NOTE: Same as mapping each row, but reuses rows mapped earlier from same scraped content
+    # for same filter and web source. This skips phone and datetime parsing for sources whose
+    # response has not changed since last resync.
+    def map_all_res_info_to_covisearch(self, web_src_res_info_list: List[Dict], content_fingerprint: str,
+                                       search_filter: SearchFilter, web_src: 'WebSource') -> List[Dict]:
+        cache_key = self._get_mapped_resources_cache_key(content_fingerprint, search_filter, web_src)
+        if cache_key is None:
+            return self._map_all_res_info_with_plan(web_src_res_info_list, search_filter, web_src)
+
+        cached_covisearch_res_info_list = self._mapped_resources_cache.get(cache_key)
+        if cached_covisearch_res_info_list is not None:
+            return [self._copy_with_new_id(covisearch_res_info)
+                    for covisearch_res_info in cached_covisearch_res_info_list]
+
+        covisearch_res_info_list = self._map_all_res_info_with_plan(web_src_res_info_list, search_filter, web_src)
+        # NOTE: Caching copies as returned resources get modified while merging duplicates.
+        self._mapped_resources_cache.set(
+            cache_key, [_copy_covisearch_res_info(covisearch_res_info)
+                        for covisearch_res_info in covisearch_res_info_list])
+        return covisearch_res_info_list
+
+    # NOTE: Takes resources mapped outside this mapper, eg: by 'CovisearchTableRowsMapper' in a
+    # parse worker process. Their IDs are unique only within their response, so new IDs are
+    # allocated. Resources are cached same as if they were mapped here.
+    def adopt_mapped_res_info_list(self, covisearch_res_info_list: List[Dict], content_fingerprint: str,
+                                   search_filter: SearchFilter, web_src: 'WebSource') -> List[Dict]:
+        for covisearch_res_info in covisearch_res_info_list:
+            covisearch_res_info[CovidResourceInfo.ID_LABEL] = self._allocate_resource_id()
+
+        cache_key = self._get_mapped_resources_cache_key(content_fingerprint, search_filter, web_src)
+        if cache_key is not None:
+            self._mapped_resources_cache.set(
+                cache_key, [_copy_covisearch_res_info(covisearch_res_info)
+                            for covisearch_res_info in covisearch_res_info_list])
+        return covisearch_res_info_list
 
     # Classes related to Covid resource websites and resource mapping
     def map_res_info_to_covisearch(self, web_src_res_info: Dict, search_filter: SearchFilter,
                                    web_src: 'WebSource') -> Dict:
+        mapping_plan = self._get_mapping_plan(search_filter, web_src)
+        return mapping_plan.map_res_info(web_src_res_info, self._allocate_resource_id())
+
+    # NOTE: Plan is compiled only if there are rows, same as desc was looked up only per row.
+    def _map_all_res_info_with_plan(self, web_src_res_info_list: List[Dict], search_filter: SearchFilter,
+                                    web_src: 'WebSource') -> List[Dict]:
+        if not web_src_res_info_list:
+            return []
+
+        mapping_plan = self._get_mapping_plan(search_filter, web_src)
+        return [mapping_plan.map_res_info(web_src_res_info, self._allocate_resource_id())
+                for web_src_res_info in web_src_res_info_list]
+
+    def _get_mapping_plan(self, search_filter: SearchFilter, web_src: 'WebSource') -> 'ResourceMappingPlan':
+        plan_key = (web_src, search_filter.resource_type, search_filter.city)
+        with self._mapping_plans_lock:
+            mapping_plan = self._mapping_plans.get(plan_key)
+            if mapping_plan is None:
+                mapping_plan = ResourceMappingPlan(search_filter, web_src)
+                self._mapping_plans[plan_key] = mapping_plan
+            return mapping_plan
+
+    def _allocate_resource_id(self) -> int:
+        return self._resource_id_allocator.allocate()
+
+    # NOTE: IDs must be unique within one aggregation as relevance comparators cache by ID.
+    def _copy_with_new_id(self, covisearch_res_info: Dict) -> Dict:
+        covisearch_res_info_copy = _copy_covisearch_res_info(covisearch_res_info)
+        covisearch_res_info_copy[CovidResourceInfo.ID_LABEL] = self._allocate_resource_id()
+        return covisearch_res_info_copy
+
+    def _get_mapped_resources_cache_key(self, content_fingerprint: str, search_filter: SearchFilter,
+                                        web_src: 'WebSource') -> str:
+        if self._mapped_resources_cache is None or content_fingerprint is None:
+            return None
+
+        # NOTE: 'ago' timestamps are relative to time of mapping, so same content maps to
+        # different times in next resync.
+        if _has_relative_datetime_mapping(web_src.resource_mapping_desc):
+            return None
+
+        # NOTE: City is input for phone area codes and resource type for smart match flag.
+        return contentcache.combine_fingerprints(
+            [content_fingerprint, search_filter.to_url_query_string_fmt(), web_src.name,
+             web_src.card_source_url, _get_resource_mapping_desc_fingerprint(web_src.resource_mapping_desc)])
+
+
+# NOTE: Maps scraped rows of a web source to covisearch resources in the scraper's parse
+# executor, right after parsing. This moves phone normalisation and datetime parsing off the
+# aggregating thread and overlaps it with fetching of slower sources.
+# Picklable, so that it can be sent to worker processes with the response.
+class CovisearchTableRowsMapper(webdatascraper.TableRowsMapper):
+    def __init__(self, search_filter: SearchFilter, web_src: 'WebSource'):
+        self._search_filter: SearchFilter = search_filter
+        self._web_src: 'WebSource' = web_src
+
+    # NOTE: Plan is compiled here, in worker, as its field mappers are closures which do not pickle.
+    def map_table_rows(self, table_rows: List[Dict[str, str]]) -> List[Dict]:
+        if not table_rows:
+            return []
+
+        mapping_plan = ResourceMappingPlan(self._search_filter, self._web_src)
+        return [mapping_plan.map_res_info(web_src_res_info, resource_id)
+                for resource_id, web_src_res_info in enumerate(table_rows)]
+
+
+# NOTE: Mapping of rows of one web source for one search filter, compiled once from its
+# resource mapping desc into a flat list of field mappers. Each field mapper has its web src
+# field names, datetime converter, phone area code city, etc. resolved beforehand, so mapping a
+# row only runs the list instead of looking up desc, mapper tables and source details per row.
+# Field mappers run in same order as fields were mapped per row earlier, so mapped resources
+# and their key order are unchanged.
+class ResourceMappingPlan:
+    def __init__(self, search_filter: SearchFilter, web_src: 'WebSource'):
+        self._source_name: str = web_src.name
+        self._card_source_url: URL = web_src.card_source_url
+        self._needs_smart_match: bool = web_src.does_resource_need_smart_match(search_filter.resource_type)
+        self._field_mappers: List['FieldMapper'] = \
+            _compile_common_res_info_mappers(web_src.resource_mapping_desc, search_filter) + \
+            _compile_specific_res_info_mappers(search_filter.resource_type, web_src.resource_mapping_desc)
+
+    def map_res_info(self, web_src_res_info: Dict, resource_id: int) -> Dict:
         covisearch_res_info = {
             # NOTE: KAPIL: Commenting for now as res-type and city are redundant.
             # CovidResourceInfo.RESOURCE_TYPE_LABEL:
             #     CovidResourceType.to_string(search_filter.resource_type),
             # CovidResourceInfo.CITY_LABEL: search_filter.city,
-            CovidResourceInfo.ID_LABEL: self._resource_id,
+            CovidResourceInfo.ID_LABEL: resource_id,
             CovidResourceInfo.SOURCES_LABEL: [
                 {
-                    CovidResourceInfo.SOURCE_NAME_LABEL: web_src.name,
-                    CovidResourceInfo.SOURCE_URL_LABEL: web_src.card_source_url,
-                    CovidResourceInfo.SOURCE_NEEDS_SMART_MATCH: web_src.does_resource_need_smart_match(
-                        search_filter.resource_type)
+                    CovidResourceInfo.SOURCE_NAME_LABEL: self._source_name,
+                    CovidResourceInfo.SOURCE_URL_LABEL: self._card_source_url,
+                    CovidResourceInfo.SOURCE_NEEDS_SMART_MATCH: self._needs_smart_match
                 }
             ]
         }
 
-        self._resource_id = self._resource_id + 1
-
-        _map_common_res_info(web_src_res_info, web_src.resource_mapping_desc, covisearch_res_info, search_filter)
-        map_specific_res_info = _get_specific_res_info_mapper(search_filter.resource_type)
-        map_specific_res_info(web_src_res_info, web_src.resource_mapping_desc, covisearch_res_info)
+        for map_field in self._field_mappers:
+            map_field(web_src_res_info, covisearch_res_info)
 
         return covisearch_res_info
 
@@ -73,7 +212,8 @@ class WebSource:
                  resource_mapping_desc: Dict[str, 'FieldMappingDesc'],
                  resource_type_label_mapping: Dict[str, str],
                  city_name_case_mapping: LetterCaseType, city_mapping: Dict[str, str],
-                 search_filter: SearchFilter):
+                 search_filter: SearchFilter, request_timeout_sec: float = None,
+                 data_table_partition_column: str = None, is_request_idempotent: bool = False):
 
         self._name = name
         self._homepage_url: URL = homepage_url
@@ -99,6 +239,15 @@ class WebSource:
         self._resource_types_needing_smart_match: List[CovidResourceType] = resource_types_needing_smart_match
 
         self._resource_mapping_desc: Dict[str, 'FieldMappingDesc'] = resource_mapping_desc
+        # NOTE: Per-source timeout budget for slow sources. 'None' means scraper's default.
+        self._request_timeout_sec: float = request_timeout_sec
+        # NOTE: For sources returning all cities in one document, eg: pan-India feeds, column by
+        # which filters select a city, eg: 'district'. Document is then fetched and parsed once
+        # for all filters and indexed by this column. 'None' parses document per filter.
+        self._data_table_partition_column: str = data_table_partition_column
+        # NOTE: For POST sources whose requests only read, eg: search APIs, so they may be hedged
+        # like GET sources.
+        self._is_request_idempotent: bool = is_request_idempotent
 
         # NOTE: KAPIL: Saving transient params for cloning
         self._web_resource_url_template: URL = web_resource_url_template
@@ -116,7 +265,8 @@ class WebSource:
                          self._data_table_extract_selectors, self._data_table_filter_templates,
                          self._resource_types_needing_smart_match, self._resource_mapping_desc,
                          self._resource_type_label_mapping, self._city_name_case_mapping,
-                         self._city_mapping, search_filter)
+                         self._city_mapping, search_filter, self._request_timeout_sec,
+                         self._data_table_partition_column, self._is_request_idempotent)
 
     @property
     def name(self) -> str:
@@ -162,6 +312,18 @@ class WebSource:
     def resource_mapping_desc(self) -> Dict[str, 'FieldMappingDesc']:
         return self._resource_mapping_desc
 
+    @property
+    def request_timeout_sec(self) -> float:
+        return self._request_timeout_sec
+
+    @property
+    def data_table_partition_column(self) -> str:
+        return self._data_table_partition_column
+
+    @property
+    def is_request_idempotent(self) -> bool:
+        return self._is_request_idempotent
+
     def does_resource_need_smart_match(self, resource_type: CovidResourceType) -> bool:
         return resource_type in self._resource_types_needing_smart_match
 
@@ -290,131 +452,137 @@ class WebSourceRepo(ABC):
         raise NotImplementedError()
 
 
-def _get_specific_res_info_mapper(res_type: CovidResourceType):
-    _web_res_to_covisearch_res_mapper = {
-        entities.CovidResourceType.PLASMA: _map_plasma,
-        entities.CovidResourceType.OXYGEN: _map_oxygen,
-        entities.CovidResourceType.HOSPITAL_BED: _map_hospital_bed,
-        entities.CovidResourceType.HOSPITAL_BED_ICU: _map_hospital_bed_icu,
-        entities.CovidResourceType.AMBULANCE: _map_ambulance,
-        entities.CovidResourceType.ECMO: _map_ecmo,
-        entities.CovidResourceType.FOOD: _map_food,
-        entities.CovidResourceType.TESTING: _map_testing,
-        entities.CovidResourceType.MEDICINE: _map_medicine,
-        entities.CovidResourceType.VENTILATOR: _map_ventilator,
-        entities.CovidResourceType.HELPLINE: _map_helpline,
-        entities.CovidResourceType.BLOOD: _map_blood,
-        entities.CovidResourceType.MED_AMPHOTERICIN_B: _map_medicine,
-        entities.CovidResourceType.MED_CRESEMBA: _map_medicine,
-        entities.CovidResourceType.MED_TOCILIZUMAB: _map_medicine,
-        entities.CovidResourceType.MED_OSELTAMIVIR: _map_medicine,
-        entities.CovidResourceType.MED_AMPHOLYN: _map_medicine,
-        entities.CovidResourceType.MED_POSACONAZOLE: _map_medicine,
-        entities.CovidResourceType.MED_FABIFLU: _map_medicine,
-        entities.CovidResourceType.OXY_CONCENTRATOR: _map_oxygen,
-        entities.CovidResourceType.OXY_REGULATOR: _map_oxygen,
-        entities.CovidResourceType.OXY_REFILL: _map_oxygen,
-        entities.CovidResourceType.OXY_CYLINDER: _map_oxygen
-    }
-    return _web_res_to_covisearch_res_mapper[res_type]
+def _copy_covisearch_res_info(covisearch_res_info: Dict) -> Dict:
+    covisearch_res_info_copy = dict(covisearch_res_info)
+    covisearch_res_info_copy[CovidResourceInfo.PHONES_LABEL] = \
+        list(covisearch_res_info[CovidResourceInfo.PHONES_LABEL])
+    covisearch_res_info_copy[CovidResourceInfo.SOURCES_LABEL] = \
+        [dict(source) for source in covisearch_res_info[CovidResourceInfo.SOURCES_LABEL]]
+    return covisearch_res_info_copy
 
 
-def _map_common_res_info(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                         covisearch_res: Dict, search_filter: SearchFilter):
-    _map_contact_name(covisearch_res, res_mapping_desc, web_src_res_info)
+def _has_relative_datetime_mapping(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> bool:
+    return any(field_mapping.datetime_fmt is covisearch.util.datetimeutil.DatetimeFormat.AGO
+               for field_mapping in res_mapping_desc.values())
 
-    _map_address(covisearch_res, res_mapping_desc, web_src_res_info)
 
-    _map_phones(covisearch_res, res_mapping_desc, web_src_res_info, search_filter)
+def _get_resource_mapping_desc_fingerprint(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> str:
+    return '|'.join(sorted(
+        label + ':' + '+'.join(field_mapping.web_src_field_names) + ':' + str(field_mapping.datetime_fmt) +
+        ':' + str(field_mapping.need_exact_phone_number_match)
+        for label, field_mapping in res_mapping_desc.items()))
 
-    _map_details(covisearch_res, res_mapping_desc, web_src_res_info)
 
-    _map_post_time(covisearch_res, res_mapping_desc, web_src_res_info)
+# NOTE: Field mappers take (web src res info, covisearch res) and set their field(s) in latter.
+FieldMapper = Callable[[Dict, Dict], None]
 
-    _map_last_verified_time(covisearch_res, res_mapping_desc, web_src_res_info)
 
-    _map_card_source_url(covisearch_res, res_mapping_desc, web_src_res_info)
+def _compile_specific_res_info_mappers(res_type: CovidResourceType,
+                                       res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> List[FieldMapper]:
+    return _specific_res_info_mappers_compilers[res_type](res_mapping_desc)
 
-    _map_resource_subtype(covisearch_res, res_mapping_desc, web_src_res_info)
 
-    _map_lat_lng(covisearch_res, res_mapping_desc, web_src_res_info)
+def _compile_common_res_info_mappers(res_mapping_desc: Dict[str, 'FieldMappingDesc'],
+                                     search_filter: SearchFilter) -> List[FieldMapper]:
+    return [
+        _compile_contact_name_mapper(res_mapping_desc),
+        _compile_address_mapper(res_mapping_desc),
+        _compile_phones_mapper(res_mapping_desc, search_filter),
+        _compile_details_mapper(res_mapping_desc),
+        _compile_datetime_field_mapper(CovidResourceInfo.POST_TIME_LABEL, res_mapping_desc),
+        _compile_datetime_field_mapper(CovidResourceInfo.LAST_VERIFIED_UTC_LABEL, res_mapping_desc),
+        _compile_card_source_url_mapper(res_mapping_desc),
+        _compile_resource_subtype_mapper(res_mapping_desc),
+        _compile_lat_lng_mapper(res_mapping_desc)
+    ]
 
 
-def _map_last_verified_time(covisearch_res, res_mapping_desc, web_src_res_info):
-    last_verified_label = CovidResourceInfo.LAST_VERIFIED_UTC_LABEL
-    if last_verified_label in res_mapping_desc:
-        last_verified_mapping = res_mapping_desc[last_verified_label]
-        web_src_last_verified_time = web_src_res_info[last_verified_mapping.first_web_src_field_name]
-        map_web_src_datetime_to_covisearch = \
-            get_datetime_format_mapper(last_verified_mapping.datetime_fmt)
-        try:
-            covisearch_res[last_verified_label] = \
-                map_web_src_datetime_to_covisearch(web_src_last_verified_time)
-        except:
-            covisearch_res[last_verified_label] = None
-    else:
-        covisearch_res[last_verified_label] = None
+def _compile_constant_field_mapper(covisearch_field_label: str, value) -> FieldMapper:
+    def map_constant_field(web_src_res_info: Dict, covisearch_res: Dict):
+        covisearch_res[covisearch_field_label] = value
+
+    return map_constant_field
+
+
+# NOTE: For post time and last verified time.
+def _compile_datetime_field_mapper(datetime_label: str,
+                                   res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
+    if datetime_label not in res_mapping_desc:
+        return _compile_constant_field_mapper(datetime_label, None)
 
+    datetime_mapping = res_mapping_desc[datetime_label]
+    web_src_field_name = datetime_mapping.first_web_src_field_name
+    map_web_src_datetime_to_covisearch = get_datetime_format_mapper(datetime_mapping.datetime_fmt)
 
-def _map_post_time(covisearch_res, res_mapping_desc, web_src_res_info):
-    post_time_label = CovidResourceInfo.POST_TIME_LABEL
-    if post_time_label in res_mapping_desc:
-        post_time_mapping = res_mapping_desc[post_time_label]
-        web_src_post_time = web_src_res_info[post_time_mapping.first_web_src_field_name]
-        map_web_src_datetime_to_covisearch = \
-            get_datetime_format_mapper(post_time_mapping.datetime_fmt)
+    def map_datetime_field(web_src_res_info: Dict, covisearch_res: Dict):
+        web_src_datetime = web_src_res_info[web_src_field_name]
         try:
-            covisearch_res[post_time_label] = \
-                map_web_src_datetime_to_covisearch(web_src_post_time)
+            covisearch_res[datetime_label] = map_web_src_datetime_to_covisearch(web_src_datetime)
         except:
-            covisearch_res[post_time_label] = None
-    else:
-        covisearch_res[post_time_label] = None
+            covisearch_res[datetime_label] = None
+
+    return map_datetime_field
 
 
-def _map_details(covisearch_res, res_mapping_desc, web_src_res_info):
+def _compile_details_mapper(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
     details_label = CovidResourceInfo.DETAILS_LABEL
-    if details_label in res_mapping_desc:
-        details_mapping = res_mapping_desc[details_label]
+    if details_label not in res_mapping_desc:
+        return _compile_constant_field_mapper(details_label, '')
+
+    web_src_field_names = res_mapping_desc[details_label].web_src_field_names
+
+    def map_details(web_src_res_info: Dict, covisearch_res: Dict):
         covisearch_res[details_label] = \
-            _sanitize_string_field(_stitch_multiple_mapped_fields(details_mapping, web_src_res_info, '. ', 1))
-    else:
-        covisearch_res[details_label] = ''
+            _sanitize_string_field(_stitch_multiple_mapped_fields(web_src_field_names, web_src_res_info, '. ', 1))
 
+    return map_details
 
-def _map_phones(covisearch_res, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                web_src_res_info, search_filter: SearchFilter):
+
+def _compile_phones_mapper(res_mapping_desc: Dict[str, 'FieldMappingDesc'],
+                           search_filter: SearchFilter) -> FieldMapper:
     phones_label = CovidResourceInfo.PHONES_LABEL
 
     if phones_label not in res_mapping_desc:
-        covisearch_res[phones_label] = []
-        return
+        def map_no_phones(web_src_res_info: Dict, covisearch_res: Dict):
+            covisearch_res[phones_label] = []
+
+        return map_no_phones
 
     phone_mapping = res_mapping_desc[phones_label]
-    web_src_phone_no = _stitch_multiple_mapped_fields(phone_mapping, web_src_res_info, '/', 1)
+    web_src_field_names = phone_mapping.web_src_field_names
+    need_exact_phone_number_match = phone_mapping.need_exact_phone_number_match
+    city = search_filter.city
+
+    def map_phones(web_src_res_info: Dict, covisearch_res: Dict):
+        web_src_phone_no = _stitch_multiple_mapped_fields(web_src_field_names, web_src_res_info, '/', 1)
 
-    # NOTE: KAPIL: [AS ON 01-Jun-2021] The new field for keeping phone numbers as uniformized list.
-    # Should replace old slash separated string later.
-    covisearch_res[phones_label] = \
-        _extract_and_uniformized_phones(web_src_phone_no, search_filter.city,
-                                        res_mapping_desc[phones_label].need_exact_phone_number_match)
+        # NOTE: KAPIL: [AS ON 01-Jun-2021] The new field for keeping phone numbers as uniformized list.
+        # Should replace old slash separated string later.
+        covisearch_res[phones_label] = \
+            _extract_and_uniformized_phones(web_src_phone_no, city, need_exact_phone_number_match)
 
+    return map_phones
 
-def _map_address(covisearch_res, res_mapping_desc, web_src_res_info):
+
+def _compile_address_mapper(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
     address_label = CovidResourceInfo.ADDRESS_LABEL
-    if address_label in res_mapping_desc:
-        address_mapping = res_mapping_desc[address_label]
+    if address_label not in res_mapping_desc:
+        return _compile_constant_field_mapper(address_label, '')
+
+    web_src_field_names = res_mapping_desc[address_label].web_src_field_names
+
+    def map_address(web_src_res_info: Dict, covisearch_res: Dict):
         covisearch_res[address_label] = \
-            _sanitize_string_field(_stitch_multiple_mapped_fields(address_mapping, web_src_res_info,
+            _sanitize_string_field(_stitch_multiple_mapped_fields(web_src_field_names, web_src_res_info,
                                                                   ', ', 2))
-    else:
-        covisearch_res[address_label] = ''
+
+    return map_address
 
 
-def _stitch_multiple_mapped_fields(field_mapping, web_src_res_info, stitch_delim: str,
+def _stitch_multiple_mapped_fields(web_src_field_names: List[str], web_src_res_info, stitch_delim: str,
                                    last_delim_chars_to_remove: int):
     stitched_field_val = ''
-    for field_name in field_mapping.web_src_field_names:
+    for field_name in web_src_field_names:
         if web_src_res_info[field_name]:
             stitched_field_val = stitched_field_val + web_src_res_info[field_name] + stitch_delim
     if stitched_field_val:
@@ -422,44 +590,55 @@ def _stitch_multiple_mapped_fields(field_mapping, web_src_res_info, stitch_delim
     return stitched_field_val
 
 
-def _map_contact_name(covisearch_res: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                      web_src_res_info: Dict):
+def _compile_contact_name_mapper(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
     contact_name_label = CovidResourceInfo.CONTACT_NAME_LABEL
-    name_mapping = res_mapping_desc[contact_name_label]
-    covisearch_res[contact_name_label] = web_src_res_info[name_mapping.first_web_src_field_name]
+    web_src_field_name = res_mapping_desc[contact_name_label].first_web_src_field_name
 
+    def map_contact_name(web_src_res_info: Dict, covisearch_res: Dict):
+        covisearch_res[contact_name_label] = web_src_res_info[web_src_field_name]
 
-def _map_resource_subtype(covisearch_res: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                          web_src_res_info: Dict):
+    return map_contact_name
+
+
+def _compile_resource_subtype_mapper(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
     resource_subtype_label = CovidResourceInfo.RESOURCE_SUBTYPE_LABEL
-    if resource_subtype_label in res_mapping_desc:
-        resource_subtype_mapping = res_mapping_desc[resource_subtype_label]
-        covisearch_res[resource_subtype_label] = \
-            web_src_res_info[resource_subtype_mapping.first_web_src_field_name]
-    else:
-        covisearch_res[resource_subtype_label] = ''
+    if resource_subtype_label not in res_mapping_desc:
+        return _compile_constant_field_mapper(resource_subtype_label, '')
 
+    web_src_field_name = res_mapping_desc[resource_subtype_label].first_web_src_field_name
 
-def _map_lat_lng(covisearch_res: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                 web_src_res_info: Dict):
+    def map_resource_subtype(web_src_res_info: Dict, covisearch_res: Dict):
+        covisearch_res[resource_subtype_label] = web_src_res_info[web_src_field_name]
+
+    return map_resource_subtype
+
+
+def _compile_lat_lng_mapper(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
     lat_label = CovidResourceInfo.LATITUDE_LABEL
     lng_label = CovidResourceInfo.LONGITUDE_LABEL
-    if lat_label in res_mapping_desc:
+    if lat_label not in res_mapping_desc:
+        return _map_nothing
 
-        lat_mapping = res_mapping_desc[lat_label]
-        lng_mapping = res_mapping_desc[lng_label]
+    lat_web_src_field_name = res_mapping_desc[lat_label].first_web_src_field_name
+    lng_web_src_field_name = res_mapping_desc[lng_label].first_web_src_field_name
 
-        covisearch_res[lat_label] = web_src_res_info[lat_mapping.first_web_src_field_name]
-        covisearch_res[lng_label] = web_src_res_info[lng_mapping.first_web_src_field_name]
+    def map_lat_lng(web_src_res_info: Dict, covisearch_res: Dict):
+        covisearch_res[lat_label] = web_src_res_info[lat_web_src_field_name]
+        covisearch_res[lng_label] = web_src_res_info[lng_web_src_field_name]
 
+    return map_lat_lng
 
-def _map_card_source_url(covisearch_res: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                         web_src_res_info: Dict):
+
+def _compile_card_source_url_mapper(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
     card_source_url_label = CovidResourceInfo.CARD_SOURCE_URL_LABEL
     sources_label = CovidResourceInfo.SOURCES_LABEL
     source_url_label = CovidResourceInfo.SOURCE_URL_LABEL
-    if card_source_url_label in res_mapping_desc:
-        card_source_url_mapping = res_mapping_desc[card_source_url_label]
+    if card_source_url_label not in res_mapping_desc:
+        return _map_nothing
+
+    web_src_field_name = res_mapping_desc[card_source_url_label].first_web_src_field_name
+
+    def map_card_source_url(web_src_res_info: Dict, covisearch_res: Dict):
         # NOTE: KAPIL:
         # -For cases where post link present in card is relative url, we're
         # appending the relative link to existing card source url in covisearch which comes
@@ -471,116 +650,114 @@ def _map_card_source_url(covisearch_res: Dict, res_mapping_desc: Dict[str, 'Fiel
         # in web source.
         # -If post link has absolute URL, then we may not make field for card source url in web source.
         covisearch_res[sources_label][0][source_url_label] = \
-            covisearch_res[sources_label][0][source_url_label] + \
-            web_src_res_info[card_source_url_mapping.first_web_src_field_name]
-
-
-# TODO: KAPIL: Add proper details for specific res types later if websites give the info.
-def _map_plasma(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                covisearch_res: Dict):
-    covisearch_res[PlasmaInfo.BLOOD_GROUP_LABEL] = None
-
+            covisearch_res[sources_label][0][source_url_label] + web_src_res_info[web_src_field_name]
 
-def _map_blood(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-               covisearch_res: Dict):
-    covisearch_res[BloodInfo.BLOOD_GROUP_LABEL] = None
+    return map_card_source_url
 
 
-def _map_oxygen(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                covisearch_res: Dict):
-    covisearch_res[OxygenInfo.LITRES_LABEL] = None
-
-
-re_available_beds_pattern = re.compile('(\d+)', re.IGNORECASE)
-
-
-def _map_hospital_bed(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                      covisearch_res: Dict):
-    hospital_type_label = HospitalBedsInfo.HOSPITAL_TYPE_LABEL
-    _map_hospital_type(covisearch_res, hospital_type_label, res_mapping_desc, web_src_res_info)
+def _map_nothing(web_src_res_info: Dict, covisearch_res: Dict):
+    pass
 
-    _map_bed_field(HospitalBedsInfo.AVAILABLE_COVID_BEDS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    _map_bed_field(HospitalBedsInfo.AVAILABLE_NO_OXYGEN_BEDS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    _map_bed_field(HospitalBedsInfo.AVAILABLE_OXYGEN_BEDS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    _map_bed_field(HospitalBedsInfo.TOTAL_AVAILABLE_BEDS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    HospitalBedsInfo.fill_remaining_bed_fields(covisearch_res)
 
+# TODO: KAPIL: Add proper details for specific res types later if websites give the info.
+def _compile_plasma_mappers(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> List[FieldMapper]:
+    return [_compile_constant_field_mapper(PlasmaInfo.BLOOD_GROUP_LABEL, None)]
 
-def _map_hospital_bed_icu(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                          covisearch_res: Dict):
-    hospital_type_label = HospitalBedsICUInfo.HOSPITAL_TYPE_LABEL
-    _map_hospital_type(covisearch_res, hospital_type_label, res_mapping_desc, web_src_res_info)
 
-    _map_bed_field(HospitalBedsICUInfo.AVAILABLE_NO_VENTILATOR_BEDS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    _map_bed_field(HospitalBedsICUInfo.AVAILABLE_VENTILATOR_BEDS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    _map_bed_field(HospitalBedsICUInfo.TOTAL_AVAILABLE_BEDS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    _map_bed_field(HospitalBedsICUInfo.AVAILABLE_VENTILATORS_LABEL, covisearch_res,
-                   res_mapping_desc, web_src_res_info)
-    HospitalBedsICUInfo.fill_remaining_bed_fields(covisearch_res)
+def _compile_blood_mappers(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> List[FieldMapper]:
+    return [_compile_constant_field_mapper(BloodInfo.BLOOD_GROUP_LABEL, None)]
 
 
-def _map_hospital_type(covisearch_res, hospital_type_label, res_mapping_desc, web_src_res_info):
-    if hospital_type_label in res_mapping_desc:
-        hospital_type_mapping = res_mapping_desc[hospital_type_label]
-        covisearch_res[hospital_type_label] = \
-            _stitch_multiple_mapped_fields(hospital_type_mapping, web_src_res_info, ' | ', 3)
-    else:
-        covisearch_res[hospital_type_label] = None
+def _compile_oxygen_mappers(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> List[FieldMapper]:
+    return [_compile_constant_field_mapper(OxygenInfo.LITRES_LABEL, None)]
 
 
-def _map_bed_field(bed_field_label, covisearch_res, res_mapping_desc, web_src_res_info):
-    if bed_field_label in res_mapping_desc:
-        bed_field_mapping = res_mapping_desc[bed_field_label]
-        web_src_bed_field_val = web_src_res_info[bed_field_mapping.first_web_src_field_name]
-        re_bed_field_result = re_available_beds_pattern.search(web_src_bed_field_val)
-        if re_bed_field_result is not None:
-            covisearch_res[bed_field_label] = int(re_bed_field_result.group(1))
-        else:
-            covisearch_res[bed_field_label] = None
-    else:
-        covisearch_res[bed_field_label] = None
+re_available_beds_pattern = re.compile(r'(\d+)', re.IGNORECASE)
 
 
-def _map_ambulance(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                   covisearch_res: Dict):
-    pass
+def _compile_hospital_bed_mappers(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> List[FieldMapper]:
+    return [
+        _compile_hospital_type_mapper(HospitalBedsInfo.HOSPITAL_TYPE_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsInfo.AVAILABLE_COVID_BEDS_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsInfo.AVAILABLE_NO_OXYGEN_BEDS_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsInfo.AVAILABLE_OXYGEN_BEDS_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsInfo.TOTAL_AVAILABLE_BEDS_LABEL, res_mapping_desc),
+        lambda web_src_res_info, covisearch_res: HospitalBedsInfo.fill_remaining_bed_fields(covisearch_res)
+    ]
 
 
-def _map_ecmo(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                   covisearch_res: Dict):
-    pass
+def _compile_hospital_bed_icu_mappers(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> List[FieldMapper]:
+    return [
+        _compile_hospital_type_mapper(HospitalBedsICUInfo.HOSPITAL_TYPE_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsICUInfo.AVAILABLE_NO_VENTILATOR_BEDS_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsICUInfo.AVAILABLE_VENTILATOR_BEDS_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsICUInfo.TOTAL_AVAILABLE_BEDS_LABEL, res_mapping_desc),
+        _compile_bed_field_mapper(HospitalBedsICUInfo.AVAILABLE_VENTILATORS_LABEL, res_mapping_desc),
+        lambda web_src_res_info, covisearch_res: HospitalBedsICUInfo.fill_remaining_bed_fields(covisearch_res)
+    ]
 
 
-def _map_food(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                   covisearch_res: Dict):
-    pass
+def _compile_hospital_type_mapper(hospital_type_label: str,
+                                  res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
+    if hospital_type_label not in res_mapping_desc:
+        return _compile_constant_field_mapper(hospital_type_label, None)
 
+    web_src_field_names = res_mapping_desc[hospital_type_label].web_src_field_names
 
-def _map_testing(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                   covisearch_res: Dict):
-    pass
+    def map_hospital_type(web_src_res_info: Dict, covisearch_res: Dict):
+        covisearch_res[hospital_type_label] = \
+            _stitch_multiple_mapped_fields(web_src_field_names, web_src_res_info, ' | ', 3)
 
+    return map_hospital_type
 
-def _map_medicine(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                  covisearch_res: Dict):
-    pass
 
+def _compile_bed_field_mapper(bed_field_label: str,
+                              res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> FieldMapper:
+    if bed_field_label not in res_mapping_desc:
+        return _compile_constant_field_mapper(bed_field_label, None)
 
-def _map_ventilator(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                    covisearch_res: Dict):
-    pass
+    web_src_field_name = res_mapping_desc[bed_field_label].first_web_src_field_name
 
+    def map_bed_field(web_src_res_info: Dict, covisearch_res: Dict):
+        re_bed_field_result = re_available_beds_pattern.search(web_src_res_info[web_src_field_name])
+        if re_bed_field_result is not None:
+            covisearch_res[bed_field_label] = int(re_bed_field_result.group(1))
+        else:
+            covisearch_res[bed_field_label] = None
 
-def _map_helpline(web_src_res_info: Dict, res_mapping_desc: Dict[str, 'FieldMappingDesc'],
-                  covisearch_res: Dict):
-    pass
+    return map_bed_field
+
+
+# NOTE: For ambulance, ecmo, food, testing, medicines, ventilator and helpline.
+def _compile_no_specific_mappers(res_mapping_desc: Dict[str, 'FieldMappingDesc']) -> List[FieldMapper]:
+    return []
+
+
+_specific_res_info_mappers_compilers = {
+    entities.CovidResourceType.PLASMA: _compile_plasma_mappers,
+    entities.CovidResourceType.OXYGEN: _compile_oxygen_mappers,
+    entities.CovidResourceType.HOSPITAL_BED: _compile_hospital_bed_mappers,
+    entities.CovidResourceType.HOSPITAL_BED_ICU: _compile_hospital_bed_icu_mappers,
+    entities.CovidResourceType.AMBULANCE: _compile_no_specific_mappers,
+    entities.CovidResourceType.ECMO: _compile_no_specific_mappers,
+    entities.CovidResourceType.FOOD: _compile_no_specific_mappers,
+    entities.CovidResourceType.TESTING: _compile_no_specific_mappers,
+    entities.CovidResourceType.MEDICINE: _compile_no_specific_mappers,
+    entities.CovidResourceType.VENTILATOR: _compile_no_specific_mappers,
+    entities.CovidResourceType.HELPLINE: _compile_no_specific_mappers,
+    entities.CovidResourceType.BLOOD: _compile_blood_mappers,
+    entities.CovidResourceType.MED_AMPHOTERICIN_B: _compile_no_specific_mappers,
+    entities.CovidResourceType.MED_CRESEMBA: _compile_no_specific_mappers,
+    entities.CovidResourceType.MED_TOCILIZUMAB: _compile_no_specific_mappers,
+    entities.CovidResourceType.MED_OSELTAMIVIR: _compile_no_specific_mappers,
+    entities.CovidResourceType.MED_AMPHOLYN: _compile_no_specific_mappers,
+    entities.CovidResourceType.MED_POSACONAZOLE: _compile_no_specific_mappers,
+    entities.CovidResourceType.MED_FABIFLU: _compile_no_specific_mappers,
+    entities.CovidResourceType.OXY_CONCENTRATOR: _compile_oxygen_mappers,
+    entities.CovidResourceType.OXY_REGULATOR: _compile_oxygen_mappers,
+    entities.CovidResourceType.OXY_REFILL: _compile_oxygen_mappers,
+    entities.CovidResourceType.OXY_CYLINDER: _compile_oxygen_mappers
+}
 
 
 # NOTE: KAPIL: Converts all phones to National phone number format for accurate matching.
@@ -592,7 +769,7 @@ def _extract_and_uniformized_phones(non_uniform_phones: str, city: str, need_exa
                                                                            need_exact_match)]
 
 
-re_phones_pattern = re.compile('(\(*\d{3,10}(\s|-|\(|\))*\d{0,10}(\s|-|\(|\))*\d{0,10})')
+re_phones_pattern = re.compile(r'(\(*\d{3,10}(\s|-|\(|\))*\d{0,10}(\s|-|\(|\))*\d{0,10})')
 
 
 # NOTE: KAPIL: Returns list because one phone number string may end up having more than
@@ -653,7 +830,7 @@ def _sanitize_string_field(field_value: str) -> str:
 class FieldMappingDesc:
     DATETIMEFORMAT_TOKEN = 'datetimeformat'
     NEED_EXACT_PHONE_NUMBER_MATCH_TOKEN = 'need_exact_phone_number_match'
-    re_datetime_fmt_str_pattern = re.compile('\((.*)\)')
+    re_datetime_fmt_str_pattern = re.compile(r'\((.*)\)')
 
     def __init__(self, field_mapping_desc: Tuple[str, str]):
         self._covisearch_field_name: str = field_mapping_desc[0]
@@ -111,6 +111,15 @@ def _firestore_to_web_src(
 
         city_mapping = web_src_dict['city_mapping'] if 'city_mapping' in web_src_dict else None
 
+        request_timeout_sec = web_src_dict['request_timeout_sec'] \
+            if 'request_timeout_sec' in web_src_dict else None
+
+        data_table_partition_column = web_src_dict['data_table_partition_column'] \
+            if 'data_table_partition_column' in web_src_dict else None
+
+        is_request_idempotent = web_src_dict['is_request_idempotent'] \
+            if 'is_request_idempotent' in web_src_dict else False
+
         return resourcemapping.WebSource(
             web_src_dict['name'], web_src_dict['homepage_url'],
             web_src_dict['web_resource_url_template'],
@@ -123,7 +132,8 @@ def _firestore_to_web_src(
             resource_types_needing_smart_match,
             _get_resource_mapping_desc_model(web_src_dict['resource_mapping_desc']),
             web_src_dict['resource_type_label_mapping'],
-            city_name_case_mapping, city_mapping, search_filter)
+            city_name_case_mapping, city_mapping, search_filter, request_timeout_sec,
+            data_table_partition_column, is_request_idempotent)
 
     except resourcemapping.NoResourceTypeMappingError:
         return None
@@ -0,0 +1,131 @@
+from typing import Dict
+import collections
+import enum
+import threading
+import time
+
+
+# NOTE: Circuit breaker per web source. A source which keeps timing out or failing is still
+# requested in every filter of every resync and adds its timeout to each aggregation. Breaker
+# tracks outcomes of last requests to a source and stops requests to it once too many fail.
+# -CLOSED: requests allowed. Opens when failure rate of last 'window_size' requests reaches
+# 'failure_rate_threshold', once at least 'min_requests' were made.
+# -OPEN: requests skipped. After 'open_duration_sec' one probe request is allowed (HALF_OPEN).
+# -HALF_OPEN: probe success closes breaker, probe failure opens it again. If probe outcome is
+# not recorded within 'open_duration_sec', eg: its aggregation failed, another probe is allowed.
+# Responses slower than 'slow_response_sec' count as failures, as they hold up aggregation too.
+# Sources:
+#   -Martin Fowler: CircuitBreaker:
+#   https://martinfowler.com/bliki/CircuitBreaker.html
+#   -Microsoft Docs: Circuit Breaker pattern:
+#   https://docs.microsoft.com/en-us/azure/architecture/patterns/circuit-breaker
+class CircuitState(enum.Enum):
+    CLOSED = 1
+    OPEN = 2
+    HALF_OPEN = 3
+
+
+# NOTE: Not thread-safe. Guarded by owning CircuitBreakerRegistry's lock.
+class CircuitBreaker:
+    def __init__(self, window_size: int, min_requests: int, failure_rate_threshold: float,
+                 open_duration_sec: float, slow_response_sec: float):
+        self._outcomes: collections.deque = collections.deque(maxlen=window_size)
+        self._min_requests: int = min_requests
+        self._failure_rate_threshold: float = failure_rate_threshold
+        self._open_duration_sec: float = open_duration_sec
+        self._slow_response_sec: float = slow_response_sec
+        self._state: CircuitState = CircuitState.CLOSED
+        # NOTE: When breaker opened, or when last probe was allowed in HALF_OPEN state.
+        self._state_change_time: float = 0.0
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow_request(self) -> bool:
+        if self._state is CircuitState.CLOSED:
+            return True
+
+        if time.monotonic() - self._state_change_time < self._open_duration_sec:
+            return False
+
+        self._state = CircuitState.HALF_OPEN
+        self._state_change_time = time.monotonic()
+        return True
+
+    def record_success(self, latency_sec: float):
+        if latency_sec is not None and self._slow_response_sec is not None and latency_sec > self._slow_response_sec:
+            self.record_failure()
+            return
+
+        if self._state is CircuitState.HALF_OPEN:
+            self._close()
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self._state is CircuitState.HALF_OPEN:
+            self._open()
+            return
+
+        self._outcomes.append(False)
+        if self._state is CircuitState.CLOSED and self._is_failure_rate_over_threshold():
+            self._open()
+
+    def _is_failure_rate_over_threshold(self) -> bool:
+        if len(self._outcomes) < self._min_requests:
+            return False
+        failure_count = sum(1 for outcome in self._outcomes if not outcome)
+        return failure_count / len(self._outcomes) >= self._failure_rate_threshold
+
+    def _open(self):
+        self._state = CircuitState.OPEN
+        self._state_change_time = time.monotonic()
+
+    def _close(self):
+        self._state = CircuitState.CLOSED
+        self._outcomes.clear()
+
+
+# NOTE: Process-wide breakers keyed by source name, so that health learned in one aggregation
+# applies to next ones of a warm instance.
+class CircuitBreakerRegistry:
+    DEFAULT_WINDOW_SIZE = 10
+    DEFAULT_MIN_REQUESTS = 4
+    DEFAULT_FAILURE_RATE_THRESHOLD = 0.75
+    DEFAULT_OPEN_DURATION_SEC = 300.0
+
+    def __init__(self, window_size: int = DEFAULT_WINDOW_SIZE, min_requests: int = DEFAULT_MIN_REQUESTS,
+                 failure_rate_threshold: float = DEFAULT_FAILURE_RATE_THRESHOLD,
+                 open_duration_sec: float = DEFAULT_OPEN_DURATION_SEC, slow_response_sec: float = None):
+        self._window_size: int = window_size
+        self._min_requests: int = min_requests
+        self._failure_rate_threshold: float = failure_rate_threshold
+        self._open_duration_sec: float = open_duration_sec
+        # NOTE: 'None' means only errors and timeouts count as failures.
+        self._slow_response_sec: float = slow_response_sec
+        self._circuit_breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def allow_request(self, key: str) -> bool:
+        with self._lock:
+            return self._get_circuit_breaker(key).allow_request()
+
+    def record_success(self, key: str, latency_sec: float = None):
+        with self._lock:
+            self._get_circuit_breaker(key).record_success(latency_sec)
+
+    def record_failure(self, key: str):
+        with self._lock:
+            self._get_circuit_breaker(key).record_failure()
+
+    def get_state(self, key: str) -> CircuitState:
+        with self._lock:
+            return self._get_circuit_breaker(key).state
+
+    def _get_circuit_breaker(self, key: str) -> CircuitBreaker:
+        if key not in self._circuit_breakers:
+            self._circuit_breakers[key] = CircuitBreaker(
+                self._window_size, self._min_requests, self._failure_rate_threshold,
+                self._open_duration_sec, self._slow_response_sec)
+        return self._circuit_breakers[key]
@@ -0,0 +1,50 @@
+from typing import List, Union
+import collections
+import hashlib
+import threading
+
+
+# NOTE: Cache keyed by fingerprint of content, for results which are a pure function of
+# that content. Eg: ScrapedData parsed from byte-for-byte same response body with same
+# selectors and filters. Many web sources ignore conditional requests but return same body
+# across resync cycles, so this skips parsing and mapping for them.
+# Bounded LRU, safe to share between scraper threads.
+class ContentFingerprintCache:
+    DEFAULT_MAX_ENTRIES = 1000
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._max_entries: int = max_entries
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: str) -> object:
+        with self._lock:
+            if fingerprint not in self._entries:
+                return None
+            self._entries.move_to_end(fingerprint)
+            return self._entries[fingerprint]
+
+    def set(self, fingerprint: str, value: object):
+        with self._lock:
+            self._entries[fingerprint] = value
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# NOTE: Text is hashed as UTF-8, so text and its UTF-8 bytes have same fingerprint.
+def get_content_fingerprint(content: Union[str, bytes]) -> str:
+    if isinstance(content, str):
+        content = content.encode('utf-8', errors='surrogatepass')
+    return hashlib.sha256(content).hexdigest()
+
+
+def combine_fingerprints(fingerprints: List[str]) -> str:
+    return hashlib.sha256('\n'.join(fingerprints).encode('utf-8')).hexdigest()
@@ -0,0 +1,224 @@
+from typing import Callable, Dict, List, Tuple
+import concurrent.futures
+import heapq
+import threading
+import time
+import traceback
+
+from covisearch.util.mytypes import URL as URL
+import covisearch.util.hostlimits as hostlimits
+
+
+_future_completion_lock = threading.Lock()
+_hedge_scheduler: '_HedgeScheduler' = None
+_hedge_scheduler_lock = threading.Lock()
+
+
+# NOTE: Hedged requests. A few sources have heavy-tailed latency and their outliers set the
+# makespan of an aggregation. If a request has not been answered within p90 latency of its
+# host, an identical second request is sent and whichever answers first is used.
+# -Well-behaved hosts rarely cross their own p90, so they are rarely hedged.
+# -Only idempotent requests are hedged, ie: GET requests, and POST requests of sources marked
+# idempotent, eg: search APIs, as a hedge sends request twice.
+# -Hedges of a host are limited by a budget: each request adds 'budget_ratio' of a hedge,
+# up to 'max_budget' hedges. So hedges add at most ~'budget_ratio' of host's load, even when
+# host as a whole slows down, instead of doubling it.
+# Sources:
+#   -Jeffrey Dean, Luiz Andre Barroso: The Tail at Scale:
+#   https://research.google/pubs/pub40801/
+#   -gRPC: Client Retries and Hedging (A6), throttling of hedged requests:
+#   https://github.com/grpc/proposal/blob/master/A6-client-retries.md
+class RequestHedging:
+    DEFAULT_PERCENTILE = 90.0
+    DEFAULT_MIN_SAMPLES = 10
+    DEFAULT_BUDGET_RATIO = 0.1
+    DEFAULT_MAX_BUDGET = 2.0
+
+    def __init__(self, percentile: float = DEFAULT_PERCENTILE, min_samples: int = DEFAULT_MIN_SAMPLES,
+                 budget_ratio: float = DEFAULT_BUDGET_RATIO, max_budget: float = DEFAULT_MAX_BUDGET):
+        # NOTE: Requests slower than this percentile of their host's latency are hedged.
+        self._percentile: float = percentile
+        # NOTE: Requests to hosts with fewer recorded latencies are not hedged.
+        self._min_samples: int = min_samples
+        self._budget_ratio: float = budget_ratio
+        self._max_budget: float = max_budget
+        self._budget_by_host: Dict[str, float] = {}
+        self._hedge_count_by_host: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def percentile(self) -> float:
+        return self._percentile
+
+    @property
+    def min_samples(self) -> int:
+        return self._min_samples
+
+    def record_request(self, url: URL):
+        host = hostlimits.get_host(url)
+        with self._lock:
+            self._budget_by_host[host] = min(self._max_budget,
+                                             self._budget_by_host.get(host, 0.0) + self._budget_ratio)
+
+    def try_acquire_hedge(self, url: URL) -> bool:
+        host = hostlimits.get_host(url)
+        with self._lock:
+            if self._budget_by_host.get(host, 0.0) < 1.0:
+                return False
+            self._budget_by_host[host] -= 1.0
+            self._hedge_count_by_host[host] = self._hedge_count_by_host.get(host, 0) + 1
+            return True
+
+    def get_hedge_count(self, url: URL) -> int:
+        with self._lock:
+            return self._hedge_count_by_host.get(hostlimits.get_host(url), 0)
+
+
+# NOTE: Sends blocking request on calling thread. Only if it has not returned within
+# 'hedge_delay_sec' and 'try_acquire_hedge' allows it, 'send_hedge' sends a hedge on a thread
+# of its own, so requests answered in time cost no extra thread.
+# -Blocking requests cannot be cancelled, so caller stays blocked till its own attempt returns.
+# A successful hedge instead completes 'result_future' right away, for callers waiting on it.
+# Losing hedge runs to completion, but its result is dropped.
+# -Returns first successful result, same as 'get_first_successful_result'.
+def send_with_hedge(send_request: Callable[[], object], hedge_delay_sec: float,
+                    send_hedge: Callable[[], object], try_acquire_hedge: Callable[[], bool],
+                    is_successful_result: Callable[[object], bool] = None,
+                    result_future: concurrent.futures.Future = None) -> object:
+    def send_hedge_and_complete_result_future():
+        result = send_hedge()
+        if result_future is not None and (is_successful_result is None or is_successful_result(result)):
+            set_result_if_pending(result_future, result)
+        return result
+
+    scheduled_hedge = _ScheduledHedge(send_hedge_and_complete_result_future, try_acquire_hedge)
+    _get_hedge_scheduler().schedule(scheduled_hedge, hedge_delay_sec)
+    request_future = concurrent.futures.Future()
+    try:
+        request_future.set_result(send_request())
+    except Exception as ex:
+        request_future.set_exception(ex)
+
+    hedge_future = scheduled_hedge.cancel()
+    if hedge_future is None:
+        return request_future.result()
+    return get_first_successful_result([request_future, hedge_future], is_successful_result)
+
+
+# NOTE: First of request and its hedge to complete a future wins. As futures of Python 3.7
+# do not refuse a second result, completion is checked under a lock.
+def set_result_if_pending(future: concurrent.futures.Future, result: object) -> bool:
+    with _future_completion_lock:
+        if future.done():
+            return False
+        future.set_result(result)
+        return True
+
+
+def set_exception_if_pending(future: concurrent.futures.Future, exception: Exception) -> bool:
+    with _future_completion_lock:
+        if future.done():
+            return False
+        future.set_exception(exception)
+        return True
+
+
+def run_in_thread(func: Callable[[], object]) -> concurrent.futures.Future:
+    future = concurrent.futures.Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func())
+        except Exception as ex:
+            future.set_exception(ex)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+# NOTE: Result of first attempt to succeed. Attempts raising, or returning a result for which
+# 'is_successful_result' is false, eg: HTTP 503 response, are failed, and other attempts are
+# waited for. If all attempts failed, returns last failed result, or raises exception of last
+# attempt if none returned a result.
+def get_first_successful_result(attempt_futures: List[concurrent.futures.Future],
+                                is_successful_result: Callable[[object], bool] = None) -> object:
+    pending_futures = set(attempt_futures)
+    has_failed_result = False
+    failed_result = None
+    exception = None
+    while pending_futures:
+        done_futures, pending_futures = concurrent.futures.wait(
+            pending_futures, return_when=concurrent.futures.FIRST_COMPLETED)
+        for done_future in done_futures:
+            if done_future.exception() is not None:
+                exception = done_future.exception()
+            elif is_successful_result is None or is_successful_result(done_future.result()):
+                return done_future.result()
+            else:
+                has_failed_result = True
+                failed_result = done_future.result()
+
+    if has_failed_result:
+        return failed_result
+    raise exception
+
+
+class _ScheduledHedge:
+    def __init__(self, send_hedge: Callable[[], object], try_acquire_hedge: Callable[[], bool]):
+        self._send_hedge: Callable[[], object] = send_hedge
+        self._try_acquire_hedge: Callable[[], bool] = try_acquire_hedge
+        self._is_cancelled: bool = False
+        self._hedge_future: concurrent.futures.Future = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._is_cancelled and self._try_acquire_hedge():
+                self._hedge_future = run_in_thread(self._send_hedge)
+
+    # NOTE: Returns future of hedge if it was started before being cancelled, else 'None'.
+    def cancel(self) -> concurrent.futures.Future:
+        with self._lock:
+            self._is_cancelled = True
+            return self._hedge_future
+
+
+# NOTE: One daemon thread starts due hedges of all requests, instead of a timer thread per
+# request. Cancelled hedges are dropped when due.
+class _HedgeScheduler:
+    def __init__(self):
+        self._scheduled_hedges: List[Tuple[float, int, _ScheduledHedge]] = []
+        self._scheduled_hedge_count: int = 0
+        self._condition = threading.Condition()
+        threading.Thread(target=self._start_due_hedges, daemon=True).start()
+
+    def schedule(self, scheduled_hedge: _ScheduledHedge, delay_sec: float):
+        with self._condition:
+            self._scheduled_hedge_count += 1
+            heapq.heappush(self._scheduled_hedges,
+                           (time.monotonic() + delay_sec, self._scheduled_hedge_count, scheduled_hedge))
+            self._condition.notify()
+
+    def _start_due_hedges(self):
+        while True:
+            with self._condition:
+                while not self._scheduled_hedges or self._scheduled_hedges[0][0] > time.monotonic():
+                    self._condition.wait(
+                        self._scheduled_hedges[0][0] - time.monotonic() if self._scheduled_hedges else None)
+                _, _, scheduled_hedge = heapq.heappop(self._scheduled_hedges)
+
+            try:
+                scheduled_hedge.start()
+            except Exception:
+                print('Exception while starting hedged request. Ignoring error.')
+                print(traceback.print_exc())
+
+
+def _get_hedge_scheduler() -> _HedgeScheduler:
+    global _hedge_scheduler
+    with _hedge_scheduler_lock:
+        if _hedge_scheduler is None:
+            _hedge_scheduler = _HedgeScheduler()
+        return _hedge_scheduler
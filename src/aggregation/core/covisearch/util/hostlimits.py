@@ -0,0 +1,262 @@
+from typing import Dict
+import asyncio
+import email.utils
+import threading
+import time
+import urllib.parse
+
+from covisearch.util.mytypes import URL as URL
+
+
+# NOTE: Per-host limits on requests sent to web sources. Several sources (and every resource
+# type of a source) are often served by one host, eg: 'api.covidcitizens.org'. Firing all of
+# them at once makes such hosts reply with HTTP 429 or slow down, and those responses are lost.
+# -Concurrency limit per host adapts with AIMD: grows by one request per 'limit' successes and
+# halves on overload, i.e. HTTP 429/5xx, timeouts and connection errors. Responses much slower
+# than the fastest one seen also shrink it a bit, before host starts failing.
+# -Token bucket per host caps request rate, with rate adapting the same way.
+# -'Retry-After' of a 429/503 response pauses the host till then.
+# Sources:
+#   -Netflix Tech Blog: Performance Under Load (adaptive concurrency limits):
+#   https://netflixtechblog.medium.com/performance-under-load-3e6fa9a60581
+#   -Wikipedia: Additive increase/multiplicative decrease:
+#   https://en.wikipedia.org/wiki/Additive_increase/multiplicative_decrease
+#   -Wikipedia: Token bucket:
+#   https://en.wikipedia.org/wiki/Token_bucket
+#   -MDN Docs: Retry-After:
+#   https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Retry-After
+HTTP_TOO_MANY_REQUESTS = 429
+HTTP_SERVICE_UNAVAILABLE = 503
+
+
+# NOTE: Not thread-safe. Guarded by owning HostLimiter's lock.
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, burst: int):
+        self._rate_per_sec: float = rate_per_sec
+        self._burst: int = burst
+        self._tokens: float = float(burst)
+        self._last_refill_time: float = time.monotonic()
+
+    @property
+    def rate_per_sec(self) -> float:
+        return self._rate_per_sec
+
+    def set_rate_per_sec(self, rate_per_sec: float):
+        self._refill(time.monotonic())
+        self._rate_per_sec = rate_per_sec
+
+    # NOTE: Returns 0 if token was taken, else seconds till next token.
+    def try_take(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self._rate_per_sec
+
+    def _refill(self, now: float):
+        self._tokens = min(float(self._burst), self._tokens + (now - self._last_refill_time) * self._rate_per_sec)
+        self._last_refill_time = now
+
+
+# NOTE: Not thread-safe. Guarded by owning HostLimiter's lock.
+class AdaptiveConcurrencyLimit:
+    OVERLOAD_DECREASE_FACTOR = 0.5
+    SLOW_RESPONSE_DECREASE_FACTOR = 0.9
+    # NOTE: Response is slow if it took this many times the fastest response of host.
+    SLOW_RESPONSE_LATENCY_FACTOR = 4.0
+    # NOTE: Responses faster than this are never slow, so that jitter of fast hosts is ignored.
+    MIN_SLOW_RESPONSE_LATENCY_SEC = 2.0
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int):
+        self._limit: float = float(initial_limit)
+        self._min_limit: int = min_limit
+        self._max_limit: int = max_limit
+        self._min_latency_sec: float = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def on_response(self, latency_sec: float):
+        if self._is_slow_response(latency_sec):
+            self._limit = max(float(self._min_limit), self._limit * self.SLOW_RESPONSE_DECREASE_FACTOR)
+        else:
+            self._limit = min(float(self._max_limit), self._limit + 1.0 / self._limit)
+
+        if latency_sec is not None and (self._min_latency_sec is None or latency_sec < self._min_latency_sec):
+            self._min_latency_sec = latency_sec
+
+    def on_overload(self):
+        self._limit = max(float(self._min_limit), self._limit * self.OVERLOAD_DECREASE_FACTOR)
+
+    def _is_slow_response(self, latency_sec: float) -> bool:
+        if latency_sec is None or self._min_latency_sec is None:
+            return False
+        return latency_sec > max(self.MIN_SLOW_RESPONSE_LATENCY_SEC,
+                                 self._min_latency_sec * self.SLOW_RESPONSE_LATENCY_FACTOR)
+
+
+class HostLimiter:
+    # NOTE: Poll interval while waiting for a request of host to complete.
+    CONCURRENCY_WAIT_SEC = 0.05
+    RATE_INCREASE_PER_SEC = 1.0
+    RATE_DECREASE_FACTOR = 0.5
+
+    def __init__(self, initial_concurrency: int, max_concurrency: int, initial_rate_per_sec: float,
+                 min_rate_per_sec: float, max_rate_per_sec: float, max_retry_after_sec: float):
+        self._concurrency_limit = AdaptiveConcurrencyLimit(initial_concurrency, 1, max_concurrency)
+        self._token_bucket = TokenBucket(initial_rate_per_sec, max_concurrency)
+        self._min_rate_per_sec: float = min_rate_per_sec
+        self._max_rate_per_sec: float = max_rate_per_sec
+        self._max_retry_after_sec: float = max_retry_after_sec
+        self._in_flight_requests: int = 0
+        self._paused_till: float = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def concurrency_limit(self) -> int:
+        with self._lock:
+            return self._concurrency_limit.limit
+
+    @property
+    def rate_per_sec(self) -> float:
+        with self._lock:
+            return self._token_bucket.rate_per_sec
+
+    # NOTE: Returns 0 if request may be sent now, else seconds to wait before trying again.
+    # Request must be followed by one of the 'release_*' methods.
+    def try_acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_till:
+                return self._paused_till - now
+            if self._in_flight_requests >= self._concurrency_limit.limit:
+                return self.CONCURRENCY_WAIT_SEC
+
+            wait_sec = self._token_bucket.try_take()
+            if wait_sec > 0.0:
+                return wait_sec
+            self._in_flight_requests += 1
+            return 0.0
+
+    # NOTE: Waits till request may be sent. Returns 'False' without waiting if that would take
+    # longer than 'timeout_sec', eg: time left till scraping deadline. 'None' waits as needed.
+    # Blocks calling thread. Thread pool callers should rather use 'try_acquire' and resubmit
+    # request later, so that their worker is not held while waiting.
+    def acquire(self, timeout_sec: float = None) -> bool:
+        end_time = None if timeout_sec is None else time.monotonic() + timeout_sec
+        wait_sec = self.try_acquire()
+        while wait_sec > 0.0:
+            if end_time is not None and time.monotonic() + wait_sec > end_time:
+                return False
+            time.sleep(wait_sec)
+            wait_sec = self.try_acquire()
+        return True
+
+    async def acquire_async(self, timeout_sec: float = None) -> bool:
+        end_time = None if timeout_sec is None else time.monotonic() + timeout_sec
+        wait_sec = self.try_acquire()
+        while wait_sec > 0.0:
+            if end_time is not None and time.monotonic() + wait_sec > end_time:
+                return False
+            await asyncio.sleep(wait_sec)
+            wait_sec = self.try_acquire()
+        return True
+
+    def release_after_response(self, status_code: int, latency_sec: float, retry_after_sec: float = None):
+        with self._lock:
+            self._in_flight_requests -= 1
+            if is_overload_status_code(status_code):
+                self._on_overload()
+                if retry_after_sec is not None:
+                    self._paused_till = max(
+                        self._paused_till, time.monotonic() + min(retry_after_sec, self._max_retry_after_sec))
+                return
+
+            self._concurrency_limit.on_response(latency_sec)
+            self._token_bucket.set_rate_per_sec(
+                min(self._max_rate_per_sec, self._token_bucket.rate_per_sec + self.RATE_INCREASE_PER_SEC))
+
+    # NOTE: For timeouts and connection errors.
+    def release_after_error(self):
+        with self._lock:
+            self._in_flight_requests -= 1
+            self._on_overload()
+
+    # NOTE: For requests cut off by caller, which say nothing about host.
+    def release_without_feedback(self):
+        with self._lock:
+            self._in_flight_requests -= 1
+
+    # NOTE: Retrying is worth it only if host asked to wait briefly. Else it is left to next resync.
+    def should_retry_after(self, status_code: int, retry_after_sec: float) -> bool:
+        if status_code not in (HTTP_TOO_MANY_REQUESTS, HTTP_SERVICE_UNAVAILABLE):
+            return False
+        return retry_after_sec is None or retry_after_sec <= self._max_retry_after_sec
+
+    def _on_overload(self):
+        self._concurrency_limit.on_overload()
+        self._token_bucket.set_rate_per_sec(
+            max(self._min_rate_per_sec, self._token_bucket.rate_per_sec * self.RATE_DECREASE_FACTOR))
+
+
+# NOTE: Process-wide limiters, one per host, so that learned limits survive across scraping calls
+# of a warm instance.
+class HostLimiterRegistry:
+    DEFAULT_INITIAL_CONCURRENCY = 4
+    DEFAULT_MAX_CONCURRENCY = 16
+    DEFAULT_INITIAL_RATE_PER_SEC = 10.0
+    DEFAULT_MIN_RATE_PER_SEC = 0.5
+    DEFAULT_MAX_RATE_PER_SEC = 50.0
+    DEFAULT_MAX_RETRY_AFTER_SEC = 5.0
+
+    def __init__(self, initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 initial_rate_per_sec: float = DEFAULT_INITIAL_RATE_PER_SEC,
+                 min_rate_per_sec: float = DEFAULT_MIN_RATE_PER_SEC,
+                 max_rate_per_sec: float = DEFAULT_MAX_RATE_PER_SEC,
+                 max_retry_after_sec: float = DEFAULT_MAX_RETRY_AFTER_SEC):
+        self._initial_concurrency: int = initial_concurrency
+        self._max_concurrency: int = max_concurrency
+        self._initial_rate_per_sec: float = initial_rate_per_sec
+        self._min_rate_per_sec: float = min_rate_per_sec
+        self._max_rate_per_sec: float = max_rate_per_sec
+        self._max_retry_after_sec: float = max_retry_after_sec
+        self._host_limiters: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get_host_limiter(self, url: URL) -> HostLimiter:
+        host = get_host(url)
+        with self._lock:
+            if host not in self._host_limiters:
+                self._host_limiters[host] = HostLimiter(
+                    self._initial_concurrency, self._max_concurrency, self._initial_rate_per_sec,
+                    self._min_rate_per_sec, self._max_rate_per_sec, self._max_retry_after_sec)
+            return self._host_limiters[host]
+
+
+# NOTE: Key of per-host state, eg: limits, latencies, hedge budgets. One host serves URLs of
+# all filters of a source.
+def get_host(url: URL) -> str:
+    return urllib.parse.urlsplit(url).netloc.lower()
+
+
+def is_overload_status_code(status_code: int) -> bool:
+    return status_code == HTTP_TOO_MANY_REQUESTS or status_code >= 500
+
+
+# NOTE: 'Retry-After' is either seconds or an HTTP date. Returns 'None' if absent or invalid.
+def parse_retry_after_sec(retry_after: str) -> float:
+    if not retry_after:
+        return None
+    if retry_after.strip().isdigit():
+        return float(retry_after.strip())
+
+    try:
+        retry_after_datetime = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_after_datetime is None:
+        return None
+    return max(0.0, retry_after_datetime.timestamp() - time.time())
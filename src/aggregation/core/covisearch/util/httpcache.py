@@ -0,0 +1,140 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Union
+import collections
+import hashlib
+import os
+import pickle
+import threading
+import traceback
+
+from covisearch.util.mytypes import URL as URL
+
+
+# NOTE: Cache of web source responses for conditional GET/POST.
+# -Stores validators ('ETag', 'Last-Modified') and body of last 200 response per URL + request body.
+# -Next request for same key sends 'If-None-Match' / 'If-Modified-Since'. If source replies with
+# HTTP 304 Not Modified, body is not downloaded again and scraped data saved with the entry is
+# reused without re-parsing, provided it was scraped with same selectors and filters.
+# Sources:
+#   -MDN Docs: HTTP conditional requests:
+#   https://developer.mozilla.org/en-US/docs/Web/HTTP/Conditional_requests
+#   -RFC 7232: HTTP/1.1 Conditional Requests:
+#   https://datatracker.ietf.org/doc/html/rfc7232
+class CachedResponse:
+    def __init__(self, etag: str, last_modified: str, response_content: Union[str, bytes],
+                 scraping_params_fingerprint: str, scraped_data: object):
+        self._etag: str = etag
+        self._last_modified: str = last_modified
+        self._response_content: Union[str, bytes] = response_content
+        self._scraping_params_fingerprint: str = scraping_params_fingerprint
+        # NOTE: 'websitedatascraper.ScrapedData'. Not typed to avoid circular import.
+        self._scraped_data: object = scraped_data
+
+    @property
+    def etag(self) -> str:
+        return self._etag
+
+    @property
+    def last_modified(self) -> str:
+        return self._last_modified
+
+    @property
+    def response_content(self) -> Union[str, bytes]:
+        return self._response_content
+
+    @property
+    def scraping_params_fingerprint(self) -> str:
+        return self._scraping_params_fingerprint
+
+    @property
+    def scraped_data(self) -> object:
+        return self._scraped_data
+
+    def get_conditional_request_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        return headers
+
+    def has_validators(self) -> bool:
+        return bool(self._etag or self._last_modified)
+
+
+class ResponseCacheStore(ABC):
+    @abstractmethod
+    def get(self, cache_key: str) -> CachedResponse:
+        raise NotImplementedError('ResponseCacheStore is an interface')
+
+    @abstractmethod
+    def set(self, cache_key: str, cached_response: CachedResponse):
+        raise NotImplementedError('ResponseCacheStore is an interface')
+
+
+# NOTE: Bounded LRU store. Lives as long as the process, i.e. across invocations of a warm
+# Cloud Function instance.
+class InMemoryResponseCacheStore(ResponseCacheStore):
+    DEFAULT_MAX_ENTRIES = 500
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._max_entries: int = max_entries
+        self._cached_responses: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: str) -> CachedResponse:
+        with self._lock:
+            if cache_key not in self._cached_responses:
+                return None
+            self._cached_responses.move_to_end(cache_key)
+            return self._cached_responses[cache_key]
+
+    def set(self, cache_key: str, cached_response: CachedResponse):
+        with self._lock:
+            self._cached_responses[cache_key] = cached_response
+            self._cached_responses.move_to_end(cache_key)
+            while len(self._cached_responses) > self._max_entries:
+                self._cached_responses.popitem(last=False)
+
+
+# NOTE: One pickle file per cache key in given directory. Survives process restarts, eg: on a dev
+# box or with a mounted volume. Errors while reading/writing are treated as cache miss.
+class DiskResponseCacheStore(ResponseCacheStore):
+    CACHE_FILE_EXTENSION = '.pickle'
+
+    def __init__(self, cache_dir: str):
+        self._cache_dir: str = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, cache_key: str) -> CachedResponse:
+        cache_file_path = self._get_cache_file_path(cache_key)
+        if not os.path.exists(cache_file_path):
+            return None
+
+        try:
+            with open(cache_file_path, 'rb') as cache_file:
+                return pickle.load(cache_file)
+        except Exception:
+            print('Exception while reading response cache file: \'' + cache_file_path + '\'. Ignoring error.')
+            print(traceback.print_exc())
+            return None
+
+    def set(self, cache_key: str, cached_response: CachedResponse):
+        cache_file_path = self._get_cache_file_path(cache_key)
+        # NOTE: Write to temp file and rename so that concurrent readers never see half written file.
+        temp_file_path = cache_file_path + '.' + str(threading.get_ident()) + '.tmp'
+        try:
+            with open(temp_file_path, 'wb') as temp_file:
+                pickle.dump(cached_response, temp_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file_path, cache_file_path)
+        except Exception:
+            print('Exception while writing response cache file: \'' + cache_file_path + '\'. Ignoring error.')
+            print(traceback.print_exc())
+
+    def _get_cache_file_path(self, cache_key: str) -> str:
+        return os.path.join(self._cache_dir, cache_key + self.CACHE_FILE_EXTENSION)
+
+
+def get_cache_key(url: URL, request_body: str) -> str:
+    key_source = url + '\n' + (request_body if request_body is not None else '')
+    return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
@@ -0,0 +1,119 @@
+from typing import Dict, Union
+import enum
+import json
+import os
+import threading
+
+from covisearch.util.mytypes import URL as URL
+
+
+# NOTE: Record/replay of web source responses, for profiling and benchmarking scraping, mapping
+# and merging reproducibly on a dev box. Live sources change minute to minute.
+# -RECORD: requests go to network as usual and each response is saved to fixture dir.
+# -REPLAY: responses are served from fixture dir without network access. They go through same
+# parsing and mapping code as live responses. Requests without a fixture fail like a
+# crawling error.
+# Per request there are two files, named by request key of scraping params:
+# -'<key>.json': request (url, content type, body, headers) and response status and headers.
+# -'<key>.txt': response body, same as files in 'web source response samples'. Saved as UTF-8
+# and replayed as bytes or text, whichever it was recorded as.
+# Use with response cache disabled while recording, else 304s without body are recorded.
+# Eg: webdatascraper.set_default_scraping_options(webdatascraper.ScrapingOptions(
+#         http_fixtures=httpfixtures.HttpFixtureStore('fixtures', httpfixtures.FixtureMode.RECORD)))
+class FixtureMode(enum.Enum):
+    RECORD = 1
+    REPLAY = 2
+
+
+class RecordedResponse:
+    def __init__(self, status_code: int, headers: Dict[str, str], content: Union[str, bytes],
+                 elapsed_sec: float):
+        self._status_code: int = status_code
+        self._headers: Dict[str, str] = headers
+        self._content: Union[str, bytes] = content
+        self._elapsed_sec: float = elapsed_sec
+
+    @property
+    def status_code(self) -> int:
+        return self._status_code
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return self._headers
+
+    @property
+    def content(self) -> Union[str, bytes]:
+        return self._content
+
+    @property
+    def elapsed_sec(self) -> float:
+        return self._elapsed_sec
+
+
+class HttpFixtureStore:
+    FIXTURE_FILE_EXTENSION = '.json'
+    CONTENT_FILE_EXTENSION = '.txt'
+
+    def __init__(self, fixture_dir: str, mode: FixtureMode):
+        self._fixture_dir: str = fixture_dir
+        self._mode: FixtureMode = mode
+        self._lock = threading.Lock()
+        if mode is FixtureMode.RECORD:
+            os.makedirs(fixture_dir, exist_ok=True)
+
+    @property
+    def fixture_dir(self) -> str:
+        return self._fixture_dir
+
+    @property
+    def mode(self) -> FixtureMode:
+        return self._mode
+
+    @property
+    def is_replaying(self) -> bool:
+        return self._mode is FixtureMode.REPLAY
+
+    def record(self, request_key: str, url: URL, request_content_type: str, request_body: str,
+               request_headers: Dict[str, str], recorded_response: RecordedResponse):
+        fixture = {
+            'request': {
+                'url': url,
+                'content_type': request_content_type,
+                'body': request_body,
+                'headers': request_headers,
+            },
+            'response': {
+                'status_code': recorded_response.status_code,
+                'headers': recorded_response.headers,
+                'elapsed_sec': recorded_response.elapsed_sec,
+                'is_content_bytes': isinstance(recorded_response.content, bytes),
+            },
+        }
+        content = recorded_response.content
+        if isinstance(content, str):
+            content = content.encode('utf-8', errors='surrogatepass')
+        # NOTE: Same request may be recorded from two threads, eg: concurrent scraping calls.
+        with self._lock:
+            with open(self._get_file_path(request_key, self.CONTENT_FILE_EXTENSION), 'wb') as content_file:
+                content_file.write(content)
+            with open(self._get_file_path(request_key, self.FIXTURE_FILE_EXTENSION), 'w',
+                      encoding='utf-8') as fixture_file:
+                json.dump(fixture, fixture_file, indent=2, sort_keys=True)
+
+    def load(self, request_key: str, url: URL) -> RecordedResponse:
+        fixture_file_path = self._get_file_path(request_key, self.FIXTURE_FILE_EXTENSION)
+        if not os.path.exists(fixture_file_path):
+            raise ValueError('No recorded fixture for url: \'' + url + '\' in \'' + self._fixture_dir + '\'')
+
+        with open(fixture_file_path, 'r', encoding='utf-8') as fixture_file:
+            response_fixture = json.load(fixture_file)['response']
+        with open(self._get_file_path(request_key, self.CONTENT_FILE_EXTENSION), 'rb') as content_file:
+            content = content_file.read()
+        if not response_fixture.get('is_content_bytes', False):
+            content = content.decode('utf-8', errors='surrogatepass')
+
+        return RecordedResponse(response_fixture['status_code'], response_fixture['headers'], content,
+                                response_fixture['elapsed_sec'])
+
+    def _get_file_path(self, request_key: str, file_extension: str) -> str:
+        return os.path.join(self._fixture_dir, request_key + file_extension)
@@ -0,0 +1,110 @@
+from typing import Dict
+import asyncio
+import atexit
+import threading
+import urllib.parse
+import http.cookiejar
+
+import requests
+import requests.adapters
+import aiohttp
+
+from covisearch.util.mytypes import URL as URL
+
+
+# NOTE: Process-wide HTTP sessions for scraping web sources.
+# -Module-level 'requests.get/post' opens a new TCP + TLS connection for every request. A
+# session per host keeps a pool of keep-alive connections which is reused by later requests.
+# -Globals are not reinitialized if same Cloud Function instance is re-used, so warm
+# instances reuse connections across 'aggregate_covid_resources' calls.
+# -Cookies are blocked so that sessions stay stateless like plain 'requests.get/post'.
+# Sources:
+#   -Requests Docs: Advanced Usage: Session Objects, Transport Adapters:
+#   https://docs.python-requests.org/en/master/user/advanced/
+#   -Google Cloud Docs: Tips & Tricks: Use global variables to reuse objects in future invocations:
+#   https://cloud.google.com/functions/docs/bestpractices/tips#use_global_variables_to_reuse_objects_in_future_invocations
+DEFAULT_POOL_SIZE = 20
+
+_pool_size: int = DEFAULT_POOL_SIZE
+_sessions_by_host: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+_event_loop: asyncio.AbstractEventLoop = None
+_async_session: aiohttp.ClientSession = None
+# NOTE: Shared event loop can run only one wave at a time. Async scraping from multiple threads
+# is serialized on this lock.
+_event_loop_lock = threading.Lock()
+
+
+def get_pool_size() -> int:
+    return _pool_size
+
+
+# NOTE: Closes existing sessions so that new pool size applies to all hosts.
+def set_pool_size(pool_size: int):
+    global _pool_size
+    if pool_size < 1:
+        raise ValueError('pool_size must be at least 1')
+
+    close_all_sessions()
+    _pool_size = pool_size
+
+
+def get_session_for_url(url: URL) -> requests.Session:
+    host_key = _get_host_key(url)
+
+    with _sessions_lock:
+        if host_key not in _sessions_by_host:
+            _sessions_by_host[host_key] = _create_session(_pool_size)
+        return _sessions_by_host[host_key]
+
+
+def run_on_shared_event_loop(coroutine_func):
+    global _event_loop
+
+    with _event_loop_lock:
+        if _event_loop is None or _event_loop.is_closed():
+            _event_loop = asyncio.new_event_loop()
+        return _event_loop.run_until_complete(coroutine_func())
+
+
+# NOTE: Must be called from a coroutine running on the shared event loop as aiohttp sessions are
+# bound to the loop they are created in.
+def get_async_session() -> aiohttp.ClientSession:
+    global _async_session
+
+    if _async_session is None or _async_session.closed:
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=_pool_size, ssl=False)
+        _async_session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+    return _async_session
+
+
+def close_all_sessions():
+    global _async_session
+
+    with _sessions_lock:
+        for session in _sessions_by_host.values():
+            session.close()
+        _sessions_by_host.clear()
+
+    with _event_loop_lock:
+        if _async_session is not None and not _async_session.closed:
+            _event_loop.run_until_complete(_async_session.close())
+        _async_session = None
+
+
+atexit.register(close_all_sessions)
+
+
+def _create_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def _get_host_key(url: URL) -> str:
+    parsed_url = urllib.parse.urlsplit(url)
+    return parsed_url.scheme.lower() + '://' + parsed_url.netloc.lower()
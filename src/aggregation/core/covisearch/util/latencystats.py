@@ -0,0 +1,57 @@
+from typing import Dict
+import collections
+import math
+import threading
+
+from covisearch.util.mytypes import URL as URL
+import covisearch.util.hostlimits as hostlimits
+
+
+# NOTE: Latencies of last requests to each host of web sources, learned across scraping calls
+# of a warm instance. Keyed by host, same as 'hostlimits', as one host serves URLs of all
+# filters of a source.
+# -Window of last 'window_size' latencies gives percentiles, eg: for hedging.
+# -Exponentially weighted moving average (EWMA) gives a cheap estimate of host's usual latency
+# which follows it as it drifts, eg: for launch order.
+# Sources:
+#   -Wikipedia: Exponential smoothing:
+#   https://en.wikipedia.org/wiki/Exponential_smoothing
+class LatencyStatsRegistry:
+    DEFAULT_WINDOW_SIZE = 50
+    DEFAULT_EWMA_WEIGHT = 0.3
+
+    def __init__(self, window_size: int = DEFAULT_WINDOW_SIZE, ewma_weight: float = DEFAULT_EWMA_WEIGHT):
+        self._window_size: int = window_size
+        # NOTE: Weight of latest latency in EWMA. Higher follows changes faster but is noisier.
+        self._ewma_weight: float = ewma_weight
+        self._latencies_by_host: Dict[str, collections.deque] = {}
+        self._ewma_latency_by_host: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_latency(self, url: URL, latency_sec: float):
+        host = hostlimits.get_host(url)
+        with self._lock:
+            if host not in self._latencies_by_host:
+                self._latencies_by_host[host] = collections.deque(maxlen=self._window_size)
+            self._latencies_by_host[host].append(latency_sec)
+
+            ewma_latency_sec = self._ewma_latency_by_host.get(host)
+            self._ewma_latency_by_host[host] = latency_sec if ewma_latency_sec is None else \
+                self._ewma_weight * latency_sec + (1 - self._ewma_weight) * ewma_latency_sec
+
+    # NOTE: 'None' if no latency was recorded for host of url.
+    def get_ewma_latency_sec(self, url: URL) -> float:
+        with self._lock:
+            return self._ewma_latency_by_host.get(hostlimits.get_host(url))
+
+    # NOTE: Nearest-rank percentile of latencies of host of url. 'None' if fewer than
+    # 'min_samples' latencies were recorded for it.
+    def get_percentile_latency_sec(self, url: URL, percentile: float, min_samples: int = 1) -> float:
+        with self._lock:
+            latencies = list(self._latencies_by_host.get(hostlimits.get_host(url), []))
+        if not latencies or len(latencies) < min_samples:
+            return None
+
+        latencies.sort()
+        rank = max(1, int(math.ceil(percentile / 100 * len(latencies))))
+        return latencies[rank - 1]
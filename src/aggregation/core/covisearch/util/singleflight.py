@@ -0,0 +1,43 @@
+from typing import Callable, Dict
+import concurrent.futures
+import threading
+
+
+# NOTE: De-duplicates concurrent calls for same key. First caller for a key runs the function,
+# callers arriving while it is in flight wait for and share its result (or exception). Once it
+# completes the key is forgotten, so next call runs the function again, i.e. results are never
+# cached beyond the in-flight window.
+# Sources:
+#   -Go Docs: golang.org/x/sync/singleflight:
+#   https://pkg.go.dev/golang.org/x/sync/singleflight
+class SingleFlightGroup:
+    def __init__(self):
+        self._in_flight_calls: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    # NOTE: Callers joining an in-flight call wait at most 'wait_timeout_sec', eg: till their own
+    # deadline, and then get 'concurrent.futures.TimeoutError'. In-flight call itself goes on for
+    # its other callers. 'None' waits till it completes.
+    def do(self, key: str, func: Callable[[], object], wait_timeout_sec: float = None) -> object:
+        with self._lock:
+            in_flight_call = self._in_flight_calls.get(key)
+            if in_flight_call is None:
+                call = concurrent.futures.Future()
+                self._in_flight_calls[key] = call
+
+        if in_flight_call is not None:
+            return in_flight_call.result(timeout=wait_timeout_sec)
+
+        try:
+            call.set_result(func())
+        except BaseException as ex:
+            call.set_exception(ex)
+        finally:
+            with self._lock:
+                del self._in_flight_calls[key]
+
+        return call.result()
+
+    def is_in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._in_flight_calls
@@ -1,19 +1,41 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Callable, Iterator, Union
 import json
-from abc import ABC
+from abc import ABC, abstractmethod
 import traceback
 import re
+import enum
+import hashlib
+import math
+import time
+import asyncio
+import functools
+import heapq
 import concurrent.futures
+import threading
+import queue
+import codecs
 
 import requests
+import aiohttp
 import scrapy
+import lxml.etree
+import orjson
 import jsonpath_ng
+import jsonpath_ng.lexer
 import regex
 
 from covisearch.util.mytypes import URL as URL
 from covisearch.util.mytypes import ContentType as ContentType
 import covisearch.util.elapsedtime as elapsedtime
 import covisearch.util.twitterhack as twitterhack
+import covisearch.util.httpsessions as httpsessions
+import covisearch.util.httpcache as httpcache
+import covisearch.util.contentcache as contentcache
+import covisearch.util.singleflight as singleflight
+import covisearch.util.hostlimits as hostlimits
+import covisearch.util.httpfixtures as httpfixtures
+import covisearch.util.latencystats as latencystats
+import covisearch.util.hedging as hedging
 
 
 # NOTE:KAPIL: This is required as urllib3 logs warning when firing requests with SSL check set to False.
@@ -23,16 +45,183 @@ requests.packages.urllib3.disable_warnings()
 
 
 def scrape_data_from_websites(
-        data_scraping_params: List['DataScrapingParams']) -> List['ScrapedData']:
+        data_scraping_params: List['DataScrapingParams'],
+        scraping_options: 'ScrapingOptions' = None) -> List['ScrapedData']:
 
-    operation_ctxs_by_url = ScrapingOperationCtx(data_scraping_params)
+    scraped_data_list, _ = scrape_data_from_websites_with_report(data_scraping_params, scraping_options)
+    return scraped_data_list
+
+
+# NOTE: Same as 'scrape_data_from_websites' but also returns report of sources which failed, timed
+# out or were cut off by deadline. ScrapedData of such sources is 'None' in returned list.
+def scrape_data_from_websites_with_report(
+        data_scraping_params: List['DataScrapingParams'],
+        scraping_options: 'ScrapingOptions' = None) -> Tuple[List['ScrapedData'], 'ScrapingReport']:
+
+    operation_ctx = ScrapingOperationCtx(data_scraping_params)
+    _scrape_data_for_operation_ctx(operation_ctx, scraping_options)
+    return operation_ctx.get_all_scraped_data(), operation_ctx.scraping_report
+
+
+# NOTE: Streaming form of 'scrape_data_from_websites'. Returned stream yields ScrapedData of each
+# source as soon as it is scraped, i.e. in completion order. Sources without data are skipped.
+# Scraping runs on a background thread and hands over ScrapedData through a queue without
+# retaining it, so caller can process (and drop) each source's data while slower sources are
+# still being fetched.
+def stream_scraped_data_from_websites(
+        data_scraping_params: List['DataScrapingParams'],
+        scraping_options: 'ScrapingOptions' = None) -> 'ScrapedDataStream':
+    return ScrapedDataStream(data_scraping_params, scraping_options)
+
+
+def _scrape_data_for_operation_ctx(operation_ctx: 'ScrapingOperationCtx', scraping_options: 'ScrapingOptions'):
+    if scraping_options is None:
+        scraping_options = _default_scraping_options
 
     ctx = elapsedtime.start_measuring_operation('scraping data from websites')
 
-    WebsiteDataSpider(operation_ctxs_by_url).scrape()
+    create_website_data_spider(operation_ctx, scraping_options).scrape()
 
     elapsedtime.stop_measuring_operation(ctx)
-    return operation_ctxs_by_url.get_all_scraped_data()
+
+    scraping_report = operation_ctx.scraping_report
+    if scraping_report.cut_off_urls:
+        print('Scraping deadline passed. Cut off urls: \'' + '\', \''.join(scraping_report.cut_off_urls) + '\'')
+
+
+class FetchEngine(enum.Enum):
+    # NOTE: One blocking 'requests' call per worker thread.
+    THREAD_POOL = 1
+    # NOTE: All requests multiplexed on one asyncio event loop using aiohttp.
+    ASYNCIO = 2
+
+
+class ScrapingOptions:
+    DEFAULT_THREAD_POOL_MAX_WORKERS = 20
+    DEFAULT_ASYNCIO_MAX_CONCURRENCY = 200
+    DEFAULT_PER_SOURCE_TIMEOUT_SEC = 30.0
+
+    def __init__(self, fetch_engine: FetchEngine = FetchEngine.THREAD_POOL,
+                 max_concurrency: int = None,
+                 response_cache: httpcache.ResponseCacheStore = None,
+                 parsed_data_cache: contentcache.ContentFingerprintCache = None,
+                 deadline_sec: float = None,
+                 per_source_timeout_sec: float = DEFAULT_PER_SOURCE_TIMEOUT_SEC,
+                 parse_executor: concurrent.futures.Executor = None,
+                 host_limiters: hostlimits.HostLimiterRegistry = None,
+                 http_fixtures: httpfixtures.HttpFixtureStore = None,
+                 latency_stats: latencystats.LatencyStatsRegistry = None,
+                 request_hedging: hedging.RequestHedging = None):
+        self._fetch_engine: FetchEngine = fetch_engine
+        # NOTE: Max requests in flight at once. Thread count for THREAD_POOL engine and
+        # max open connections for ASYNCIO engine. 'None' means engine's default.
+        self._max_concurrency: int = max_concurrency
+        # NOTE: 'None' disables conditional requests.
+        self._response_cache: httpcache.ResponseCacheStore = response_cache
+        # NOTE: 'None' disables reuse of ScrapedData for byte-for-byte same response content.
+        self._parsed_data_cache: contentcache.ContentFingerprintCache = parsed_data_cache
+        # NOTE: Max time for whole scraping call. Sources still pending after it are cut off
+        # and data scraped till then is returned. 'None' means wait for all sources.
+        self._deadline_sec: float = deadline_sec
+        # NOTE: Timeout for a source's request unless DataScrapingParams has its own.
+        # For thread pool engine it applies to connect and to each read of the response, for
+        # asyncio engine to the whole request.
+        self._per_source_timeout_sec: float = per_source_timeout_sec
+        # NOTE: Executor on which responses are parsed (and mapped, see 'TableRowsMapper') as they
+        # arrive, eg: 'concurrent.futures.ProcessPoolExecutor'. With a process pool, CPU heavy
+        # sources are parsed on other cores while slow sources are still being fetched, instead
+        # of on the coordinating thread holding the GIL. 'None' parses on coordinating thread.
+        # Owned by caller, who shuts it down.
+        self._parse_executor: concurrent.futures.Executor = parse_executor
+        # NOTE: Adaptive per-host concurrency and rate limits. Also retries once when a host
+        # replies 429/503 with a short 'Retry-After'. 'None' sends requests without limits.
+        self._host_limiters: hostlimits.HostLimiterRegistry = host_limiters
+        # NOTE: Records responses to, or replays them from, fixture dir. 'None' uses network only.
+        self._http_fixtures: httpfixtures.HttpFixtureStore = http_fixtures
+        # NOTE: Latencies of responses are recorded here per host. Requests to slower hosts are
+        # launched first. 'None' records nothing and launches requests in order of params.
+        self._latency_stats: latencystats.LatencyStatsRegistry = latency_stats
+        # NOTE: Hedges requests slower than their host's usual latency, as per 'latency_stats'.
+        # 'None', or no 'latency_stats', sends one request per attempt.
+        self._request_hedging: hedging.RequestHedging = request_hedging
+        # NOTE: Identical requests in flight at once from concurrent scraping calls with these
+        # options. Scoped to options, as calls with other options may differ in cache, fixtures,
+        # timeouts, etc. and their responses are not interchangeable.
+        self._in_flight_requests: singleflight.SingleFlightGroup = singleflight.SingleFlightGroup()
+
+    @property
+    def fetch_engine(self) -> FetchEngine:
+        return self._fetch_engine
+
+    @property
+    def response_cache(self) -> httpcache.ResponseCacheStore:
+        return self._response_cache
+
+    @property
+    def parsed_data_cache(self) -> contentcache.ContentFingerprintCache:
+        return self._parsed_data_cache
+
+    @property
+    def deadline_sec(self) -> float:
+        return self._deadline_sec
+
+    @property
+    def per_source_timeout_sec(self) -> float:
+        return self._per_source_timeout_sec
+
+    @property
+    def parse_executor(self) -> concurrent.futures.Executor:
+        return self._parse_executor
+
+    @property
+    def host_limiters(self) -> hostlimits.HostLimiterRegistry:
+        return self._host_limiters
+
+    @property
+    def http_fixtures(self) -> httpfixtures.HttpFixtureStore:
+        return self._http_fixtures
+
+    @property
+    def latency_stats(self) -> latencystats.LatencyStatsRegistry:
+        return self._latency_stats
+
+    @property
+    def request_hedging(self) -> hedging.RequestHedging:
+        return self._request_hedging
+
+    @property
+    def in_flight_requests(self) -> singleflight.SingleFlightGroup:
+        return self._in_flight_requests
+
+    @property
+    def max_concurrency(self) -> int:
+        if self._max_concurrency is not None:
+            return self._max_concurrency
+
+        if self._fetch_engine is FetchEngine.ASYNCIO:
+            return self.DEFAULT_ASYNCIO_MAX_CONCURRENCY
+        return self.DEFAULT_THREAD_POOL_MAX_WORKERS
+
+
+# NOTE: Used when caller does not pass options explicitly. Kept global so that Cloud Function
+# entry point can set it once during init, like 'elapsedtime.measurement_on'.
+_default_scraping_options: ScrapingOptions = ScrapingOptions()
+
+
+def set_default_scraping_options(scraping_options: ScrapingOptions):
+    global _default_scraping_options
+    _default_scraping_options = scraping_options
+
+
+def get_default_scraping_options() -> ScrapingOptions:
+    return _default_scraping_options
+
+
+def create_website_data_spider(operation_ctx: 'ScrapingOperationCtx',
+                               scraping_options: ScrapingOptions) -> 'WebsiteDataSpider':
+    if scraping_options.fetch_engine is FetchEngine.ASYNCIO:
+        return AsyncWebsiteDataSpider(operation_ctx, scraping_options)
+    return WebsiteDataSpider(operation_ctx, scraping_options)
 
 
 class DataScrapingParams:
@@ -40,7 +229,11 @@ class DataScrapingParams:
                  additional_http_headers: Dict[str, str],
                  response_content_type: ContentType, table_column_selectors: Dict[str, str],
                  table_row_filters: Dict[str, str],
-                 fields_selectors: Dict[str, str]):
+                 fields_selectors: Dict[str, str],
+                 timeout_sec: float = None,
+                 table_rows_mapper: 'TableRowsMapper' = None,
+                 table_partition_column: str = None,
+                 idempotent_post_request: bool = False):
         self._url = url
         self._request_content_type: ContentType = request_content_type
         self._request_body: str = request_body
@@ -53,7 +246,25 @@ class DataScrapingParams:
         # NOTE: KAPIL: Filter may be regex filter. Even fuzzy regex with {e<=2} type notation supported.
         # Refer: https://pypi.org/project/regex/
         self._table_row_filters = table_row_filters
+        self._compiled_table_row_filters: List[Tuple[str, regex.Pattern]] = None
         self._fields_selectors = fields_selectors
+        # NOTE: Per-source timeout budget. 'None' means ScrapingOptions' per-source timeout.
+        self._timeout_sec: float = timeout_sec
+        # NOTE: Maps scraped table rows right after parsing, in same worker as parsing.
+        # 'None' leaves mapping to the caller.
+        self._table_rows_mapper: 'TableRowsMapper' = table_rows_mapper
+        # NOTE: Column by which row filters select a partition, eg: city, of a document holding
+        # all partitions. Response is then parsed once into a 'PartitionedTable' shared by all
+        # params of same request, whatever their row filters. 'TableRowsMapper' is not applied
+        # to such params, as their rows are selected outside parse executor.
+        # 'None' parses response per params with its row filters.
+        self._table_partition_column: str = table_partition_column
+        # NOTE: POST request which only reads, eg: search API, so it may be sent twice, eg: hedged.
+        # GET requests are always treated as idempotent.
+        self._idempotent_post_request: bool = idempotent_post_request
+        self._parsing_fingerprint: str = None
+        self._partitioning_fingerprint: str = None
+        self._request_key: str = None
 
     @property
     def url(self) -> URL:
@@ -83,17 +294,139 @@ class DataScrapingParams:
     def table_row_filters(self) -> Dict[str, str]:
         return self._table_row_filters
 
+    # NOTE: (column name, compiled filter) pairs. Compiled once and reused for every row of
+    # every response for these params.
+    @property
+    def compiled_table_row_filters(self) -> List[Tuple[str, regex.Pattern]]:
+        if self._compiled_table_row_filters is None:
+            self._compiled_table_row_filters = [
+                (col_name, regex.compile(row_filter, regex.IGNORECASE))
+                for col_name, row_filter in self._table_row_filters.items()]
+        return self._compiled_table_row_filters
+
     @property
     def fields_selectors(self) -> Dict[str, str]:
         return self._fields_selectors
 
+    @property
+    def timeout_sec(self) -> float:
+        return self._timeout_sec
+
+    @property
+    def table_rows_mapper(self) -> 'TableRowsMapper':
+        return self._table_rows_mapper
+
+    @property
+    def table_partition_column(self) -> str:
+        return self._table_partition_column
+
+    @property
+    def is_idempotent(self) -> bool:
+        return self._idempotent_post_request or \
+            self._request_content_type not in (ContentType.JSON, ContentType.FORMDATA)
+
+    # NOTE: Identifies how a response is parsed into ScrapedData. Two params with same
+    # fingerprint produce same ScrapedData from same response content.
+    @property
+    def parsing_fingerprint(self) -> str:
+        if self._parsing_fingerprint is None:
+            fingerprint_source = json.dumps(
+                [self._url, str(self._response_content_type), self._table_column_selectors,
+                 self._table_row_filters, self._fields_selectors], sort_keys=True)
+            self._parsing_fingerprint = hashlib.sha256(fingerprint_source.encode('utf-8')).hexdigest()
+        return self._parsing_fingerprint
+
+    # NOTE: Identifies how a response is parsed into 'PartitionedTable'. Same as parsing
+    # fingerprint, but without row filters, so params differing only in filters share it.
+    @property
+    def partitioning_fingerprint(self) -> str:
+        if self._partitioning_fingerprint is None:
+            fingerprint_source = json.dumps(
+                [self._url, str(self._response_content_type), self._table_column_selectors,
+                 self._table_partition_column, self._fields_selectors], sort_keys=True)
+            self._partitioning_fingerprint = hashlib.sha256(fingerprint_source.encode('utf-8')).hexdigest()
+        return self._partitioning_fingerprint
+
+    # NOTE: Identifies the HTTP request sent for these params. Two params with same key get
+    # same response, so request is sent once for them.
+    @property
+    def request_key(self) -> str:
+        if self._request_key is None:
+            key_source = json.dumps(
+                [self._url, str(self._request_content_type), self._request_body,
+                 self._additional_http_headers], sort_keys=True)
+            self._request_key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        return self._request_key
+
+
+# NOTE: Maps table rows scraped from a response to caller's format, eg: covisearch resources.
+# Runs in parse executor along with parsing, so must be picklable for process pools.
+class TableRowsMapper(ABC):
+    @abstractmethod
+    def map_table_rows(self, table_rows: List[Dict[str, str]]) -> List[Dict]:
+        raise NotImplementedError('TableRowsMapper is an interface')
+
+
+class FetchedResponse:
+    def __init__(self, status_code: int, headers: Dict[str, str], content: Union[str, bytes],
+                 elapsed_sec: float = None,
+                 revalidated_cached_response: httpcache.CachedResponse = None):
+        self._status_code: int = status_code
+        # NOTE: Header names are case-insensitive. Keeping them lowercase for lookup.
+        self._headers: Dict[str, str] = {name.lower(): value for name, value in headers.items()}
+        # NOTE: UTF-8 bytes for JSON responses, else text. See 'decode_response_content'.
+        self._content: Union[str, bytes] = content
+        self._elapsed_sec: float = elapsed_sec
+        # NOTE: Cache entry whose validators were sent with the request. Kept so that 304
+        # response is served from the same entry even if cache evicts it meanwhile.
+        self._revalidated_cached_response: httpcache.CachedResponse = revalidated_cached_response
+
+    @property
+    def status_code(self) -> int:
+        return self._status_code
+
+    @property
+    def elapsed_sec(self) -> float:
+        return self._elapsed_sec
+
+    @property
+    def content(self) -> Union[str, bytes]:
+        return self._content
+
+    # NOTE: Header names are lowercase.
+    @property
+    def headers(self) -> Dict[str, str]:
+        return self._headers
+
+    @property
+    def revalidated_cached_response(self) -> httpcache.CachedResponse:
+        return self._revalidated_cached_response
+
+    def get_header(self, header_name: str) -> str:
+        return self._headers.get(header_name.lower())
+
+
+# NOTE: Fast error response of one hedged attempt, eg: HTTP 429/503 from an overloaded replica,
+# must not win over other attempt which may still return 200. Such attempt counts as failed.
+def _is_successful_response(fetched_response: FetchedResponse) -> bool:
+    status_code = fetched_response.status_code
+    if hostlimits.is_overload_status_code(status_code):
+        return False
+    return 200 <= status_code < 300 or status_code == 304
+
 
 class ScrapedData:
     def __init__(self, url: URL, table_rows: List[Dict[str, str]],
-                 fields: Dict[str, str]):
+                 fields: Dict[str, str], content_fingerprint: str = None,
+                 mapped_table_rows: List[Dict] = None):
         self._url = url
         self._table_rows = table_rows
         self._fields = fields
+        # NOTE: Same fingerprint means same response content parsed with same params, i.e. same
+        # table rows. Lets later stages like mapping cache their results too.
+        self._content_fingerprint: str = content_fingerprint
+        # NOTE: Output of params' 'TableRowsMapper'. 'None' if rows were not mapped.
+        self._mapped_table_rows: List[Dict] = mapped_table_rows
 
     @property
     def url(self) -> URL:
@@ -107,47 +440,526 @@ class ScrapedData:
     def fields(self) -> Dict[str, str]:
         return self._fields
 
+    @property
+    def content_fingerprint(self) -> str:
+        return self._content_fingerprint
+
+    @property
+    def mapped_table_rows(self) -> List[Dict]:
+        return self._mapped_table_rows
+
+    # NOTE: Mapped rows are handed over to caller, who modifies them. So only this copy is
+    # cached for later responses.
+    def without_mapped_table_rows(self) -> 'ScrapedData':
+        if self._mapped_table_rows is None:
+            return self
+        return ScrapedData(self._url, self._table_rows, self._fields, self._content_fingerprint)
+
 
 class WebsiteDataSpider:
-    def __init__(self, operation_ctx: 'ScrapingOperationCtx'):
+    HTTP_NOT_MODIFIED = 304
+    # NOTE: First attempt plus one retry after host asked to back off.
+    MAX_ATTEMPTS_WITH_HOST_LIMITS = 2
+
+    def __init__(self, operation_ctx: 'ScrapingOperationCtx', scraping_options: ScrapingOptions):
         super().__init__()
         self._operation_ctx: 'ScrapingOperationCtx' = operation_ctx
+        self._max_concurrency: int = scraping_options.max_concurrency
+        self._response_cache: httpcache.ResponseCacheStore = scraping_options.response_cache
+        self._parsed_data_cache: contentcache.ContentFingerprintCache = scraping_options.parsed_data_cache
+        self._deadline_sec: float = scraping_options.deadline_sec
+        self._per_source_timeout_sec: float = scraping_options.per_source_timeout_sec
+        self._parse_executor: concurrent.futures.Executor = scraping_options.parse_executor
+        self._host_limiters: hostlimits.HostLimiterRegistry = scraping_options.host_limiters
+        self._http_fixtures: httpfixtures.HttpFixtureStore = scraping_options.http_fixtures
+        self._latency_stats: latencystats.LatencyStatsRegistry = scraping_options.latency_stats
+        self._request_hedging: hedging.RequestHedging = scraping_options.request_hedging
+        self._in_flight_requests: singleflight.SingleFlightGroup = scraping_options.in_flight_requests
+        self._start_time: float = None
+        self._delayed_request_count: int = 0
 
     def scrape(self):
         # From https://stackoverflow.com/questions/9110593/asynchronous-requests-with-python-requests
-        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-            response_futures = {
-                executor.submit(WebsiteDataSpider._send_request,
-                                self._operation_ctx.get_scraping_params_for_url(url)): url
-                for url in self._operation_ctx.get_all_urls_for_scraping()
-            }
-            for response_future in concurrent.futures.as_completed(response_futures):
-                try:
-                    response = response_future.result()
-                    if response.status_code != 200:
-                        if response.status_code != 404:
-                            print('Requests returned HTTP code: \'' + str(response.status_code) + '\' for url: \'' +
-                                  response.url + '\'')
+        # NOTE: Not using executor as context manager as it waits for all threads on exit,
+        # which would wait for hung sources even after deadline has passed.
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._max_concurrency)
+        self._start_time = time.monotonic()
+        request_key_for_future: Dict[concurrent.futures.Future, str] = {
+            self._submit_request(executor, request_key, 0): request_key
+            for request_key in self._get_request_keys_in_launch_order()
+        }
+        # NOTE: Responses being parsed on parse executor. Waited on along with pending requests so
+        # that next response is handled as soon as it arrives.
+        pending_parse_for_future: Dict[concurrent.futures.Future, '_PendingParse'] = {}
+        # NOTE: Requests which host limits made wait, as heap of (resubmit time, sequence no.,
+        # request key, attempt). Workers hand such requests back here instead of sleeping, so one
+        # throttled host does not hold up workers of other hosts.
+        delayed_requests: List[Tuple[float, int, str, int]] = []
+        pending_futures = set(request_key_for_future.keys())
+        try:
+            while pending_futures or delayed_requests:
+                while delayed_requests and delayed_requests[0][0] <= time.monotonic():
+                    _, _, request_key, attempt = heapq.heappop(delayed_requests)
+                    resubmitted_future = self._submit_request(executor, request_key, attempt)
+                    request_key_for_future[resubmitted_future] = request_key
+                    pending_futures.add(resubmitted_future)
+
+                wait_timeout_sec = self._get_remaining_sec_till_deadline(self._start_time)
+                if delayed_requests:
+                    resubmit_wait_sec = max(0.0, delayed_requests[0][0] - time.monotonic())
+                    wait_timeout_sec = resubmit_wait_sec if wait_timeout_sec is None else \
+                        min(wait_timeout_sec, resubmit_wait_sec)
+
+                if pending_futures:
+                    done_futures, pending_futures = concurrent.futures.wait(
+                        pending_futures, timeout=wait_timeout_sec, return_when=concurrent.futures.FIRST_COMPLETED)
+                else:
+                    time.sleep(wait_timeout_sec)
+                    done_futures = set()
+
+                if not done_futures and self._get_remaining_sec_till_deadline(self._start_time) == 0.0:
+                    self._cut_off_pending_futures(pending_futures, request_key_for_future)
+                    self._cut_off_delayed_requests(delayed_requests)
+                    break
+
+                for done_future in done_futures:
+                    if done_future in pending_parse_for_future:
+                        self._complete_pending_parse(pending_parse_for_future.pop(done_future))
+                        continue
+
+                    request_key = request_key_for_future.pop(done_future)
+                    if self._delay_request_if_host_limited(request_key, done_future, delayed_requests):
                         continue
 
-                    try:
-                        scraping_params = self._operation_ctx.get_scraping_params_for_url(response.url)
-                        scraped_data = scrape_data_from_response(response.text, scraping_params)
-                        self._operation_ctx.set_scraped_data_for_url(response.url, scraped_data)
+                    for pending_parse in self._scrape_data_from_response_future_for_request(
+                            request_key, done_future):
+                        request_key_for_future[pending_parse.future] = request_key
+                        pending_parse_for_future[pending_parse.future] = pending_parse
+                        pending_futures.add(pending_parse.future)
+
+        finally:
+            executor.shutdown(wait=False)
+
+    # NOTE: Returned future is completed by pool worker, or earlier by a successful hedge.
+    def _submit_request(self, executor: concurrent.futures.Executor, request_key: str,
+                        attempt: int) -> concurrent.futures.Future:
+        response_future = concurrent.futures.Future()
+        executor.submit(self._send_request_for_future,
+                        self._operation_ctx.get_scraping_params_for_request(request_key), attempt, response_future)
+        return response_future
+
+    # NOTE: Request cut off while queued for a worker is not sent.
+    def _send_request_for_future(self, scraping_params: DataScrapingParams, attempt: int,
+                                 response_future: concurrent.futures.Future):
+        if not response_future.set_running_or_notify_cancel():
+            return
+        try:
+            hedging.set_result_if_pending(
+                response_future, self._send_request_single_flight(scraping_params, attempt, response_future))
+        except Exception as ex:
+            hedging.set_exception_if_pending(response_future, ex)
+
+    # NOTE: Requests which would have to wait past deadline are cut off right away.
+    def _delay_request_if_host_limited(self, request_key: str, request_future: concurrent.futures.Future,
+                                       delayed_requests: List[Tuple[float, int, str, int]]) -> bool:
+        if not isinstance(request_future.exception(), _HostLimitedRequestError):
+            return False
 
-                    except Exception:
-                        print('Exception while parsing Grequests response for url: \'' + response.url + '\'. ' +
-                              'Ignoring error.')
-                        print(traceback.print_exc())
+        host_limited_request = request_future.exception()
+        remaining_sec = self._get_remaining_sec_till_deadline(self._start_time)
+        if remaining_sec is not None and host_limited_request.wait_sec >= remaining_sec:
+            url = self._operation_ctx.get_scraping_params_for_request(request_key).url
+            print('Host limits would delay request past scraping deadline. Cutting off url: \'' + url + '\'.')
+            self._operation_ctx.scraping_report.add_cut_off_url(url)
+            return True
 
-                except Exception:
-                    print('Exception while crawling with Requests for url: \'' +
-                          response_futures[response_future] + '\'.')
-                    print(traceback.print_exc())
+        self._delayed_request_count += 1
+        heapq.heappush(delayed_requests, (time.monotonic() + host_limited_request.wait_sec,
+                                          self._delayed_request_count, request_key, host_limited_request.attempt))
+        return True
+
+    def _cut_off_delayed_requests(self, delayed_requests: List[Tuple[float, int, str, int]]):
+        for _, _, request_key, _ in delayed_requests:
+            self._operation_ctx.scraping_report.add_cut_off_url(
+                self._operation_ctx.get_scraping_params_for_request(request_key).url)
+
+    # NOTE: Requests to historically slowest hosts, by EWMA latency, are launched first. So when
+    # concurrency cap makes requests queue, slow sources do not wait behind fast ones, and
+    # makespan stays close to slowest source's latency (longest processing time first).
+    # Hosts without recorded latency go first, as they may be slow. Sort is stable, so without
+    # latency stats, or for equally fast hosts, order of params is kept.
+    # Sources:
+    #   -Wikipedia: Longest-processing-time-first scheduling:
+    #   https://en.wikipedia.org/wiki/Longest-processing-time-first_scheduling
+    def _get_request_keys_in_launch_order(self) -> List[str]:
+        request_keys = self._operation_ctx.get_all_request_keys()
+        if self._latency_stats is None:
+            return request_keys
+
+        launch_priority_by_request_key = {}
+        for request_key in request_keys:
+            ewma_latency_sec = self._latency_stats.get_ewma_latency_sec(
+                self._operation_ctx.get_scraping_params_for_request(request_key).url)
+            launch_priority_by_request_key[request_key] = math.inf if ewma_latency_sec is None else ewma_latency_sec
+        return sorted(request_keys, key=lambda request_key: -launch_priority_by_request_key[request_key])
+
+    def _scrape_data_from_response_future_for_request(
+            self, request_key: str, response_future: concurrent.futures.Future) -> List['_PendingParse']:
+        url = self._operation_ctx.get_scraping_params_for_request(request_key).url
+        try:
+            return self._scrape_data_from_response_for_request(request_key, response_future.result())
+
+        except requests.exceptions.Timeout:
+            print('Request timed out for url: \'' + url + '\'.')
+            self._operation_ctx.scraping_report.add_timed_out_url(url)
+
+        # NOTE: Deadline passed while waiting for identical request of another scraping call.
+        except concurrent.futures.TimeoutError:
+            print('Scraping deadline passed while waiting for in-flight request for url: \'' + url + '\'.')
+            self._operation_ctx.scraping_report.add_cut_off_url(url)
+
+        except Exception:
+            print('Exception while crawling with Requests for url: \'' + url + '\'.')
+            print(traceback.print_exc())
+            self._operation_ctx.scraping_report.add_failed_url(url)
+
+        return []
+
+    def _cut_off_pending_futures(self, pending_futures,
+                                 request_key_for_future: Dict[concurrent.futures.Future, str]):
+        for pending_future in pending_futures:
+            pending_future.cancel()
+            self._operation_ctx.scraping_report.add_cut_off_url(
+                self._operation_ctx.get_scraping_params_for_request(request_key_for_future[pending_future]).url)
+
+    def _get_remaining_sec_till_deadline(self, start_time: float) -> float:
+        if self._deadline_sec is None:
+            return None
+        return max(0.0, self._deadline_sec - (time.monotonic() - start_time))
+
+    def _get_timeout_sec(self, scraping_params: DataScrapingParams) -> float:
+        if scraping_params.timeout_sec is not None:
+            return scraping_params.timeout_sec
+        return self._per_source_timeout_sec
+
+    # NOTE: Scrapes data for all params sharing the request. Returns '_PendingParse's of
+    # responses being parsed on parse executor.
+    def _scrape_data_from_response_for_request(self, request_key: str,
+                                               fetched_response: FetchedResponse) -> List['_PendingParse']:
+        url = self._operation_ctx.get_scraping_params_for_request(request_key).url
+        status_code = fetched_response.status_code
+        self._operation_ctx.scraping_report.set_elapsed_sec_for_url(url, fetched_response.elapsed_sec)
+        if status_code == self.HTTP_NOT_MODIFIED and fetched_response.revalidated_cached_response is not None:
+            for params_idxs in self._group_params_idxs_sharing_parse(request_key):
+                self._scrape_data_from_cached_response(params_idxs, fetched_response.revalidated_cached_response)
+            return []
+
+        if status_code != 200:
+            if status_code != 404:
+                print('Requests returned HTTP code: \'' + str(status_code) + '\' for url: \'' +
+                      url + '\'')
+                self._operation_ctx.scraping_report.add_failed_url(url)
+            return []
+
+        pending_parses = []
+        for params_idxs in self._group_params_idxs_sharing_parse(request_key):
+            pending_parse = self._scrape_data_from_response_for_params(params_idxs, fetched_response)
+            if pending_parse is not None:
+                pending_parses.append(pending_parse)
+        return pending_parses
+
+    # NOTE: Params of a request with same parsing fingerprint get same ScrapedData from its
+    # response, so it is parsed once for them. Except params with 'TableRowsMapper', as mapped
+    # rows are handed over to caller for each params. Partitioned params share one parse by
+    # partitioning fingerprint, whatever their row filters.
+    def _group_params_idxs_sharing_parse(self, request_key: str) -> List[List[int]]:
+        params_idxs_by_parse: Dict[object, List[int]] = {}
+        for params_idx in self._operation_ctx.get_scraping_params_idxs_for_request(request_key):
+            scraping_params = self._operation_ctx.get_scraping_params(params_idx)
+            if scraping_params.table_partition_column is not None:
+                parse_key = ('partitioned', scraping_params.partitioning_fingerprint)
+            elif scraping_params.table_rows_mapper is None:
+                parse_key = scraping_params.parsing_fingerprint
+            else:
+                parse_key = params_idx
+            params_idxs_by_parse.setdefault(parse_key, []).append(params_idx)
+        return list(params_idxs_by_parse.values())
+
+    # NOTE: Returns '_PendingParse' if response is being parsed on parse executor, else 'None'.
+    def _scrape_data_from_response_for_params(self, params_idxs: List[int],
+                                              fetched_response: FetchedResponse) -> '_PendingParse':
+        scraping_params = self._operation_ctx.get_scraping_params(params_idxs[0])
+        try:
+            if self._parse_executor is not None:
+                pending_parse = self._submit_parse_if_not_cached(params_idxs, fetched_response, scraping_params)
+                if pending_parse is not None:
+                    return pending_parse
+
+            if scraping_params.table_partition_column is not None:
+                partitioned_table = self._get_partitioned_table(fetched_response.content, scraping_params)
+                self._set_data_from_partitioned_table(params_idxs, fetched_response, partitioned_table)
+            else:
+                scraped_data = self._parse_response_content(fetched_response.content, scraping_params)
+                self._set_parsed_data(params_idxs, fetched_response, scraped_data)
+
+        except Exception:
+            print('Exception while parsing response for url: \'' + scraping_params.url + '\'. ' +
+                  'Ignoring error.')
+            print(traceback.print_exc())
+            self._operation_ctx.scraping_report.add_failed_url(scraping_params.url)
+
+        return None
+
+    # NOTE: Returns 'None' if scraped data is already in parsed data cache. Caller then parses
+    # inline, which returns the cached data.
+    def _submit_parse_if_not_cached(self, params_idxs: List[int], fetched_response: FetchedResponse,
+                                    scraping_params: DataScrapingParams) -> '_PendingParse':
+        if scraping_params.table_partition_column is not None:
+            parse_func = partition_table_from_response
+            content_fingerprint = contentcache.get_content_fingerprint(fetched_response.content)
+            parsed_data_fingerprint = get_partitioned_table_fingerprint(scraping_params, content_fingerprint)
+        else:
+            parse_func = scrape_data_from_response
+            content_fingerprint = self._get_content_fingerprint(fetched_response.content, scraping_params)
+            parsed_data_fingerprint = content_fingerprint
+
+        if self._parsed_data_cache is not None and self._parsed_data_cache.get(parsed_data_fingerprint) is not None:
+            return None
+
+        parse_future = self._parse_executor.submit(
+            parse_func, fetched_response.content, scraping_params, content_fingerprint)
+        return _PendingParse(params_idxs, fetched_response, parse_future)
+
+    def _complete_pending_parse(self, pending_parse: '_PendingParse'):
+        try:
+            parsed_data = pending_parse.future.result()
+            if isinstance(parsed_data, PartitionedTable):
+                self._set_data_from_partitioned_table(
+                    pending_parse.params_idxs, pending_parse.fetched_response, parsed_data)
+                if self._parsed_data_cache is not None:
+                    self._parsed_data_cache.set(parsed_data.fingerprint, parsed_data)
+                return
+
+            self._set_parsed_data(pending_parse.params_idxs, pending_parse.fetched_response, parsed_data)
+            if self._parsed_data_cache is not None:
+                self._parsed_data_cache.set(parsed_data.content_fingerprint, parsed_data.without_mapped_table_rows())
+
+        except Exception:
+            url = self._operation_ctx.get_scraping_params(pending_parse.params_idxs[0]).url
+            print('Exception while parsing response for url: \'' + url + '\'. ' +
+                  'Ignoring error.')
+            print(traceback.print_exc())
+            self._operation_ctx.scraping_report.add_failed_url(url)
+
+    def _set_parsed_data(self, params_idxs: List[int], fetched_response: FetchedResponse,
+                         scraped_data: 'ScrapedData'):
+        for params_idx in params_idxs:
+            self._operation_ctx.set_scraped_data(params_idx, scraped_data)
+        self._cache_response_if_cacheable(self._operation_ctx.get_scraping_params(params_idxs[0]),
+                                          fetched_response, scraped_data.without_mapped_table_rows())
+
+    def _set_data_from_partitioned_table(self, params_idxs: List[int], fetched_response: FetchedResponse,
+                                         partitioned_table: 'PartitionedTable'):
+        scraped_data = None
+        for params_idx in params_idxs:
+            scraped_data = partitioned_table.get_scraped_data(self._operation_ctx.get_scraping_params(params_idx))
+            self._operation_ctx.set_scraped_data(params_idx, scraped_data)
+        self._cache_response_if_cacheable(self._operation_ctx.get_scraping_params(params_idxs[-1]),
+                                          fetched_response, scraped_data)
+
+    def _scrape_data_from_cached_response(self, params_idxs: List[int], cached_response: httpcache.CachedResponse):
+        params_idxs_to_parse = []
+        for params_idx in params_idxs:
+            if cached_response.scraping_params_fingerprint == \
+                    self._operation_ctx.get_scraping_params(params_idx).parsing_fingerprint:
+                self._operation_ctx.set_scraped_data(params_idx, cached_response.scraped_data)
+            else:
+                params_idxs_to_parse.append(params_idx)
+
+        if not params_idxs_to_parse:
+            return
+
+        # NOTE: Same response but selectors/filters changed since it was cached.
+        scraping_params = self._operation_ctx.get_scraping_params(params_idxs_to_parse[0])
+        try:
+            # NOTE: Partitioned params of a request differ in filters, so cached entry is not
+            # updated for them. Their partitioned table is in parsed data cache instead.
+            if scraping_params.table_partition_column is not None:
+                partitioned_table = self._get_partitioned_table(cached_response.response_content, scraping_params)
+                for params_idx in params_idxs_to_parse:
+                    self._operation_ctx.set_scraped_data(params_idx, partitioned_table.get_scraped_data(
+                        self._operation_ctx.get_scraping_params(params_idx)))
+                return
+
+            scraped_data = self._parse_response_content(cached_response.response_content, scraping_params)
+            for params_idx in params_idxs_to_parse:
+                self._operation_ctx.set_scraped_data(params_idx, scraped_data)
+            self._response_cache.set(
+                httpcache.get_cache_key(scraping_params.url, scraping_params.request_body),
+                httpcache.CachedResponse(cached_response.etag, cached_response.last_modified,
+                                         cached_response.response_content,
+                                         scraping_params.parsing_fingerprint,
+                                         scraped_data.without_mapped_table_rows()))
+
+        except Exception:
+            print('Exception while parsing cached response for url: \'' + scraping_params.url + '\'. ' +
+                  'Ignoring error.')
+            print(traceback.print_exc())
+
+    def _parse_response_content(self, response_content: Union[str, bytes],
+                                scraping_params: DataScrapingParams) -> 'ScrapedData':
+        content_fingerprint = self._get_content_fingerprint(response_content, scraping_params)
+
+        if self._parsed_data_cache is not None:
+            cached_scraped_data = self._parsed_data_cache.get(content_fingerprint)
+            if cached_scraped_data is not None:
+                return cached_scraped_data
+
+        scraped_data = scrape_data_from_response(response_content, scraping_params, content_fingerprint)
+        if self._parsed_data_cache is not None:
+            self._parsed_data_cache.set(content_fingerprint, scraped_data.without_mapped_table_rows())
+        return scraped_data
+
+    # NOTE: Partitioned tables are cached in parsed data cache too, keyed by partitioning
+    # fingerprint, so later filters and scraping calls with same response content skip parsing.
+    def _get_partitioned_table(self, response_content: Union[str, bytes],
+                               scraping_params: DataScrapingParams) -> 'PartitionedTable':
+        content_fingerprint = contentcache.get_content_fingerprint(response_content)
+        partitioned_table_fingerprint = get_partitioned_table_fingerprint(scraping_params, content_fingerprint)
+
+        if self._parsed_data_cache is not None:
+            cached_partitioned_table = self._parsed_data_cache.get(partitioned_table_fingerprint)
+            if cached_partitioned_table is not None:
+                return cached_partitioned_table
+
+        partitioned_table = partition_table_from_response(response_content, scraping_params, content_fingerprint)
+        if self._parsed_data_cache is not None:
+            self._parsed_data_cache.set(partitioned_table_fingerprint, partitioned_table)
+        return partitioned_table
 
     @staticmethod
-    def _send_request(scraping_params: DataScrapingParams):
+    def _get_content_fingerprint(response_content: Union[str, bytes], scraping_params: DataScrapingParams) -> str:
+        return contentcache.combine_fingerprints(
+            [scraping_params.parsing_fingerprint, contentcache.get_content_fingerprint(response_content)])
+
+    def _cache_response_if_cacheable(self, scraping_params: DataScrapingParams,
+                                     fetched_response: FetchedResponse, scraped_data: 'ScrapedData'):
+        if self._response_cache is None:
+            return
+
+        cached_response = httpcache.CachedResponse(
+            fetched_response.get_header('ETag'), fetched_response.get_header('Last-Modified'),
+            fetched_response.content, scraping_params.parsing_fingerprint, scraped_data)
+        if cached_response.has_validators():
+            self._response_cache.set(
+                httpcache.get_cache_key(scraping_params.url, scraping_params.request_body), cached_response)
+
+    # NOTE: Identical requests in flight at the same time from concurrent scraping calls with same
+    # options, eg: of filters aggregated in parallel, share one network call. Requests repeated
+    # within one call are already merged by 'ScrapingOperationCtx'. Requests with different
+    # timeouts are not shared. A call joining another's request waits only till its own deadline.
+    def _send_request_single_flight(self, scraping_params: DataScrapingParams, attempt: int,
+                                    response_future: concurrent.futures.Future) -> FetchedResponse:
+        single_flight_key = scraping_params.request_key + '|' + str(self._get_timeout_sec(scraping_params))
+        return self._in_flight_requests.do(
+            single_flight_key, lambda: self._send_request(scraping_params, attempt, response_future),
+            self._get_remaining_sec_till_deadline(self._start_time))
+
+    # NOTE: Raises '_HostLimitedRequestError' instead of waiting for host limits or retrying, so
+    # that pool worker is released. Coordinator resubmits request once it may be sent.
+    def _send_request(self, scraping_params: DataScrapingParams, attempt: int,
+                      response_future: concurrent.futures.Future) -> FetchedResponse:
+        if self._host_limiters is None:
+            return self._send_request_hedged(scraping_params, response_future)
+
+        host_limiter = self._host_limiters.get_host_limiter(scraping_params.url)
+        wait_sec = host_limiter.try_acquire()
+        if wait_sec > 0.0:
+            raise _HostLimitedRequestError(wait_sec, attempt)
+
+        try:
+            fetched_response = self._send_request_hedged(scraping_params, response_future)
+        except Exception:
+            host_limiter.release_after_error()
+            raise
+
+        retry_after_sec = self._release_host_limiter_after_response(host_limiter, fetched_response)
+        if self._should_retry(host_limiter, fetched_response, retry_after_sec, attempt):
+            # NOTE: Host limiter is paused till 'Retry-After', so resubmitted attempt waits for it.
+            raise _HostLimitedRequestError(0.0, attempt + 1)
+        return fetched_response
+
+    # NOTE: First attempt is sent on calling pool worker, and a hedge thread is started only once
+    # request is slower than hedge delay. A successful hedge completes 'response_future' right
+    # away, while worker stays blocked on first attempt, which cannot be cancelled. Hedge shares
+    # host limiter slot of the request, and its latency is not recorded, as it duplicates
+    # latency of first attempt.
+    def _send_request_hedged(self, scraping_params: DataScrapingParams,
+                             response_future: concurrent.futures.Future = None) -> FetchedResponse:
+        hedge_delay_sec = self._get_hedge_delay_sec(scraping_params)
+        if hedge_delay_sec is None:
+            return self._send_request_once_and_record_latency(scraping_params)
+
+        return hedging.send_with_hedge(
+            functools.partial(self._send_request_once_and_record_latency, scraping_params), hedge_delay_sec,
+            functools.partial(self._send_request_once, scraping_params),
+            functools.partial(self._request_hedging.try_acquire_hedge, scraping_params.url),
+            _is_successful_response, response_future)
+
+    # NOTE: 'None' if request is not to be hedged.
+    def _get_hedge_delay_sec(self, scraping_params: DataScrapingParams) -> float:
+        if self._request_hedging is None or self._latency_stats is None or self._is_replaying_fixtures() or \
+                not scraping_params.is_idempotent:
+            return None
+
+        self._request_hedging.record_request(scraping_params.url)
+        return self._latency_stats.get_percentile_latency_sec(
+            scraping_params.url, self._request_hedging.percentile, self._request_hedging.min_samples)
+
+    def _send_request_once_and_record_latency(self, scraping_params: DataScrapingParams) -> FetchedResponse:
+        fetched_response = self._send_request_once(scraping_params)
+        self._record_latency(scraping_params, fetched_response)
+        return fetched_response
+
+    def _record_latency(self, scraping_params: DataScrapingParams, fetched_response: FetchedResponse):
+        if self._latency_stats is not None and fetched_response.elapsed_sec is not None:
+            self._latency_stats.record_latency(scraping_params.url, fetched_response.elapsed_sec)
+
+    def _send_request_once(self, scraping_params: DataScrapingParams) -> FetchedResponse:
+        if self._is_replaying_fixtures():
+            return self._replay_response(scraping_params)
+
+        twitterhack.activate_twitter_guest_token_if_missing(scraping_params.url)
+        cached_response = self._get_cached_response_for_revalidation(scraping_params)
+        headers = self._get_request_headers(scraping_params, cached_response)
+        session = httpsessions.get_session_for_url(scraping_params.url)
+        timeout_sec = self._get_timeout_sec(scraping_params)
+        start_time = time.monotonic()
+
+        # Example grequests code for GET, POST JSON and Form Data requests. Similar for requests:
+        # https://www.programcreek.com/python/example/103991/grequests.post
+        if scraping_params.request_content_type is ContentType.JSON:
+            request_dict = json.loads(scraping_params.request_body)
+            response = session.post(scraping_params.url, json=request_dict, headers=headers, verify=False,
+                                    timeout=timeout_sec)
 
+        elif scraping_params.request_content_type is ContentType.FORMDATA:
+            form_data_dict = json.loads(scraping_params.request_body)
+            response = session.post(scraping_params.url, data=form_data_dict, headers=headers, verify=False,
+                                    timeout=timeout_sec)
+
+        else:
+            response = session.get(scraping_params.url, headers=headers, verify=False, timeout=timeout_sec)
+
+        response_content = decode_response_content(
+            response.content, response.headers.get('Content-Type'), scraping_params.response_content_type)
+        fetched_response = FetchedResponse(response.status_code, response.headers, response_content,
+                                           time.monotonic() - start_time, cached_response)
+        self._record_response_if_recording(scraping_params, fetched_response)
+        return fetched_response
+
+    def _get_request_headers(self, scraping_params: DataScrapingParams,
+                             cached_response: httpcache.CachedResponse) -> Dict[str, str]:
         # NOTE: KAPIL: Using Postman's user-agent string because JustDial returned
         # HTTP 403 Access Denied for python requests lib's user-agent 'python-requests/2.25.1'.
         headers = {
@@ -157,43 +969,402 @@ class WebsiteDataSpider:
             headers[header_name] = header_value
 
         twitterhack.add_twitter_guest_token_if_twitter(scraping_params.url, headers)
+        if cached_response is not None:
+            headers.update(cached_response.get_conditional_request_headers())
+        return headers
+
+    # NOTE: Returns 'Retry-After' of response in seconds.
+    @staticmethod
+    def _release_host_limiter_after_response(host_limiter: hostlimits.HostLimiter,
+                                             fetched_response: FetchedResponse) -> float:
+        retry_after_sec = hostlimits.parse_retry_after_sec(fetched_response.get_header('Retry-After'))
+        host_limiter.release_after_response(fetched_response.status_code, fetched_response.elapsed_sec,
+                                            retry_after_sec)
+        return retry_after_sec
+
+    def _should_retry(self, host_limiter: hostlimits.HostLimiter, fetched_response: FetchedResponse,
+                      retry_after_sec: float, attempt: int) -> bool:
+        return attempt + 1 < self.MAX_ATTEMPTS_WITH_HOST_LIMITS and \
+            host_limiter.should_retry_after(fetched_response.status_code, retry_after_sec)
+
+    def _is_replaying_fixtures(self) -> bool:
+        return self._http_fixtures is not None and self._http_fixtures.is_replaying
+
+    def _replay_response(self, scraping_params: DataScrapingParams) -> FetchedResponse:
+        recorded_response = self._http_fixtures.load(scraping_params.request_key, scraping_params.url)
+        return FetchedResponse(recorded_response.status_code, recorded_response.headers, recorded_response.content,
+                               recorded_response.elapsed_sec)
+
+    def _record_response_if_recording(self, scraping_params: DataScrapingParams, fetched_response: FetchedResponse):
+        if self._http_fixtures is None or self._http_fixtures.mode is not httpfixtures.FixtureMode.RECORD:
+            return
+
+        try:
+            self._http_fixtures.record(
+                scraping_params.request_key, scraping_params.url, str(scraping_params.request_content_type),
+                scraping_params.request_body, scraping_params.additional_http_headers,
+                httpfixtures.RecordedResponse(fetched_response.status_code, fetched_response.headers,
+                                              fetched_response.content, fetched_response.elapsed_sec))
+        except Exception:
+            print('Exception while recording response fixture for url: \'' + scraping_params.url + '\'. ' +
+                  'Ignoring error.')
+            print(traceback.print_exc())
+
+    def _get_cached_response_for_revalidation(self, scraping_params: DataScrapingParams) -> httpcache.CachedResponse:
+        if self._response_cache is None:
+            return None
+        return self._response_cache.get(httpcache.get_cache_key(scraping_params.url, scraping_params.request_body))
+
+
+# NOTE: Fetches all URLs on a single event loop instead of one blocked thread per URL.
+# Concurrency is bounded by a semaphore and the connector's connection limit, so hundreds of
+# requests from a large resync message can be in flight without spawning hundreds of threads.
+# Parsing happens on the event loop thread as each response arrives, same as the coordinating
+# thread of the thread pool spider, unless a parse executor is set. Event loop and aiohttp
+# session are process-wide (see 'httpsessions') so keep-alive connections survive across
+# scraping calls. As the shared loop runs one scraping call at a time, identical requests are
+# merged only within a call.
+# Sources:
+#   -aiohttp Docs: Client Quickstart:
+#   https://docs.aiohttp.org/en/stable/client_quickstart.html
+class AsyncWebsiteDataSpider(WebsiteDataSpider):
+    def __init__(self, operation_ctx: 'ScrapingOperationCtx', scraping_options: ScrapingOptions):
+        super().__init__(operation_ctx, scraping_options)
+
+    def scrape(self):
+        self._start_time = time.monotonic()
+        httpsessions.run_on_shared_event_loop(self._scrape_all_requests)
+
+    async def _scrape_all_requests(self):
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        session = httpsessions.get_async_session()
+        # NOTE: Tasks wait for semaphore in order of creation, so launch order holds here too.
+        scraping_tasks = {
+            asyncio.ensure_future(self._scrape_request(session, semaphore, request_key)): request_key
+            for request_key in self._get_request_keys_in_launch_order()
+        }
+        if not scraping_tasks:
+            return
+
+        _, pending_tasks = await asyncio.wait(list(scraping_tasks.keys()), timeout=self._deadline_sec)
+        for pending_task in pending_tasks:
+            pending_task.cancel()
+            self._operation_ctx.scraping_report.add_cut_off_url(
+                self._operation_ctx.get_scraping_params_for_request(scraping_tasks[pending_task]).url)
+        if pending_tasks:
+            await asyncio.wait(pending_tasks)
+
+    async def _scrape_request(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                              request_key: str):
+        scraping_params = self._operation_ctx.get_scraping_params_for_request(request_key)
+        url = scraping_params.url
+        try:
+            async with semaphore:
+                fetched_response = await self._send_request_async(session, scraping_params)
+
+        except asyncio.CancelledError:
+            # NOTE: Cut off by deadline. Re-raising as CancelledError derives from Exception in Python 3.7.
+            raise
+
+        except asyncio.TimeoutError:
+            print('Request timed out for url: \'' + url + '\'.')
+            self._operation_ctx.scraping_report.add_timed_out_url(url)
+            return
+
+        except _HostLimitedRequestError:
+            print('Host limits would delay request past scraping deadline. Cutting off url: \'' + url + '\'.')
+            self._operation_ctx.scraping_report.add_cut_off_url(url)
+            return
+
+        except Exception:
+            print('Exception while crawling with aiohttp for url: \'' + url + '\'.')
+            print(traceback.print_exc())
+            self._operation_ctx.scraping_report.add_failed_url(url)
+            return
+
+        for pending_parse in self._scrape_data_from_response_for_request(request_key, fetched_response):
+            try:
+                await asyncio.wrap_future(pending_parse.future)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # NOTE: Reported by '_complete_pending_parse'.
+                pass
+            self._complete_pending_parse(pending_parse)
+
+    async def _send_request_async(self, session: aiohttp.ClientSession,
+                                  scraping_params: DataScrapingParams) -> FetchedResponse:
+        if self._host_limiters is None:
+            return await self._send_request_hedged_async(session, scraping_params)
+
+        host_limiter = self._host_limiters.get_host_limiter(scraping_params.url)
+        for attempt in range(self.MAX_ATTEMPTS_WITH_HOST_LIMITS):
+            remaining_sec = self._get_remaining_sec_till_deadline(self._start_time)
+            if not await host_limiter.acquire_async(remaining_sec):
+                raise _HostLimitedRequestError(remaining_sec, attempt)
+            try:
+                fetched_response = await self._send_request_hedged_async(session, scraping_params)
+            except asyncio.CancelledError:
+                host_limiter.release_without_feedback()
+                raise
+            except Exception:
+                host_limiter.release_after_error()
+                raise
+
+            retry_after_sec = self._release_host_limiter_after_response(host_limiter, fetched_response)
+            if not self._should_retry(host_limiter, fetched_response, retry_after_sec, attempt):
+                return fetched_response
+
+    # NOTE: Same as '_send_request_hedged', but hedge is a task on the loop, and losing attempt
+    # is cancelled, which releases its connection.
+    async def _send_request_hedged_async(self, session: aiohttp.ClientSession,
+                                         scraping_params: DataScrapingParams) -> FetchedResponse:
+        hedge_delay_sec = self._get_hedge_delay_sec(scraping_params)
+        if hedge_delay_sec is None:
+            return await self._send_request_once_and_record_latency_async(session, scraping_params)
+
+        attempt_tasks = [asyncio.ensure_future(
+            self._send_request_once_and_record_latency_async(session, scraping_params))]
+        try:
+            await asyncio.wait(attempt_tasks, timeout=hedge_delay_sec)
+            if not attempt_tasks[0].done() and self._request_hedging.try_acquire_hedge(scraping_params.url):
+                attempt_tasks.append(asyncio.ensure_future(self._send_request_once_async(session, scraping_params)))
+
+            pending_tasks = set(attempt_tasks)
+            failed_response = None
+            exception = None
+            while pending_tasks:
+                done_tasks, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED)
+                for done_task in done_tasks:
+                    if done_task.exception() is not None:
+                        exception = done_task.exception()
+                    elif _is_successful_response(done_task.result()):
+                        return done_task.result()
+                    else:
+                        failed_response = done_task.result()
+
+            if failed_response is not None:
+                return failed_response
+            raise exception
+
+        finally:
+            for attempt_task in attempt_tasks:
+                if not attempt_task.done():
+                    attempt_task.cancel()
+
+    async def _send_request_once_and_record_latency_async(
+            self, session: aiohttp.ClientSession, scraping_params: DataScrapingParams) -> FetchedResponse:
+        fetched_response = await self._send_request_once_async(session, scraping_params)
+        self._record_latency(scraping_params, fetched_response)
+        return fetched_response
+
+    async def _send_request_once_async(self, session: aiohttp.ClientSession,
+                                       scraping_params: DataScrapingParams) -> FetchedResponse:
+        if self._is_replaying_fixtures():
+            return self._replay_response(scraping_params)
+
+        # NOTE: Guest token activation is a blocking request, so it is kept off the shared loop.
+        if twitterhack.is_twitter_url(scraping_params.url):
+            await asyncio.get_event_loop().run_in_executor(
+                None, twitterhack.activate_twitter_guest_token_if_missing, scraping_params.url)
+        cached_response = self._get_cached_response_for_revalidation(scraping_params)
+        headers = self._get_request_headers(scraping_params, cached_response)
 
-        # Example grequests code for GET, POST JSON and Form Data requests. Similar for requests:
-        # https://www.programcreek.com/python/example/103991/grequests.post
         if scraping_params.request_content_type is ContentType.JSON:
-            request_dict = json.loads(scraping_params.request_body)
-            return requests.post(scraping_params.url, json=request_dict, headers=headers, verify=False)
+            request_kwargs = {'json': json.loads(scraping_params.request_body)}
+            method = 'POST'
+        elif scraping_params.request_content_type is ContentType.FORMDATA:
+            request_kwargs = {'data': json.loads(scraping_params.request_body)}
+            method = 'POST'
+        else:
+            request_kwargs = {}
+            method = 'GET'
+
+        timeout = aiohttp.ClientTimeout(total=self._get_timeout_sec(scraping_params))
+        start_time = time.monotonic()
+        async with session.request(method, scraping_params.url, headers=headers, timeout=timeout,
+                                   **request_kwargs) as response:
+            response_content = decode_response_content(
+                await response.read(), response.headers.get('Content-Type'), scraping_params.response_content_type)
+            fetched_response = FetchedResponse(response.status, response.headers, response_content,
+                                               time.monotonic() - start_time, cached_response)
+        self._record_response_if_recording(scraping_params, fetched_response)
+        return fetched_response
+
+
+# NOTE: Request may be sent, or retried as 'attempt', only after 'wait_sec', as per its host's limits.
+class _HostLimitedRequestError(Exception):
+    def __init__(self, wait_sec: float, attempt: int):
+        super().__init__('Request must wait ' + str(wait_sec) + ' sec for host limits')
+        self._wait_sec: float = wait_sec
+        self._attempt: int = attempt
 
-        if scraping_params.request_content_type is ContentType.FORMDATA:
-            form_data_dict = json.loads(scraping_params.request_body)
-            return requests.post(scraping_params.url, data=form_data_dict, headers=headers, verify=False)
+    @property
+    def wait_sec(self) -> float:
+        return self._wait_sec
+
+    @property
+    def attempt(self) -> int:
+        return self._attempt
+
+
+class _PendingParse:
+    def __init__(self, params_idxs: List[int], fetched_response: FetchedResponse,
+                 future: concurrent.futures.Future):
+        self._params_idxs: List[int] = params_idxs
+        self._fetched_response: FetchedResponse = fetched_response
+        self._future: concurrent.futures.Future = future
+
+    @property
+    def params_idxs(self) -> List[int]:
+        return self._params_idxs
+
+    @property
+    def fetched_response(self) -> FetchedResponse:
+        return self._fetched_response
+
+    @property
+    def future(self) -> concurrent.futures.Future:
+        return self._future
+
+
+class ScrapingReport:
+    def __init__(self):
+        self._cut_off_urls: List[URL] = []
+        self._timed_out_urls: List[URL] = []
+        self._failed_urls: List[URL] = []
+        self._elapsed_sec_by_url: Dict[URL, float] = {}
+
+    # NOTE: Sources still pending when scraping deadline passed.
+    @property
+    def cut_off_urls(self) -> List[URL]:
+        return self._cut_off_urls
+
+    # NOTE: Sources whose request exceeded its per-source timeout.
+    @property
+    def timed_out_urls(self) -> List[URL]:
+        return self._timed_out_urls
+
+    # NOTE: Sources which returned error HTTP code (except 404) or failed while crawling/parsing.
+    @property
+    def failed_urls(self) -> List[URL]:
+        return self._failed_urls
+
+    # NOTE: Request latency of sources which responded.
+    @property
+    def elapsed_sec_by_url(self) -> Dict[URL, float]:
+        return self._elapsed_sec_by_url
+
+    def add_cut_off_url(self, url: URL):
+        self._cut_off_urls.append(url)
+
+    def add_timed_out_url(self, url: URL):
+        self._timed_out_urls.append(url)
 
-        return requests.get(scraping_params.url, headers=headers, verify=False)
+    def add_failed_url(self, url: URL):
+        self._failed_urls.append(url)
 
+    def set_elapsed_sec_for_url(self, url: URL, elapsed_sec: float):
+        if elapsed_sec is not None:
+            self._elapsed_sec_by_url[url] = elapsed_sec
 
+
+# NOTE: Params which would send identical requests (eg: same source url for several resource
+# types or same city under two names) share one request. Its response is then parsed for each
+# of them. Scraped data is kept per params, in order of params passed.
 class ScrapingOperationCtx:
-    def __init__(self, data_scraping_params: List['DataScrapingParams']):
-        self._operation_ctx_for_url = \
-            {scraping_params.url: {'scraping_params': scraping_params, 'scraped_data': None}
-             for scraping_params in data_scraping_params}
+    def __init__(self, data_scraping_params: List['DataScrapingParams'],
+                 scraped_data_consumer: Callable[[int, 'ScrapedData'], None] = None):
+        self._data_scraping_params: List[DataScrapingParams] = data_scraping_params
+        self._scraped_data_list: List[ScrapedData] = [None] * len(data_scraping_params)
+        self._params_idxs_for_request: Dict[str, List[int]] = {}
+        for params_idx, scraping_params in enumerate(data_scraping_params):
+            self._params_idxs_for_request.setdefault(scraping_params.request_key, []).append(params_idx)
+        self._scraping_report: ScrapingReport = ScrapingReport()
+        # NOTE: If set, scraped data is handed to consumer along with index of its params, instead
+        # of being kept here.
+        self._scraped_data_consumer: Callable[[int, 'ScrapedData'], None] = scraped_data_consumer
+
+    @property
+    def scraping_report(self) -> ScrapingReport:
+        return self._scraping_report
 
-    def get_scraping_params_for_url(self, url: URL) -> DataScrapingParams:
-        return self._operation_ctx_for_url[url]['scraping_params']
+    def get_scraping_params(self, params_idx: int) -> DataScrapingParams:
+        return self._data_scraping_params[params_idx]
 
-    def set_scraped_data_for_url(
-            self, url: URL, scraped_data: ScrapedData) -> None:
-        self._operation_ctx_for_url[url]['scraped_data'] = scraped_data
+    # NOTE: Params whose request is sent on behalf of all params sharing it.
+    def get_scraping_params_for_request(self, request_key: str) -> DataScrapingParams:
+        return self._data_scraping_params[self._params_idxs_for_request[request_key][0]]
 
-    def get_all_urls_for_scraping(self) -> List[URL]:
-        return list(self._operation_ctx_for_url.keys())
+    def get_scraping_params_idxs_for_request(self, request_key: str) -> List[int]:
+        return self._params_idxs_for_request[request_key]
+
+    def set_scraped_data(self, params_idx: int, scraped_data: ScrapedData) -> None:
+        if self._scraped_data_consumer is not None:
+            self._scraped_data_consumer(params_idx, scraped_data)
+            return
+        self._scraped_data_list[params_idx] = scraped_data
+
+    def get_all_request_keys(self) -> List[str]:
+        return list(self._params_idxs_for_request.keys())
 
     def get_all_scraped_data(self) -> List['ScrapedData']:
-        return [x['scraped_data'] for x in list(self._operation_ctx_for_url.values())]
+        return list(self._scraped_data_list)
+
+
+class ScrapedDataStream:
+    def __init__(self, data_scraping_params: List['DataScrapingParams'], scraping_options: ScrapingOptions):
+        # NOTE: Unbounded, as blocking the spider on a full queue would hold up its deadline.
+        # Consumer keeps up in practice as mapping a source is much faster than fetching it.
+        self._scraped_data_queue: queue.Queue = queue.Queue()
+        self._operation_ctx: ScrapingOperationCtx = ScrapingOperationCtx(
+            data_scraping_params,
+            lambda params_idx, scraped_data: self._scraped_data_queue.put((params_idx, scraped_data)))
+        self._scraping_thread = threading.Thread(
+            target=self._scrape, args=(scraping_options,), daemon=True)
+        self._scraping_thread.start()
+
+    # NOTE: Complete only after stream is exhausted.
+    @property
+    def scraping_report(self) -> ScrapingReport:
+        return self._operation_ctx.scraping_report
+
+    def __iter__(self) -> Iterator['ScrapedData']:
+        for _, scraped_data in self.iter_with_params_idxs():
+            yield scraped_data
+
+    # NOTE: Yields (index of params in 'data_scraping_params', ScrapedData), for callers needing
+    # to tell apart params with same url, eg: same source scraped for several filters.
+    def iter_with_params_idxs(self) -> Iterator[Tuple[int, 'ScrapedData']]:
+        while True:
+            queued_item = self._scraped_data_queue.get()
+            if isinstance(queued_item, _EndOfScrapedDataStream):
+                self._scraping_thread.join()
+                if queued_item.exception is not None:
+                    raise queued_item.exception
+                return
+            yield queued_item
+
+    def _scrape(self, scraping_options: ScrapingOptions):
+        try:
+            _scrape_data_for_operation_ctx(self._operation_ctx, scraping_options)
+            self._scraped_data_queue.put(_EndOfScrapedDataStream())
+        except Exception as ex:
+            self._scraped_data_queue.put(_EndOfScrapedDataStream(ex))
+
+
+class _EndOfScrapedDataStream:
+    def __init__(self, exception: Exception = None):
+        self._exception: Exception = exception
+
+    @property
+    def exception(self) -> Exception:
+        return self._exception
 
 
 # Factory for content type selector parser
 def create_selector_parser_for_content_type(
-        url: str, content_type: ContentType, content: str) -> 'ContentTypeSelectorParser':
+        url: str, content_type: ContentType, content: Union[str, bytes]) -> 'ContentTypeSelectorParser':
 
     selector_parser_class = {
         ContentType.HTML: HTMLSelectorParser,
@@ -201,21 +1372,23 @@ def create_selector_parser_for_content_type(
     }
 
     if twitterhack.is_twitter_url(url):
-        twitter_response_dict = twitterhack.get_denormalized_tweet_dict(content)
-        twitter_response_dict = twitterhack.add_tweet_url_to_tweets(twitter_response_dict)
-        return selector_parser_class[content_type].create_from_dict_content(twitter_response_dict)
+        return TwitterSearchSelectorParser.create_from_string_content(content)
 
     else:
         return selector_parser_class[content_type].create_from_string_content(content)
 
 
-def scrape_data_from_response(response_content: str,
-                              scraping_params: DataScrapingParams) -> ScrapedData:
+def scrape_data_from_response(response_content: Union[str, bytes],
+                              scraping_params: DataScrapingParams,
+                              content_fingerprint: str = None) -> ScrapedData:
     selector_parser = create_selector_parser_for_content_type(
         scraping_params.url, scraping_params.response_content_type, response_content)
     table_rows = scrape_table_from_response(scraping_params, selector_parser)
     fields = scrape_fields_from_response(scraping_params, selector_parser)
-    return ScrapedData(scraping_params.url, table_rows, fields)
+    mapped_table_rows = None
+    if scraping_params.table_rows_mapper is not None:
+        mapped_table_rows = scraping_params.table_rows_mapper.map_table_rows(table_rows)
+    return ScrapedData(scraping_params.url, table_rows, fields, content_fingerprint, mapped_table_rows)
 
 
 def scrape_fields_from_response(scraping_params: DataScrapingParams,
@@ -223,9 +1396,7 @@ def scrape_fields_from_response(scraping_params: DataScrapingParams,
     field_selector_pairs = [selector_pair for selector_pair in
                             scraping_params.fields_selectors.items()]
     field_selector_vals = [field_selector_pair[1] for field_selector_pair in field_selector_pairs]
-    field_vals: List[str] = \
-        [selector_parser.get_all_vals_matching_selector(field_selector)
-         for field_selector in field_selector_vals]
+    field_vals: List[List[str]] = selector_parser.get_all_vals_matching_selectors(field_selector_vals)
     field_names = [field_selector_pair[0] for field_selector_pair in field_selector_pairs]
     fields = {key: val for key, val in zip(field_names, field_vals)}
     return fields
@@ -238,32 +1409,124 @@ def scrape_table_from_response(
                               scraping_params.table_column_selectors.items()]
     column_selector_values = [col_selector_pair[1] for col_selector_pair in table_column_selectors]
     table_vals_by_column: List[List[str]] = \
-        [selector_parser.get_all_vals_matching_selector(col_selector)
-         for col_selector in column_selector_values]
+        selector_parser.get_all_vals_matching_selectors(column_selector_values)
     column_names = [col_selector_pair[0] for col_selector_pair in table_column_selectors]
-    table_rows = [{col: row_col_val for col, row_col_val in zip(column_names, row_vals)}
-                  for row_vals in zip(*table_vals_by_column)]
-    table_rows = _filter_table_rows(table_rows, scraping_params.table_row_filters)
+    matching_row_idxs = _get_idxs_of_rows_matching_filters(
+        column_names, table_vals_by_column, scraping_params.compiled_table_row_filters)
+    table_rows = [{col: col_vals[row_idx] for col, col_vals in zip(column_names, table_vals_by_column)}
+                  for row_idx in matching_row_idxs]
     return table_rows
 
 
-def _filter_table_rows(table_rows: List[Dict[str, str]], row_filters: Dict[str, str]) -> \
-        List[Dict[str, str]]:
-    return [row for row in table_rows if _row_matches_filters(row, row_filters)]
+# NOTE: Filters are applied column-first on extracted columns, before row dicts are built, so
+# that no dict is allocated for rejected rows. City and resource type filters on pan-India
+# sources reject most rows.
+def _get_idxs_of_rows_matching_filters(
+        column_names: List[str], table_vals_by_column: List[List[str]],
+        compiled_row_filters: List[Tuple[str, regex.Pattern]]) -> List[int]:
+    # NOTE: Rows are zipped from columns, so row count is length of shortest column.
+    row_count = min(len(col_vals) for col_vals in table_vals_by_column) if table_vals_by_column else 0
+    matching_row_idxs = list(range(row_count))
+    if row_count == 0:
+        return matching_row_idxs
 
+    vals_by_column_name = {col: col_vals for col, col_vals in zip(column_names, table_vals_by_column)}
+    return _filter_row_idxs(matching_row_idxs, vals_by_column_name, compiled_row_filters)
+
+
+def _filter_row_idxs(row_idxs: List[int], vals_by_column_name: Dict[str, List[str]],
+                     compiled_row_filters: List[Tuple[str, regex.Pattern]]) -> List[int]:
+    for col_name, row_filter in compiled_row_filters:
+        col_vals = vals_by_column_name[col_name]
+        row_idxs = [row_idx for row_idx in row_idxs if row_filter.search(col_vals[row_idx])]
+    return row_idxs
 
-def _row_matches_filters(table_row: Dict[str, str], row_filters: Dict[str, str]) -> bool:
-    for col_name, row_filter in row_filters.items():
-        if not regex.search(row_filter, table_row[col_name], re.IGNORECASE):
-            return False
 
-    return True
+def get_partitioned_table_fingerprint(scraping_params: DataScrapingParams, content_fingerprint: str) -> str:
+    return contentcache.combine_fingerprints([scraping_params.partitioning_fingerprint, content_fingerprint])
+
+
+def partition_table_from_response(response_content: Union[str, bytes],
+                                  scraping_params: DataScrapingParams,
+                                  content_fingerprint: str) -> 'PartitionedTable':
+    selector_parser = create_selector_parser_for_content_type(
+        scraping_params.url, scraping_params.response_content_type, response_content)
+    column_names = list(scraping_params.table_column_selectors.keys())
+    table_vals_by_column: List[List[str]] = selector_parser.get_all_vals_matching_selectors(
+        list(scraping_params.table_column_selectors.values()))
+    fields = scrape_fields_from_response(scraping_params, selector_parser)
+    return PartitionedTable(scraping_params, column_names, table_vals_by_column, fields, content_fingerprint)
+
+
+# NOTE: Whole table of a response holding all partitions, eg: all districts of a pan-India
+# feed, with row idxs by value of partition column. Built once per response content. Each
+# params' partition column filter is then matched against distinct partition values, not
+# against every row, and its other filters only against rows of matching partitions. Matching
+# is same as in 'scrape_table_from_response', so params get same table rows either way.
+class PartitionedTable:
+    def __init__(self, scraping_params: DataScrapingParams, column_names: List[str],
+                 table_vals_by_column: List[List[str]], fields: Dict[str, str], content_fingerprint: str):
+        if scraping_params.table_partition_column not in column_names:
+            raise ValueError('Partition column \'' + scraping_params.table_partition_column +
+                             '\' is not a table column for url: \'' + scraping_params.url + '\'')
+
+        self._url: URL = scraping_params.url
+        self._column_names: List[str] = column_names
+        self._table_vals_by_column: List[List[str]] = table_vals_by_column
+        self._vals_by_column_name: Dict[str, List[str]] = {
+            col: col_vals for col, col_vals in zip(column_names, table_vals_by_column)}
+        self._partition_column: str = scraping_params.table_partition_column
+        self._fields: Dict[str, str] = fields
+        # NOTE: Fingerprint of response content alone. Each params' scraped data gets it combined
+        # with params' parsing fingerprint, same as if response was parsed for params alone.
+        self._content_fingerprint: str = content_fingerprint
+        self._fingerprint: str = get_partitioned_table_fingerprint(scraping_params, content_fingerprint)
+
+        # NOTE: Rows are zipped from columns, so row count is length of shortest column.
+        self._row_count: int = min(len(col_vals) for col_vals in table_vals_by_column)
+        self._row_idxs_by_partition_val: Dict[str, List[int]] = {}
+        partition_vals = self._vals_by_column_name[self._partition_column]
+        for row_idx in range(self._row_count):
+            self._row_idxs_by_partition_val.setdefault(partition_vals[row_idx], []).append(row_idx)
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    @property
+    def partition_count(self) -> int:
+        return len(self._row_idxs_by_partition_val)
+
+    def get_scraped_data(self, scraping_params: DataScrapingParams) -> ScrapedData:
+        partition_filters = [row_filter for col_name, row_filter in scraping_params.compiled_table_row_filters
+                             if col_name == self._partition_column]
+        other_filters = [(col_name, row_filter) for col_name, row_filter in scraping_params.compiled_table_row_filters
+                         if col_name != self._partition_column]
+
+        if partition_filters:
+            matching_row_idxs = sorted(
+                row_idx for partition_val, row_idxs in self._row_idxs_by_partition_val.items()
+                if all(row_filter.search(partition_val) for row_filter in partition_filters)
+                for row_idx in row_idxs)
+        else:
+            matching_row_idxs = list(range(self._row_count))
+        matching_row_idxs = _filter_row_idxs(matching_row_idxs, self._vals_by_column_name, other_filters)
+
+        table_rows = [{col: col_vals[row_idx] for col, col_vals in zip(self._column_names, self._table_vals_by_column)}
+                      for row_idx in matching_row_idxs]
+        return ScrapedData(self._url, table_rows, self._fields, contentcache.combine_fingerprints(
+            [scraping_params.parsing_fingerprint, self._content_fingerprint]))
 
 
 class ContentTypeSelectorParser(ABC):
     def get_all_vals_matching_selector(self, selector: str) -> List[str]:
         raise NotImplementedError('ContentTypeSelectorParser is an interface')
 
+    # NOTE: Values for each selector, in same order as selectors. Parsers which can extract many
+    # columns in one pass over the content override this.
+    def get_all_vals_matching_selectors(self, selectors: List[str]) -> List[List[str]]:
+        return [self.get_all_vals_matching_selector(selector) for selector in selectors]
+
     @classmethod
     def create_from_string_content(cls, content: str) -> 'ContentTypeSelectorParser':
         raise NotImplementedError('ContentTypeSelectorParser is an interface')
@@ -278,27 +1541,50 @@ class JSONSelectorParser(ContentTypeSelectorParser):
         self._json_content = json_dict
         self._cached_parent_nodes = {}
 
+    # NOTE: Content may be text or UTF-8 bytes. Bytes are parsed in place, without decoding to
+    # text or copying the JSON span out of the body.
     @classmethod
-    def create_from_string_content(cls, content: str) -> 'JSONSelectorParser':
-        return JSONSelectorParser(json.loads(cls._extract_json_from_content(content)))
+    def create_from_string_content(cls, content: Union[str, bytes]) -> 'JSONSelectorParser':
+        return cls(load_json(cls._extract_json_from_content(content)))
 
     @classmethod
     def create_from_dict_content(cls, dict_content: Dict) -> 'JSONSelectorParser':
-        return JSONSelectorParser(dict_content)
+        return cls(dict_content)
 
     def get_all_vals_matching_selector(self, selector: str) -> List[str]:
         selector_tokens = selector.rsplit('.', 1)
-        selector_till_parent = selector_tokens[0]
+        parent_nodes = self._get_parent_nodes(selector_tokens[0])
+        field_selector = selector_tokens[1]
+        return [self._get_str_val_of_field(field_selector, parent_node) for parent_node in parent_nodes]
 
+    # NOTE: Columns sharing a parent selector (Eg: 'data[*].name', 'data[*].phone') are
+    # extracted together in a single pass over their parent nodes.
+    def get_all_vals_matching_selectors(self, selectors: List[str]) -> List[List[str]]:
+        field_selectors_by_parent: Dict[str, List[Tuple[int, str]]] = {}
+        for selector_idx, selector in enumerate(selectors):
+            selector_tokens = selector.rsplit('.', 1)
+            field_selectors_by_parent.setdefault(selector_tokens[0], []).append(
+                (selector_idx, selector_tokens[1]))
+
+        vals_by_selector: List[List[str]] = [[] for _ in selectors]
+        for selector_till_parent, field_selectors in field_selectors_by_parent.items():
+            columns = [vals_by_selector[selector_idx] for selector_idx, _ in field_selectors]
+            for parent_node in self._get_parent_nodes(selector_till_parent):
+                for column, (_, field_selector) in zip(columns, field_selectors):
+                    column.append(self._get_str_val_of_field(field_selector, parent_node))
+
+        return vals_by_selector
+
+    def _get_parent_nodes(self, selector_till_parent: str) -> List:
         if selector_till_parent in self._cached_parent_nodes:
-            parent_nodes = self._cached_parent_nodes[selector_till_parent]
-        else:
-            parent_nodes = [match.value for match in
-                            jsonpath_ng.parse(selector_till_parent).find(self._json_content)]
-            self._cached_parent_nodes[selector_till_parent] = parent_nodes
+            return self._cached_parent_nodes[selector_till_parent]
 
-        field_selector = selector_tokens[1]
-        return [self._get_str_val_of_field(field_selector, parent_node) for parent_node in parent_nodes]
+        parent_nodes = find_simple_jsonpath_matches(selector_till_parent, self._json_content)
+        if parent_nodes is None:
+            parent_nodes = [match.value for match in
+                            compile_jsonpath(selector_till_parent).find(self._json_content)]
+        self._cached_parent_nodes[selector_till_parent] = parent_nodes
+        return parent_nodes
 
     def _get_str_val_of_field(self, field_selector, parent_node):
         # NOTE: KAPIL: In some cases parent node of JSON is 'null'. In such cases,
@@ -321,32 +1607,184 @@ class JSONSelectorParser(ContentTypeSelectorParser):
     # NOTE: KAPIL: Preprocessing for resources which return JSON in a JS variable.
     # Eg: var data = { "abc": 2, "def": [ 2, 3 ] };
     @classmethod
-    def _extract_json_from_content(cls, content: str) -> str:
-        json_dict_start_pos = content.find('{')
-        json_array_start_pos = content.find('[')
+    def _extract_json_from_content(cls, content: Union[str, bytes]) -> Union[str, memoryview]:
+        is_bytes_content = isinstance(content, bytes)
+        if is_bytes_content:
+            json_delimiters = (b'{', b'}', b'[', b']')
+            # NOTE: Slicing memoryview does not copy the span.
+            sliceable_content = memoryview(content)
+        else:
+            json_delimiters = ('{', '}', '[', ']')
+            sliceable_content = content
+        dict_start, dict_end, array_start, array_end = json_delimiters
 
-        json_content = '{}'
+        json_dict_start_pos = content.find(dict_start)
+        json_array_start_pos = content.find(array_start)
+
+        json_content = dict_start + dict_end
         if cls._is_dict_start_before_array_start(json_dict_start_pos, json_array_start_pos):
-            json_content = content[json_dict_start_pos:content.rfind('}') + 1]
+            json_content = sliceable_content[json_dict_start_pos:content.rfind(dict_end) + 1]
 
         else:
-            if json_array_start_pos is not -1:
-                json_content = content[json_array_start_pos:content.rfind(']') + 1]
+            if json_array_start_pos != -1:
+                json_content = sliceable_content[json_array_start_pos:content.rfind(array_end) + 1]
 
         return json_content
 
     @classmethod
     def _is_dict_start_before_array_start(cls, json_dict_start_pos, json_array_start_pos) -> bool:
-        if json_dict_start_pos is not -1 and json_array_start_pos is -1:
+        if json_dict_start_pos != -1 and json_array_start_pos == -1:
             return True
 
-        if json_dict_start_pos is not -1 and json_array_start_pos is not -1 and\
+        if json_dict_start_pos != -1 and json_array_start_pos != -1 and\
                 json_dict_start_pos < json_array_start_pos:
             return True
 
         return False
 
 
+# NOTE: orjson parses straight from bytes or memoryview and is several times faster than 'json'
+# for large responses. It is stricter though, eg: rejects NaN and integers beyond 64 bits, which
+# 'json' accepts. Such content falls back to 'json'.
+# Sources:
+#   -orjson: https://github.com/ijl/orjson
+def load_json(json_content: Union[str, bytes, memoryview]):
+    try:
+        return orjson.loads(json_content)
+    except orjson.JSONDecodeError:
+        if isinstance(json_content, memoryview):
+            json_content = json_content.tobytes()
+        return json.loads(json_content)
+
+
+_CHARSET_REGEX = re.compile(r'charset\s*=\s*["\']?([^"\';\s]+)', re.IGNORECASE)
+_UTF8_COMPATIBLE_CHARSETS = {'utf-8', 'utf8', 'ascii', 'us-ascii'}
+
+
+# NOTE: Decodes response body with charset declared in 'Content-Type' header, else UTF-8.
+# 'requests' 'response.text' and aiohttp's 'text()' run charset detection over the whole body if
+# charset is not declared, which is slow for large responses and not needed as sources serve
+# UTF-8. JSON bodies are not decoded at all and are returned as UTF-8 bytes for 'load_json'.
+# Undecodable bytes are replaced, like aiohttp's 'text(errors='replace')'.
+def decode_response_content(raw_content: bytes, content_type_header: str,
+                            response_content_type: ContentType) -> Union[str, bytes]:
+    charset = _get_declared_charset(content_type_header)
+    if response_content_type is ContentType.JSON:
+        if charset is None or charset in _UTF8_COMPATIBLE_CHARSETS:
+            return raw_content
+        return raw_content.decode(charset, errors='replace').encode('utf-8')
+
+    return raw_content.decode(charset or 'utf-8', errors='replace')
+
+
+def _get_declared_charset(content_type_header: str) -> str:
+    if not content_type_header:
+        return None
+
+    charset_match = _CHARSET_REGEX.search(content_type_header)
+    if charset_match is None:
+        return None
+
+    charset = charset_match.group(1).lower()
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        return None
+    return charset
+
+
+# NOTE: Twitter adaptive search response keeps users apart from tweets. User fields and URL of a
+# tweet (see 'twitterhack.LAZY_TWEET_FIELDS') are resolved only for tweets a selector asks them
+# for, so large search pages are not denormalized upfront.
+class TwitterSearchSelectorParser(JSONSelectorParser):
+    def __init__(self, json_dict: Dict):
+        super().__init__(json_dict)
+        self._users_dict: Dict = twitterhack.get_tweet_users_dict(json_dict) if type(json_dict) is dict else {}
+
+    def _get_str_val_of_field(self, field_selector, parent_node):
+        if field_selector in twitterhack.LAZY_TWEET_FIELDS and type(parent_node) is dict and \
+                field_selector not in parent_node and 'user_id_str' in parent_node:
+            field_val = twitterhack.get_lazy_tweet_field(parent_node, field_selector, self._users_dict)
+            return '' if field_val is None else field_val
+
+        return super()._get_str_val_of_field(field_selector, parent_node)
+
+
+JSONPATH_CACHE_MAX_SIZE = 1024
+
+
+# NOTE: jsonpath_ng builds a PLY parser for every parse() call, which costs more than finding
+# matches in a typical response. Compiled expressions are immutable, so they are cached for the
+# process and shared by all responses of all sources.
+# Benchmark: 'benchmarks/jsonextraction_benchmark.py'
+@functools.lru_cache(maxsize=JSONPATH_CACHE_MAX_SIZE)
+def compile_jsonpath(jsonpath: str):
+    return jsonpath_ng.parse(jsonpath)
+
+
+# NOTE: Fast path for the common JSONPath shapes in web source selectors, i.e. dotted field
+# names each optionally followed by '[*]'. Eg: 'data[*]', '[*]', '$.result.items[*]'.
+# Such paths are walked directly over decoded JSON without jsonpath_ng.
+# Returns None if path or JSON shape is not supported so that caller falls back to jsonpath_ng.
+# Matches are same as jsonpath_ng for supported paths:
+# -Field on non-dict node or missing field matches nothing.
+# -'[*]' on non-list node is wrapped into single-element list by jsonpath_ng and its handling of
+# 'null' differs between versions. Such JSON is left to jsonpath_ng.
+# Benchmark: 'benchmarks/jsonextraction_benchmark.py'
+_SIMPLE_JSONPATH_TOKEN_REGEX = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*)?(\[\*\])?$')
+_JSONPATH_ALL_ITEMS_STEP = None
+
+
+def find_simple_jsonpath_matches(jsonpath: str, json_content) -> List:
+    steps = _get_simple_jsonpath_steps(jsonpath)
+    if steps is None:
+        return None
+
+    nodes = [json_content]
+    for step in steps:
+        matched_nodes = []
+        if step is _JSONPATH_ALL_ITEMS_STEP:
+            for node in nodes:
+                if not isinstance(node, list):
+                    return None
+                matched_nodes.extend(node)
+        else:
+            for node in nodes:
+                if isinstance(node, dict) and step in node:
+                    matched_nodes.append(node[step])
+        nodes = matched_nodes
+
+    return nodes
+
+
+@functools.lru_cache(maxsize=JSONPATH_CACHE_MAX_SIZE)
+def _get_simple_jsonpath_steps(jsonpath: str) -> Tuple:
+    path_tokens = jsonpath.split('.')
+    starts_with_root = path_tokens[0] == '$'
+    if starts_with_root:
+        path_tokens = path_tokens[1:]
+    if len(path_tokens) == 0:
+        return None
+
+    steps = []
+    for token_idx, path_token in enumerate(path_tokens):
+        token_match = _SIMPLE_JSONPATH_TOKEN_REGEX.match(path_token)
+        if token_match is None:
+            return None
+
+        field_name, all_items = token_match.group(1), token_match.group(2)
+        if field_name is None and (all_items is None or token_idx != 0 or starts_with_root):
+            return None
+        if field_name is not None:
+            if field_name in jsonpath_ng.lexer.JsonPathLexer.reserved_words:
+                return None
+            steps.append(field_name)
+        if all_items is not None:
+            steps.append(_JSONPATH_ALL_ITEMS_STEP)
+
+    return tuple(steps)
+
+
 # NOTE: KAPIL: Format of selector: <parent_node_selector>||<child_val_selector>
 # Eg: descendant-or-self::div[@class and contains(concat(' ', normalize-space(@class), ' '),
 # ' detail-row ') and (@class and contains(concat(' ', normalize-space(@class), ' '), ' phone '))]/
@@ -384,6 +1822,78 @@ class HTMLSelectorParser(ContentTypeSelectorParser):
                          for parent_node_result in parent_node_results]
         return matching_vals
 
+    # NOTE: Row-oriented extraction. Columns sharing a parent (row) selector are extracted by
+    # evaluating row selector once and then every column's child selector against each row node,
+    # with compiled XPaths. Values are same as 'get_all_vals_matching_selector', i.e. as returned
+    # by Scrapy's 'SelectorList.get()'.
+    # Sources:
+    #   -lxml Docs: XPath and XSLT with lxml: The XPath class:
+    #   https://lxml.de/xpathxslt.html#the-xpath-class
+    # Benchmark: 'benchmarks/htmlextraction_benchmark.py'
+    def get_all_vals_matching_selectors(self, selectors: List[str]) -> List[List[str]]:
+        child_val_selectors_by_parent: Dict[str, List[Tuple[int, str]]] = {}
+        for selector_idx, selector in enumerate(selectors):
+            html_selector_list = selector.split('||')
+            child_val_selectors_by_parent.setdefault(html_selector_list[0], []).append(
+                (selector_idx, html_selector_list[1]))
+
+        vals_by_selector: List[List[str]] = [[] for _ in selectors]
+        for parent_node_selector, child_val_selectors in child_val_selectors_by_parent.items():
+            row_nodes = _get_compiled_xpath(parent_node_selector)(self._selector.root)
+            # NOTE: Parent selectors matching text or attributes instead of elements are rare.
+            # Leave them to Scrapy.
+            if type(row_nodes) is not list or not all(lxml.etree.iselement(node) for node in row_nodes):
+                for selector_idx, child_val_selector in child_val_selectors:
+                    vals_by_selector[selector_idx] = self.get_all_vals_matching_selector(
+                        parent_node_selector + '||' + child_val_selector)
+                continue
+
+            columns = [(vals_by_selector[selector_idx], _get_compiled_xpath(child_val_selector))
+                       for selector_idx, child_val_selector in child_val_selectors]
+            for row_node in row_nodes:
+                for column, child_val_xpath in columns:
+                    column.append(_get_str_val_of_xpath_result(child_val_xpath(row_node)))
+
+        return vals_by_selector
+
+
+XPATH_CACHE_MAX_SIZE = 1024
+# NOTE: Same as namespaces registered by Scrapy's (parsel) Selector, so that selectors using
+# EXSLT regular expressions and sets work same in both paths.
+_XPATH_NAMESPACES = {'re': 'http://exslt.org/regular-expressions', 'set': 'http://exslt.org/sets'}
+# NOTE: Compiled 'lxml.etree.XPath' objects are kept per thread as lxml does not guarantee that one
+# XPath object can be evaluated concurrently from multiple threads.
+_compiled_xpaths = threading.local()
+
+
+def _get_compiled_xpath(xpath: str) -> lxml.etree.XPath:
+    if not hasattr(_compiled_xpaths, 'by_selector'):
+        _compiled_xpaths.by_selector = {}
+    compiled_xpaths_by_selector = _compiled_xpaths.by_selector
+
+    if xpath not in compiled_xpaths_by_selector:
+        if len(compiled_xpaths_by_selector) >= XPATH_CACHE_MAX_SIZE:
+            compiled_xpaths_by_selector.clear()
+        compiled_xpaths_by_selector[xpath] = lxml.etree.XPath(
+            xpath, namespaces=_XPATH_NAMESPACES, smart_strings=False)
+    return compiled_xpaths_by_selector[xpath]
+
+
+# NOTE: Mirrors 'SelectorList.get(default='')' of Scrapy's (parsel) Selector.
+def _get_str_val_of_xpath_result(xpath_result) -> str:
+    if type(xpath_result) is list:
+        if len(xpath_result) == 0:
+            return ''
+        xpath_result = xpath_result[0]
+
+    if lxml.etree.iselement(xpath_result):
+        return lxml.etree.tostring(xpath_result, method='html', encoding='unicode', with_tail=False)
+    if xpath_result is True:
+        return '1'
+    if xpath_result is False:
+        return '0'
+    return str(xpath_result)
+
 
 # NOTE: KAPIL: Uncomment while testing
 # if __name__ == '__main__':
@@ -0,0 +1,42 @@
+from unittest import TestCase
+import time
+
+import covisearch.util.circuitbreaker as circuitbreaker
+from covisearch.util.circuitbreaker import CircuitState
+
+
+class TestCircuitBreakerRegistry(TestCase):
+    def test_breaker_opens_on_failure_rate_and_closes_after_successful_probe(self):
+        circuit_breakers = circuitbreaker.CircuitBreakerRegistry(
+            window_size=4, min_requests=4, failure_rate_threshold=0.75, open_duration_sec=0.2)
+
+        for record in [circuit_breakers.record_success] + [circuit_breakers.record_failure] * 2:
+            record('dead source')
+        self.assertEqual(circuit_breakers.get_state('dead source'), CircuitState.CLOSED)
+        circuit_breakers.record_failure('dead source')
+
+        self.assertEqual(circuit_breakers.get_state('dead source'), CircuitState.OPEN)
+        self.assertFalse(circuit_breakers.allow_request('dead source'))
+        self.assertTrue(circuit_breakers.allow_request('other source'))
+
+        time.sleep(0.25)
+        self.assertTrue(circuit_breakers.allow_request('dead source'))
+        self.assertEqual(circuit_breakers.get_state('dead source'), CircuitState.HALF_OPEN)
+        self.assertFalse(circuit_breakers.allow_request('dead source'))
+        circuit_breakers.record_success('dead source', 0.1)
+        self.assertEqual(circuit_breakers.get_state('dead source'), CircuitState.CLOSED)
+
+    def test_failed_probe_reopens_breaker_and_slow_responses_count_as_failures(self):
+        circuit_breakers = circuitbreaker.CircuitBreakerRegistry(
+            window_size=2, min_requests=2, failure_rate_threshold=1.0, open_duration_sec=0.2,
+            slow_response_sec=5.0)
+
+        circuit_breakers.record_success('slow source', 10.0)
+        circuit_breakers.record_success('slow source', 10.0)
+        self.assertEqual(circuit_breakers.get_state('slow source'), CircuitState.OPEN)
+
+        time.sleep(0.25)
+        self.assertTrue(circuit_breakers.allow_request('slow source'))
+        circuit_breakers.record_failure('slow source')
+        self.assertEqual(circuit_breakers.get_state('slow source'), CircuitState.OPEN)
+        self.assertFalse(circuit_breakers.allow_request('slow source'))
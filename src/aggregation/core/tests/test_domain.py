@@ -0,0 +1,170 @@
+from unittest import TestCase
+from typing import Dict, List
+import json
+import threading
+import http.server
+import urllib.parse
+
+import covisearch.aggregation.core.domain as domain
+from covisearch.aggregation.core.domain.entities import \
+    AggregatedResourceInfoRepo, FilteredAggregatedResourceInfo, CovidResourceInfo, CovidResourceType, SearchFilter
+import covisearch.aggregation.core.domain.resourcemapping as resourcemapping
+import covisearch.util.httpsessions as httpsessions
+import covisearch.util.circuitbreaker as circuitbreaker
+import covisearch.util.websitedatascraper as webdatascraper
+from covisearch.util.mytypes import ContentType
+
+
+# NOTE: Resources of a city, served as JSON at '/api?city=<city>'. Cities not listed have none.
+RES_INFO_LIST_BY_CITY = {
+    'mumbai': [{'name': 'Oxygen Supplier', 'phone': '9769181218', 'city': 'Mumbai'},
+               {'name': 'Refill Center', 'phone': '8080867676', 'city': 'Mumbai'}],
+    'bengaluru': [{'name': 'Oxygen Bank', 'phone': '9845012345', 'city': 'Bengaluru'}],
+    'bangalore': [{'name': 'Oxygen Bank', 'phone': '9845012345', 'city': 'Bangalore'},
+                  {'name': 'Concentrator Rental', 'phone': '9845054321', 'city': 'Bangalore'}],
+}
+
+
+class _CityRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requested_cities = []
+
+    def do_GET(self):
+        city = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)['city'][0]
+        _CityRequestHandler.requested_cities.append(city)
+        body = json.dumps({'data': RES_INFO_LIST_BY_CITY.get(city, [])}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _WebSourceRepoStub(resourcemapping.WebSourceRepo):
+    def __init__(self, web_resource_url_template: str):
+        self._web_resource_url_template = web_resource_url_template
+
+    def get_web_sources_for_filter(self, search_filter: SearchFilter) -> Dict[str, resourcemapping.WebSource]:
+        if search_filter.city == 'nowhere':
+            return {}
+
+        resource_mapping_desc = {
+            field_mapping[0]: resourcemapping.FieldMappingDesc(field_mapping) for field_mapping in [
+                ('contact_name', 'name'), ('phones', 'phone'), ('address', 'city')]
+        }
+        web_src = resourcemapping.WebSource(
+            'Test Source', 'https://testsource.org', self._web_resource_url_template, 'https://testsource.org/{CITY}',
+            None, None, {}, ContentType.JSON,
+            {'name': 'data[*].name', 'phone': 'data[*].phone', 'city': 'data[*].city'},
+            {}, [], resource_mapping_desc, {'oxygen': 'Oxygen', 'oxy_cylinder': 'Oxygen'}, None, None, search_filter)
+        return {web_src.web_resource_url: web_src}
+
+
+class _ResourceInfoRepoStub(AggregatedResourceInfoRepo):
+    def __init__(self):
+        self.resources_by_filter: Dict[str, List[Dict]] = {}
+
+    def set_resources_for_filter(self, filtered_aggregated_resource_info: FilteredAggregatedResourceInfo):
+        self.resources_by_filter[filtered_aggregated_resource_info.search_filter.to_url_query_string_fmt()] = \
+            filtered_aggregated_resource_info.data
+
+    def remove_resources_for_filter(self, search_filter: SearchFilter):
+        self.resources_by_filter.pop(search_filter.to_url_query_string_fmt(), None)
+
+
+def _get_resources_without_ids(resources: List[Dict]) -> List[Dict]:
+    return [{label: val for label, val in res_info.items() if label != CovidResourceInfo.ID_LABEL}
+            for res_info in resources]
+
+
+class TestAggregateCovidResourcesBatch(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _CityRequestHandler)
+        cls._server_thread = threading.Thread(target=cls._server.serve_forever, daemon=True)
+        cls._server_thread.start()
+        cls._web_src_repo = _WebSourceRepoStub(
+            'http://127.0.0.1:' + str(cls._server.server_address[1]) + '/api?city={CITY}&type={RESOURCE_TYPE}')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.shutdown()
+        cls._server.server_close()
+        httpsessions.close_all_sessions()
+
+    def test_batch_stores_same_resources_as_aggregating_each_filter(self):
+        search_filters = [SearchFilter('mumbai', CovidResourceType.OXYGEN, None),
+                          SearchFilter('bengaluru', CovidResourceType.OXYGEN, None)]
+
+        single_filter_repo = _ResourceInfoRepoStub()
+        for search_filter in search_filters:
+            domain.aggregate_covid_resources(search_filter, single_filter_repo, self._web_src_repo)
+
+        _CityRequestHandler.requested_cities.clear()
+        batch_repo = _ResourceInfoRepoStub()
+        failed_search_filters = domain.aggregate_covid_resources_batch(
+            search_filters, batch_repo, self._web_src_repo)
+
+        self.assertEqual(failed_search_filters, [])
+        # NOTE: Both filters are short of resources, but only 'bengaluru' has a synonym city.
+        self.assertEqual(sorted(_CityRequestHandler.requested_cities), ['bangalore', 'bengaluru', 'mumbai'])
+        self.assertEqual(batch_repo.resources_by_filter.keys(), single_filter_repo.resources_by_filter.keys())
+        for filter_str, resources in batch_repo.resources_by_filter.items():
+            self.assertEqual(_get_resources_without_ids(resources),
+                             _get_resources_without_ids(single_filter_repo.resources_by_filter[filter_str]))
+        self.assertEqual(len(batch_repo.resources_by_filter['city=bengaluru&resource_type=oxygen']), 2)
+
+    def test_filters_sending_same_request_share_scraped_data(self):
+        search_filters = [SearchFilter('mumbai', CovidResourceType.OXYGEN, None),
+                          SearchFilter('mumbai', CovidResourceType.OXY_CYLINDER, None)]
+
+        single_filter_repo = _ResourceInfoRepoStub()
+        for search_filter in search_filters:
+            domain.aggregate_covid_resources(search_filter, single_filter_repo, self._web_src_repo)
+
+        _CityRequestHandler.requested_cities.clear()
+        batch_repo = _ResourceInfoRepoStub()
+        domain.aggregate_covid_resources_batch(search_filters, batch_repo, self._web_src_repo)
+
+        self.assertEqual(_CityRequestHandler.requested_cities, ['mumbai'])
+        self.assertEqual(len(batch_repo.resources_by_filter), 2)
+        for filter_str, resources in batch_repo.resources_by_filter.items():
+            self.assertEqual(len(resources), 2)
+            self.assertEqual(_get_resources_without_ids(resources),
+                             _get_resources_without_ids(single_filter_repo.resources_by_filter[filter_str]))
+
+    def test_batch_returns_failed_filters_and_stores_others(self):
+        search_filters = [SearchFilter('nowhere', CovidResourceType.OXYGEN, None),
+                          SearchFilter('mumbai', CovidResourceType.OXYGEN, None)]
+
+        resource_info_repo = _ResourceInfoRepoStub()
+        failed_search_filters = domain.aggregate_covid_resources_batch(
+            search_filters, resource_info_repo, self._web_src_repo)
+
+        self.assertEqual(failed_search_filters, [search_filters[0]])
+        self.assertEqual(list(resource_info_repo.resources_by_filter.keys()), ['city=mumbai&resource_type=oxygen'])
+        with self.assertRaises(ValueError):
+            domain.aggregate_covid_resources(search_filters[0], resource_info_repo, self._web_src_repo)
+
+
+class TestRecordHealthOfWebSources(TestCase):
+    def tearDown(self):
+        domain.set_web_src_circuit_breakers(None)
+
+    def test_cut_off_sources_are_not_recorded_as_failures(self):
+        web_src_circuit_breakers = circuitbreaker.CircuitBreakerRegistry(min_requests=1)
+        domain.set_web_src_circuit_breakers(web_src_circuit_breakers)
+        web_sources = _WebSourceRepoStub('https://testsource.org/api?city={CITY}').get_web_sources_for_filter(
+            SearchFilter('mumbai', CovidResourceType.OXYGEN, None))
+        scraping_report = webdatascraper.ScrapingReport()
+        scraping_report.add_cut_off_url(list(web_sources.keys())[0])
+
+        domain._record_health_of_web_sources(web_sources, scraping_report)
+        self.assertEqual(web_src_circuit_breakers.get_state('Test Source'), circuitbreaker.CircuitState.CLOSED)
+
+        scraping_report.add_timed_out_url(list(web_sources.keys())[0])
+        domain._record_health_of_web_sources(web_sources, scraping_report)
+        self.assertEqual(web_src_circuit_breakers.get_state('Test Source'), circuitbreaker.CircuitState.OPEN)
@@ -0,0 +1,49 @@
+from unittest import TestCase
+from datetime import datetime, timezone
+
+from covisearch.aggregation.core.domain.entities import CovidResourceInfo, OxygenInfo, DuplicateResourceMerger
+
+
+def _create_res_info(res_id: int, phones, last_verified_day: int, details: str = '') -> dict:
+    return {
+        CovidResourceInfo.ID_LABEL: res_id,
+        CovidResourceInfo.PHONES_LABEL: phones,
+        CovidResourceInfo.CONTACT_NAME_LABEL: 'Contact ' + str(res_id),
+        CovidResourceInfo.DETAILS_LABEL: details,
+        CovidResourceInfo.ADDRESS_LABEL: '',
+        CovidResourceInfo.POST_TIME_LABEL: None,
+        CovidResourceInfo.LAST_VERIFIED_UTC_LABEL:
+            datetime(2021, 6, last_verified_day, tzinfo=timezone.utc) if last_verified_day else None,
+        CovidResourceInfo.SOURCES_LABEL: [{
+            CovidResourceInfo.SOURCE_NAME_LABEL: 'Source ' + str(res_id),
+            CovidResourceInfo.SOURCE_URL_LABEL: 'https://source' + str(res_id) + '.org',
+            CovidResourceInfo.SOURCE_NEEDS_SMART_MATCH: False
+        }]
+    }
+
+
+def _create_resources():
+    return [
+        _create_res_info(0, ['9769181218'], 10, 'Delivers'),
+        _create_res_info(1, ['9769181218', '02228763461'], 12),
+        _create_res_info(2, [], None),
+        _create_res_info(3, ['02228763461'], None, 'Refill'),
+        _create_res_info(4, ['8080867676'], 11),
+        _create_res_info(5, [], 9),
+    ]
+
+
+class TestDuplicateResourceMerger(TestCase):
+    def test_merging_incrementally_matches_merging_all_at_once(self):
+        merged_at_once = OxygenInfo.merge_duplicates(_create_resources())
+
+        duplicate_merger = DuplicateResourceMerger(OxygenInfo)
+        resources = _create_resources()
+        duplicate_merger.add_all(resources[:2])
+        duplicate_merger.add(resources[2])
+        duplicate_merger.add_all(resources[3:])
+        merged_incrementally = duplicate_merger.get_merged_resources()
+
+        self.assertEqual(len(merged_at_once), 4)
+        self.assertEqual(merged_incrementally, merged_at_once)
+        self.assertEqual(len(merged_incrementally[0][CovidResourceInfo.SOURCES_LABEL]), 3)
@@ -0,0 +1,129 @@
+from unittest import TestCase
+import concurrent.futures
+import time
+
+import covisearch.util.hedging as hedging
+import covisearch.util.latencystats as latencystats
+import covisearch.util.websitedatascraper as webdatascraper
+from covisearch.util.mytypes import ContentType
+
+
+class TestRequestHedging(TestCase):
+    def test_hedges_are_limited_to_budget_of_each_host(self):
+        request_hedging = hedging.RequestHedging(budget_ratio=0.1, max_budget=2.0)
+
+        for _ in range(9):
+            request_hedging.record_request('https://slow.org/api?city=mumbai')
+        self.assertFalse(request_hedging.try_acquire_hedge('https://slow.org/api?city=delhi'))
+
+        for _ in range(100):
+            request_hedging.record_request('https://slow.org/api?city=mumbai')
+        self.assertTrue(request_hedging.try_acquire_hedge('https://slow.org/api?city=delhi'))
+        self.assertTrue(request_hedging.try_acquire_hedge('https://slow.org/api?city=pune'))
+        self.assertFalse(request_hedging.try_acquire_hedge('https://slow.org/api?city=pune'))
+        self.assertFalse(request_hedging.try_acquire_hedge('https://other.org/api'))
+        self.assertEqual(request_hedging.get_hedge_count('https://slow.org'), 2)
+
+    def test_first_successful_attempt_wins(self):
+        def slow_attempt():
+            time.sleep(0.5)
+            return 'slow'
+
+        def failed_attempt():
+            raise ValueError('failed')
+
+        attempt_futures = [hedging.run_in_thread(slow_attempt), hedging.run_in_thread(lambda: 'fast')]
+        self.assertEqual(hedging.get_first_successful_result(attempt_futures), 'fast')
+        attempt_futures = [hedging.run_in_thread(slow_attempt), hedging.run_in_thread(failed_attempt)]
+        self.assertEqual(hedging.get_first_successful_result(attempt_futures), 'slow')
+        with self.assertRaises(ValueError):
+            hedging.get_first_successful_result([hedging.run_in_thread(failed_attempt)])
+
+    def test_fast_error_response_of_hedge_does_not_win_over_slower_success(self):
+        def slow_ok_attempt():
+            time.sleep(0.3)
+            return webdatascraper.FetchedResponse(200, {}, 'ok')
+
+        def slow_not_found_attempt():
+            time.sleep(0.3)
+            return webdatascraper.FetchedResponse(404, {}, 'not found')
+
+        def fast_unavailable_attempt():
+            return webdatascraper.FetchedResponse(503, {}, 'unavailable')
+
+        attempt_futures = [hedging.run_in_thread(slow_ok_attempt), hedging.run_in_thread(fast_unavailable_attempt)]
+        self.assertEqual(hedging.get_first_successful_result(
+            attempt_futures, webdatascraper._is_successful_response).status_code, 200)
+
+        attempt_futures = [hedging.run_in_thread(slow_not_found_attempt),
+                           hedging.run_in_thread(fast_unavailable_attempt)]
+        self.assertEqual(hedging.get_first_successful_result(
+            attempt_futures, webdatascraper._is_successful_response).status_code, 404)
+
+    def test_hedge_is_started_only_for_request_slower_than_hedge_delay(self):
+        hedge_acquire_count = [0]
+
+        def try_acquire_hedge():
+            hedge_acquire_count[0] += 1
+            return True
+
+        def slow_request():
+            time.sleep(0.5)
+            return 'slow'
+
+        self.assertEqual(hedging.send_with_hedge(lambda: 'fast', 0.1, lambda: 'hedge', try_acquire_hedge), 'fast')
+        time.sleep(0.2)
+        self.assertEqual(hedge_acquire_count[0], 0)
+
+        response_future = concurrent.futures.Future()
+        start_time = time.monotonic()
+        hedging.run_in_thread(lambda: hedging.send_with_hedge(
+            slow_request, 0.1, lambda: 'hedge', try_acquire_hedge, result_future=response_future))
+        self.assertEqual(response_future.result(), 'hedge')
+        self.assertLess(time.monotonic() - start_time, 0.4)
+        self.assertEqual(hedge_acquire_count[0], 1)
+
+    def test_only_idempotent_requests_are_hedged(self):
+        latency_stats = latencystats.LatencyStatsRegistry()
+        for _ in range(hedging.RequestHedging.DEFAULT_MIN_SAMPLES):
+            latency_stats.record_latency('https://source.org', 0.05)
+        spider = webdatascraper.WebsiteDataSpider(None, webdatascraper.ScrapingOptions(
+            latency_stats=latency_stats, request_hedging=hedging.RequestHedging()))
+
+        get_params = webdatascraper.DataScrapingParams(
+            'https://source.org/api', None, None, {}, ContentType.JSON, {}, {}, {})
+        post_params = webdatascraper.DataScrapingParams(
+            'https://source.org/api', ContentType.JSON, '{}', {}, ContentType.JSON, {}, {}, {})
+        idempotent_post_params = webdatascraper.DataScrapingParams(
+            'https://source.org/api', ContentType.JSON, '{}', {}, ContentType.JSON, {}, {}, {},
+            idempotent_post_request=True)
+
+        self.assertEqual(spider._get_hedge_delay_sec(get_params), 0.05)
+        self.assertIsNone(spider._get_hedge_delay_sec(post_params))
+        self.assertEqual(spider._get_hedge_delay_sec(idempotent_post_params), 0.05)
+
+
+class TestLatencyStatsRegistry(TestCase):
+    def test_percentile_latency_of_host_over_recent_window(self):
+        latency_stats = latencystats.LatencyStatsRegistry(window_size=10)
+
+        for latency_ms in range(1, 11):
+            latency_stats.record_latency('https://source.org/api?city=mumbai', latency_ms / 1000)
+
+        self.assertEqual(latency_stats.get_percentile_latency_sec('https://source.org/api', 90), 0.009)
+        self.assertIsNone(latency_stats.get_percentile_latency_sec('https://source.org/api', 90, 11))
+        self.assertIsNone(latency_stats.get_percentile_latency_sec('https://other.org/api', 90))
+
+        latency_stats.record_latency('https://SOURCE.org/api', 1.0)
+        self.assertEqual(latency_stats.get_percentile_latency_sec('https://source.org/api', 90), 0.01)
+        self.assertEqual(latency_stats.get_percentile_latency_sec('https://source.org/api', 100), 1.0)
+
+    def test_ewma_latency_follows_latest_latencies_of_host(self):
+        latency_stats = latencystats.LatencyStatsRegistry(ewma_weight=0.5)
+
+        self.assertIsNone(latency_stats.get_ewma_latency_sec('https://source.org/api'))
+        latency_stats.record_latency('https://source.org/api?city=mumbai', 1.0)
+        self.assertEqual(latency_stats.get_ewma_latency_sec('https://source.org/api'), 1.0)
+        latency_stats.record_latency('https://source.org/api?city=delhi', 2.0)
+        latency_stats.record_latency('https://source.org/api?city=pune', 3.0)
+        self.assertEqual(latency_stats.get_ewma_latency_sec('https://source.org/api'), 2.25)
@@ -0,0 +1,85 @@
+from unittest import TestCase
+import email.utils
+import time
+
+import covisearch.util.hostlimits as hostlimits
+
+
+class TestHostLimiter(TestCase):
+    def _host_limiter(self) -> hostlimits.HostLimiter:
+        return hostlimits.HostLimiter(4, 16, 100.0, 0.5, 200.0, 5.0)
+
+    def test_concurrency_limit_grows_on_success_and_halves_on_overload(self):
+        host_limiter = self._host_limiter()
+
+        for _ in range(20):
+            host_limiter.acquire()
+            host_limiter.release_after_response(200, 0.1)
+        grown_limit = host_limiter.concurrency_limit
+        self.assertGreater(grown_limit, 4)
+
+        host_limiter.acquire()
+        host_limiter.release_after_response(503, 0.1)
+        self.assertEqual(host_limiter.concurrency_limit, int(grown_limit * 0.5))
+
+    def test_requests_beyond_concurrency_limit_wait(self):
+        host_limiter = self._host_limiter()
+
+        for _ in range(4):
+            self.assertEqual(host_limiter.try_acquire(), 0.0)
+        self.assertGreater(host_limiter.try_acquire(), 0.0)
+
+        host_limiter.release_without_feedback()
+        self.assertEqual(host_limiter.try_acquire(), 0.0)
+
+    def test_slow_response_shrinks_concurrency_limit(self):
+        host_limiter = self._host_limiter()
+
+        for latency_sec in [0.5, 10.0]:
+            host_limiter.try_acquire()
+            host_limiter.release_after_response(200, latency_sec)
+
+        self.assertLess(host_limiter.concurrency_limit, 4)
+
+    def test_retry_after_pauses_host(self):
+        host_limiter = self._host_limiter()
+
+        host_limiter.try_acquire()
+        host_limiter.release_after_response(429, 0.1, 60.0)
+
+        self.assertGreater(host_limiter.try_acquire(), 4.0)
+        self.assertTrue(host_limiter.should_retry_after(429, 1.0))
+        self.assertFalse(host_limiter.should_retry_after(429, 60.0))
+        self.assertFalse(host_limiter.should_retry_after(500, None))
+
+    def test_acquire_fails_fast_if_wait_exceeds_timeout(self):
+        host_limiter = self._host_limiter()
+        host_limiter.try_acquire()
+        host_limiter.release_after_response(429, 0.1, 2.0)
+
+        start_time = time.monotonic()
+        self.assertFalse(host_limiter.acquire(0.5))
+        self.assertLess(time.monotonic() - start_time, 0.1)
+
+
+class TestTokenBucket(TestCase):
+    def test_tokens_are_limited_to_burst_then_refill_at_rate(self):
+        token_bucket = hostlimits.TokenBucket(10.0, 2)
+
+        self.assertEqual(token_bucket.try_take(), 0.0)
+        self.assertEqual(token_bucket.try_take(), 0.0)
+        wait_sec = token_bucket.try_take()
+        self.assertGreater(wait_sec, 0.0)
+        self.assertLessEqual(wait_sec, 0.1)
+
+        time.sleep(wait_sec)
+        self.assertEqual(token_bucket.try_take(), 0.0)
+
+
+class TestParseRetryAfter(TestCase):
+    def test_seconds_and_http_date_are_parsed(self):
+        self.assertEqual(hostlimits.parse_retry_after_sec('120'), 120.0)
+        self.assertIsNone(hostlimits.parse_retry_after_sec(None))
+        self.assertIsNone(hostlimits.parse_retry_after_sec('soon'))
+        retry_after_sec = hostlimits.parse_retry_after_sec(email.utils.formatdate(time.time() + 30, usegmt=True))
+        self.assertAlmostEqual(retry_after_sec, 30.0, delta=2.0)
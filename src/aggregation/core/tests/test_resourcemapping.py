@@ -0,0 +1,133 @@
+from unittest import TestCase
+import pickle
+import concurrent.futures
+
+from covisearch.aggregation.core.domain.entities import CovidResourceInfo, CovidResourceType, SearchFilter
+import covisearch.aggregation.core.domain.resourcemapping as resourcemapping
+import covisearch.util.contentcache as contentcache
+from covisearch.util.mytypes import ContentType
+
+
+def _create_web_src(search_filter: SearchFilter, datetime_fmt: str = 'isoformat') -> resourcemapping.WebSource:
+    resource_mapping_desc = {
+        field_mapping[0]: resourcemapping.FieldMappingDesc(field_mapping) for field_mapping in [
+            ('contact_name', 'name'), ('phones', 'phone'), ('details', 'details'),
+            ('address', 'address+city'),
+            ('last_verified_utc', 'datetimeformat(' + datetime_fmt + '),last_verified')]
+    }
+    return resourcemapping.WebSource(
+        'Test Source', 'https://testsource.org', 'https://testsource.org/api?city={CITY}&type={RESOURCE_TYPE}',
+        'https://testsource.org/{CITY}', None, None, {}, ContentType.JSON,
+        {'name': 'data[*].name', 'phone': 'data[*].phone', 'details': 'data[*].details',
+         'address': 'data[*].address', 'city': 'data[*].city', 'last_verified': 'data[*].last_verified'},
+        {}, [], resource_mapping_desc, {'oxygen': 'Oxygen'}, None, None, search_filter)
+
+
+WEB_SRC_RES_INFO_LIST = [
+    {'name': 'Oxygen Supplier', 'phone': '9769181218', 'details': 'Delivers all over Mumbai',
+     'address': 'Andheri', 'city': 'Mumbai', 'last_verified': '2021-06-17T16:55:25.000000'},
+    {'name': 'Refill Center', 'phone': '022 2876 3461 / 8080867676', 'details': '',
+     'address': '', 'city': 'Mumbai', 'last_verified': 'not a date'},
+]
+
+
+class TestResourceInfoMapper(TestCase):
+    def test_cached_mapping_matches_uncached_mapping_with_new_ids(self):
+        search_filter = SearchFilter('mumbai', CovidResourceType.OXYGEN, None)
+        web_src = _create_web_src(search_filter)
+        mapped_resources_cache = contentcache.ContentFingerprintCache()
+
+        uncached_res_info_list = resourcemapping.ResourceInfoMapper().map_all_res_info_to_covisearch(
+            WEB_SRC_RES_INFO_LIST, 'fingerprint', search_filter, web_src)
+
+        resource_info_mapper = resourcemapping.ResourceInfoMapper(mapped_resources_cache)
+        first_res_info_list = resource_info_mapper.map_all_res_info_to_covisearch(
+            WEB_SRC_RES_INFO_LIST, 'fingerprint', search_filter, web_src)
+        first_res_info_list[0][CovidResourceInfo.SOURCES_LABEL].append({'name': 'merged source'})
+        first_res_info_list[0][CovidResourceInfo.PHONES_LABEL].append('merged phone')
+        second_res_info_list = resource_info_mapper.map_all_res_info_to_covisearch(
+            WEB_SRC_RES_INFO_LIST, 'fingerprint', search_filter, web_src)
+
+        self.assertEqual(len(mapped_resources_cache), 1)
+        self.assertEqual([res_info[CovidResourceInfo.ID_LABEL] for res_info in second_res_info_list], [2, 3])
+        for uncached_res_info, second_res_info in zip(uncached_res_info_list, second_res_info_list):
+            uncached_res_info.pop(CovidResourceInfo.ID_LABEL)
+            second_res_info.pop(CovidResourceInfo.ID_LABEL)
+            self.assertEqual(uncached_res_info, second_res_info)
+
+    def test_mapping_is_not_cached_for_relative_datetime_or_missing_fingerprint(self):
+        search_filter = SearchFilter('mumbai', CovidResourceType.OXYGEN, None)
+        mapped_resources_cache = contentcache.ContentFingerprintCache()
+        resource_info_mapper = resourcemapping.ResourceInfoMapper(mapped_resources_cache)
+
+        resource_info_mapper.map_all_res_info_to_covisearch(
+            WEB_SRC_RES_INFO_LIST, 'fingerprint', search_filter, _create_web_src(search_filter, 'ago'))
+        resource_info_mapper.map_all_res_info_to_covisearch(
+            WEB_SRC_RES_INFO_LIST, None, search_filter, _create_web_src(search_filter))
+
+        self.assertEqual(len(mapped_resources_cache), 0)
+
+    def test_rows_mapped_in_parse_worker_match_mapper_and_get_new_ids(self):
+        search_filter = SearchFilter('mumbai', CovidResourceType.OXYGEN, None)
+        web_src = _create_web_src(search_filter)
+        mapped_resources_cache = contentcache.ContentFingerprintCache()
+        table_rows_mapper = pickle.loads(pickle.dumps(resourcemapping.CovisearchTableRowsMapper(search_filter, web_src)))
+
+        expected_res_info_list = resourcemapping.ResourceInfoMapper().map_all_res_info_to_covisearch(
+            WEB_SRC_RES_INFO_LIST, None, search_filter, web_src)
+        resource_info_mapper = resourcemapping.ResourceInfoMapper(mapped_resources_cache)
+        resource_info_mapper.map_all_res_info_to_covisearch(WEB_SRC_RES_INFO_LIST, None, search_filter, web_src)
+        adopted_res_info_list = resource_info_mapper.adopt_mapped_res_info_list(
+            table_rows_mapper.map_table_rows(WEB_SRC_RES_INFO_LIST), 'fingerprint', search_filter, web_src)
+
+        self.assertEqual([res_info[CovidResourceInfo.ID_LABEL] for res_info in adopted_res_info_list], [2, 3])
+        self.assertEqual(len(mapped_resources_cache), 1)
+        for expected_res_info, adopted_res_info in zip(expected_res_info_list, adopted_res_info_list):
+            expected_res_info.pop(CovidResourceInfo.ID_LABEL)
+            adopted_res_info = dict(adopted_res_info)
+            adopted_res_info.pop(CovidResourceInfo.ID_LABEL)
+            self.assertEqual(expected_res_info, adopted_res_info)
+
+    def test_mapping_plan_is_compiled_once_per_web_src_and_maps_specific_fields(self):
+        search_filter = SearchFilter('mumbai', CovidResourceType.HOSPITAL_BED, None)
+        resource_mapping_desc = {
+            field_mapping[0]: resourcemapping.FieldMappingDesc(field_mapping) for field_mapping in [
+                ('contact_name', 'name'), ('card_source_url', 'link'), ('hospital_type', 'type+ward'),
+                ('available_covid_beds', 'beds'), ('total_available_beds', 'total')]
+        }
+        web_src = resourcemapping.WebSource(
+            'Test Source', 'https://testsource.org', 'https://testsource.org/api?city={CITY}&type={RESOURCE_TYPE}',
+            'https://testsource.org', None, None, {}, ContentType.JSON, {}, {}, [],
+            resource_mapping_desc, {'hospital_bed': 'Beds'}, None, None, search_filter)
+        web_src_res_info_list = [
+            {'name': 'City Hospital', 'link': '/post/1', 'type': 'Private', 'ward': 'Covid', 'beds': '12 beds',
+             'total': 'NA'},
+            {'name': 'Civic Hospital', 'link': '/post/2', 'type': 'Govt', 'ward': '', 'beds': 'none',
+             'total': '30'}]
+        resource_info_mapper = resourcemapping.ResourceInfoMapper()
+
+        first_res_info_list = resource_info_mapper.map_all_res_info_to_covisearch(
+            web_src_res_info_list, None, search_filter, web_src)
+        second_res_info = resource_info_mapper.map_res_info_to_covisearch(
+            web_src_res_info_list[0], search_filter, web_src)
+
+        self.assertEqual(len(resource_info_mapper._mapping_plans), 1)
+        self.assertEqual(second_res_info[CovidResourceInfo.ID_LABEL], 2)
+        self.assertEqual([res_info[CovidResourceInfo.SOURCES_LABEL][0][CovidResourceInfo.SOURCE_URL_LABEL]
+                          for res_info in first_res_info_list],
+                         ['https://testsource.org/post/1', 'https://testsource.org/post/2'])
+        self.assertEqual([(res_info['hospital_type'], res_info['available_covid_beds'],
+                           res_info['total_available_beds']) for res_info in first_res_info_list],
+                         [('Private | Covid', 12, 12), ('Govt', None, 30)])
+        self.assertEqual(first_res_info_list[0][CovidResourceInfo.PHONES_LABEL], [])
+        self.assertIsNone(first_res_info_list[0][CovidResourceInfo.LAST_VERIFIED_UTC_LABEL])
+
+
+class TestResourceIdAllocator(TestCase):
+    def test_ids_allocated_from_many_threads_are_unique(self):
+        resource_id_allocator = resourcemapping.ResourceIdAllocator()
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            resource_ids = list(executor.map(lambda _: resource_id_allocator.allocate(), range(2000)))
+
+        self.assertEqual(sorted(resource_ids), list(range(2000)))
@@ -0,0 +1,62 @@
+from unittest import TestCase
+import threading
+import time
+import concurrent.futures
+
+import covisearch.util.singleflight as singleflight
+
+
+class TestSingleFlightGroup(TestCase):
+    def test_concurrent_calls_for_same_key_share_one_call(self):
+        single_flight_group = singleflight.SingleFlightGroup()
+        call_started = threading.Event()
+        release_call = threading.Event()
+        call_count = [0]
+
+        def slow_call():
+            call_count[0] += 1
+            call_started.set()
+            release_call.wait(5)
+            return ['response']
+
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            leader_result = executor.submit(single_flight_group.do, 'key', slow_call)
+            call_started.wait(5)
+            follower_results = [executor.submit(single_flight_group.do, 'key', slow_call) for _ in range(3)]
+            # NOTE: Gives followers time to join the in-flight call.
+            time.sleep(0.3)
+            release_call.set()
+            results = [leader_result.result()] + [result.result() for result in follower_results]
+
+        self.assertEqual(call_count[0], 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertFalse(single_flight_group.is_in_flight('key'))
+        self.assertEqual(single_flight_group.do('key', lambda: 'next'), 'next')
+
+    def test_exception_is_raised_to_caller_and_key_is_released(self):
+        single_flight_group = singleflight.SingleFlightGroup()
+
+        def failing_call():
+            raise ValueError('source down')
+
+        with self.assertRaises(ValueError):
+            single_flight_group.do('key', failing_call)
+        self.assertFalse(single_flight_group.is_in_flight('key'))
+
+    def test_caller_joining_in_flight_call_waits_only_till_its_timeout(self):
+        single_flight_group = singleflight.SingleFlightGroup()
+        call_started = threading.Event()
+        release_call = threading.Event()
+
+        def slow_call():
+            call_started.set()
+            release_call.wait(5)
+            return 'response'
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            leader_result = executor.submit(single_flight_group.do, 'key', slow_call)
+            call_started.wait(5)
+            with self.assertRaises(concurrent.futures.TimeoutError):
+                single_flight_group.do('key', slow_call, 0.1)
+            release_call.set()
+            self.assertEqual(leader_result.result(), 'response')
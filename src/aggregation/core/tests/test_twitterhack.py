@@ -0,0 +1,145 @@
+from unittest import TestCase
+import concurrent.futures
+import http.server
+import json
+import threading
+import time
+
+import covisearch.util.twitterhack as twitterhack
+import covisearch.util.websitedatascraper as webdatascraper
+from covisearch.util.mytypes import ContentType
+
+
+class _ActivateRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    activate_count = 0
+    activate_count_lock = threading.Lock()
+
+    def do_POST(self):
+        with _ActivateRequestHandler.activate_count_lock:
+            _ActivateRequestHandler.activate_count += 1
+            guest_token = 'token' + str(_ActivateRequestHandler.activate_count)
+        if self.path.startswith('/failing'):
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        # NOTE: Keeps activation in flight long enough for concurrent callers to pile up.
+        time.sleep(0.2)
+        body = json.dumps({'guest_token': guest_token}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTwitterGuestTokenManager(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _ActivateRequestHandler)
+        cls._server_thread = threading.Thread(target=cls._server.serve_forever, daemon=True)
+        cls._server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.shutdown()
+        cls._server.server_close()
+
+    def setUp(self):
+        _ActivateRequestHandler.activate_count = 0
+
+    def _guest_token_manager(self, token_lifetime_sec: float, refresh_ahead_sec: float,
+                             guest_token_manager_class=twitterhack.TwitterGuestTokenManager, path_prefix: str = ''):
+        guest_token_manager = guest_token_manager_class(
+            'http://127.0.0.1:' + str(self._server.server_address[1]) + path_prefix + '/1.1/guest/activate.json',
+            'bearer', token_lifetime_sec, refresh_ahead_sec)
+        self.addCleanup(guest_token_manager.stop_background_refresh)
+        return guest_token_manager
+
+    def test_concurrent_callers_share_one_activation(self):
+        guest_token_manager = self._guest_token_manager(60.0, 10.0)
+
+        with concurrent.futures.ThreadPoolExecutor(20) as executor:
+            guest_tokens = list(executor.map(
+                lambda _: guest_token_manager.activate_guest_token_if_missing(), range(20)))
+
+        self.assertEqual(guest_tokens, ['token1'] * 20)
+        self.assertEqual(_ActivateRequestHandler.activate_count, 1)
+
+    def test_token_is_refreshed_in_background_before_expiry(self):
+        guest_token_manager = self._guest_token_manager(1.5, 1.0)
+        self.assertEqual(guest_token_manager.activate_guest_token_if_missing(), 'token1')
+
+        time.sleep(1.0)
+        start_time = time.monotonic()
+        guest_token = guest_token_manager.get_guest_token()
+
+        self.assertEqual(guest_token, 'token2')
+        self.assertLess(time.monotonic() - start_time, 0.1)
+        self.assertEqual(_ActivateRequestHandler.activate_count, 2)
+
+    def test_token_is_activated_in_background_without_blocking_caller(self):
+        guest_token_manager = self._guest_token_manager(60.0, 10.0)
+
+        start_time = time.monotonic()
+        self.assertEqual(guest_token_manager.get_guest_token(), '')
+        self.assertLess(time.monotonic() - start_time, 0.1)
+
+        time.sleep(0.5)
+        self.assertEqual(guest_token_manager.get_guest_token(), 'token1')
+        self.assertEqual(_ActivateRequestHandler.activate_count, 1)
+
+    def test_failing_refresh_backs_off_and_stops_after_max_failures(self):
+        class _QuicklyRetryingGuestTokenManager(twitterhack.TwitterGuestTokenManager):
+            RETRY_AFTER_FAILURE_SEC = 0.05
+            MAX_REFRESH_FAILURES = 3
+
+        guest_token_manager = self._guest_token_manager(
+            60.0, 10.0, _QuicklyRetryingGuestTokenManager, '/failing')
+        guest_token_manager.start_background_refresh()
+
+        time.sleep(1.0)
+        self.assertEqual(_ActivateRequestHandler.activate_count, 3)
+        self.assertEqual(guest_token_manager.get_guest_token(), '')
+        time.sleep(0.5)
+        self.assertEqual(_ActivateRequestHandler.activate_count, 6)
+
+
+TWITTER_SEARCH_RESPONSE = {
+    'globalObjects': {
+        'tweets': {
+            '101': {'id_str': '101', 'user_id_str': '1', 'full_text': 'Oxygen available in Pune'},
+            '102': {'id_str': '102', 'user_id_str': '2', 'full_text': 'Need plasma in Mumbai'},
+            '103': {'id_str': '103', 'user_id_str': '1', 'full_text': 'Oxygen refill in Mumbai'},
+        },
+        'users': {
+            '1': {'name': 'Covid Helpline', 'screen_name': 'covidhelp'},
+            '2': {'name': 'Plasma Seeker', 'screen_name': 'plasmaseeker'},
+        }
+    }
+}
+
+
+class TestTwitterSearchSelectorParser(TestCase):
+    def test_lazily_resolved_tweet_fields_match_denormalized_tweets(self):
+        table_column_selectors = {
+            field_name: 'globalObjects.tweets.*.' + field_name
+            for field_name in ['full_text', 'user_name', 'user_screen_name', 'tweet_url']}
+        scraping_params = webdatascraper.DataScrapingParams(
+            'https://twitter.com/i/api/2/search/adaptive.json', None, None, {}, ContentType.JSON,
+            table_column_selectors, {'full_text': 'mumbai'}, {})
+        response_content = json.dumps(TWITTER_SEARCH_RESPONSE).encode('utf-8')
+
+        scraped_data = webdatascraper.scrape_data_from_response(response_content, scraping_params)
+
+        denormalized_tweet_dict = twitterhack.add_tweet_url_to_tweets(
+            twitterhack.get_denormalized_tweet_dict(response_content))
+        expected_table_rows = webdatascraper.scrape_table_from_response(
+            scraping_params, webdatascraper.JSONSelectorParser(denormalized_tweet_dict))
+        self.assertEqual(scraped_data.table_rows, expected_table_rows)
+        self.assertEqual([row['tweet_url'] for row in scraped_data.table_rows],
+                         ['https://twitter.com/plasmaseeker/status/102', 'https://twitter.com/covidhelp/status/103'])
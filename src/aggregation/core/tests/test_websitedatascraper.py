@@ -0,0 +1,578 @@
+from unittest import TestCase
+import os
+import hashlib
+import tempfile
+import threading
+import concurrent.futures
+import time
+import http.server
+
+import covisearch.util.websitedatascraper as webdatascraper
+import covisearch.util.httpsessions as httpsessions
+import covisearch.util.httpcache as httpcache
+import covisearch.util.contentcache as contentcache
+import covisearch.util.hostlimits as hostlimits
+import covisearch.util.httpfixtures as httpfixtures
+import covisearch.util.latencystats as latencystats
+import covisearch.util.hedging as hedging
+from covisearch.util.mytypes import ContentType
+
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web source response samples')
+
+
+def _read_sample(sample_name: str) -> bytes:
+    with open(os.path.join(SAMPLES_DIR, sample_name + '.txt'), 'rb') as sample_file:
+        return sample_file.read()
+
+
+class _SampleRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    client_ports = set()
+    status_codes = []
+    throttled_request_count = 0
+    hedged_request_count = 0
+
+    def do_GET(self):
+        _SampleRequestHandler.client_ports.add(self.client_address[1])
+        if self.path.startswith('/throttled') and self._throttle():
+            return
+        is_slow = self.path.startswith('/slow') or self._is_first_hedged_request()
+        if is_slow:
+            time.sleep(1.5)
+        sample_name = self.path.split('?')[0].strip('/').replace('%20', ' ').replace('slow/', '') \
+            .replace('throttled/', '').replace('hedged/', '')
+        try:
+            body = _read_sample(sample_name)
+        except OSError:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self._record_status_code(304, is_slow)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self._record_status_code(200, is_slow)
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # NOTE: Only first request to '/hedged' is slow, so its hedge answers first.
+    def _is_first_hedged_request(self) -> bool:
+        if not self.path.startswith('/hedged'):
+            return False
+        _SampleRequestHandler.hedged_request_count += 1
+        return _SampleRequestHandler.hedged_request_count == 1
+
+    # NOTE: Every other request to '/throttled' is refused with 429.
+    def _throttle(self) -> bool:
+        _SampleRequestHandler.throttled_request_count += 1
+        if _SampleRequestHandler.throttled_request_count % 2 == 0:
+            return False
+
+        self._record_status_code(429, False)
+        self.send_response(429)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return True
+
+    @staticmethod
+    def _record_status_code(status_code: int, is_slow: bool):
+        if not is_slow:
+            _SampleRequestHandler.status_codes.append(status_code)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UppercaseNameRowsMapper(webdatascraper.TableRowsMapper):
+    def map_table_rows(self, table_rows):
+        return [{'name': row['name'].upper()} for row in table_rows]
+
+
+class TestWebsiteDataSpider(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _SampleRequestHandler)
+        cls._server_thread = threading.Thread(target=cls._server.serve_forever, daemon=True)
+        cls._server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.shutdown()
+        cls._server.server_close()
+        httpsessions.close_all_sessions()
+
+    def _url(self, path: str) -> str:
+        return 'http://127.0.0.1:' + str(self._server.server_address[1]) + path
+
+    def _scraping_params(self, district_filter: str) -> webdatascraper.DataScrapingParams:
+        return webdatascraper.DataScrapingParams(
+            self._url('/LifeResources?district=' + district_filter), None, None, {}, ContentType.JSON,
+            {'name': 'data[*].title', 'phone': 'data[*].phone_1', 'district': 'data[*].district'},
+            {'district': district_filter}, {})
+
+    def test_asyncio_engine_returns_same_scraped_data_as_thread_pool_engine(self):
+        scraping_params = [self._scraping_params('delhi'), self._scraping_params('kolkata'),
+                           webdatascraper.DataScrapingParams(
+                               self._url('/missing'), None, None, {}, ContentType.JSON,
+                               {'name': 'data[*].name'}, {}, {})]
+
+        thread_pool_results = webdatascraper.scrape_data_from_websites(
+            scraping_params, webdatascraper.ScrapingOptions(webdatascraper.FetchEngine.THREAD_POOL))
+        asyncio_results = webdatascraper.scrape_data_from_websites(
+            scraping_params, webdatascraper.ScrapingOptions(webdatascraper.FetchEngine.ASYNCIO, 2))
+
+        self.assertEqual(len(thread_pool_results), 3)
+        self.assertIsNone(thread_pool_results[2])
+        self.assertIsNone(asyncio_results[2])
+        self.assertTrue(thread_pool_results[0].table_rows)
+        for thread_pool_result, asyncio_result in zip(thread_pool_results[:2], asyncio_results[:2]):
+            self.assertEqual(thread_pool_result.url, asyncio_result.url)
+            self.assertEqual(thread_pool_result.table_rows, asyncio_result.table_rows)
+
+    def test_parse_executor_returns_same_scraped_data_as_inline_parsing(self):
+        scraping_params = [
+            webdatascraper.DataScrapingParams(
+                self._url('/LifeResources?mapped'), None, None, {}, ContentType.JSON,
+                {'name': 'data[*].title', 'district': 'data[*].district'}, {'district': 'delhi'}, {},
+                table_rows_mapper=_UppercaseNameRowsMapper()),
+            self._scraping_params('kolkata'),
+            webdatascraper.DataScrapingParams(
+                self._url('/Covid%20Win'), None, None, {}, ContentType.JSON, {'name': 'data[*].name'}, {}, {})]
+        inline_results = webdatascraper.scrape_data_from_websites(scraping_params)
+        self.assertEqual(inline_results[0].mapped_table_rows,
+                         [{'name': row['name'].upper()} for row in inline_results[0].table_rows])
+
+        with concurrent.futures.ProcessPoolExecutor(2) as parse_executor:
+            for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+                scraping_options = webdatascraper.ScrapingOptions(fetch_engine, parse_executor=parse_executor)
+                scraped_data_list, scraping_report = webdatascraper.scrape_data_from_websites_with_report(
+                    scraping_params, scraping_options)
+
+                self.assertEqual(scraped_data_list[0].mapped_table_rows, inline_results[0].mapped_table_rows)
+                self.assertEqual([scraped_data.table_rows for scraped_data in scraped_data_list[:2]],
+                                 [scraped_data.table_rows for scraped_data in inline_results[:2]])
+                self.assertIsNone(scraped_data_list[1].mapped_table_rows)
+                # NOTE: Sample is not valid JSON, so parsing fails in worker process.
+                self.assertIsNone(scraped_data_list[2])
+                self.assertEqual(scraping_report.failed_urls, [scraping_params[2].url])
+
+    def test_stream_yields_scraped_data_in_completion_order(self):
+        slow_params = webdatascraper.DataScrapingParams(
+            self._url('/slow/LifeResources'), None, None, {}, ContentType.JSON, {'name': 'data[*].title'}, {}, {})
+        scraping_params = [slow_params, self._scraping_params('delhi'),
+                           webdatascraper.DataScrapingParams(
+                               self._url('/missing'), None, None, {}, ContentType.JSON, {'name': 'data[*].name'}, {},
+                               {})]
+
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            scraped_data_stream = webdatascraper.stream_scraped_data_from_websites(
+                scraping_params, webdatascraper.ScrapingOptions(fetch_engine))
+            streamed_urls = [scraped_data.url for scraped_data in scraped_data_stream]
+
+            self.assertEqual(streamed_urls, [scraping_params[1].url, slow_params.url])
+            self.assertIn(slow_params.url, scraped_data_stream.scraping_report.elapsed_sec_by_url)
+
+    def test_stream_yields_params_idx_of_each_scraped_data(self):
+        scraping_params = [self._scraping_params('delhi'),
+                           webdatascraper.DataScrapingParams(
+                               self._url('/missing'), None, None, {}, ContentType.JSON, {'name': 'data[*].name'}, {},
+                               {}),
+                           self._scraping_params('kolkata')]
+
+        scraped_data_stream = webdatascraper.stream_scraped_data_from_websites(scraping_params)
+        scraped_data_by_params_idx = dict(scraped_data_stream.iter_with_params_idxs())
+
+        self.assertEqual(sorted(scraped_data_by_params_idx.keys()), [0, 2])
+        for params_idx, scraped_data in scraped_data_by_params_idx.items():
+            self.assertEqual(scraped_data.url, scraping_params[params_idx].url)
+
+    def test_params_with_identical_request_share_one_request(self):
+        def shared_request_params(district_filter: str) -> webdatascraper.DataScrapingParams:
+            return webdatascraper.DataScrapingParams(
+                self._url('/LifeResources?shared'), None, None, {}, ContentType.JSON,
+                {'name': 'data[*].title', 'district': 'data[*].district'}, {'district': district_filter}, {})
+
+        scraping_params = [shared_request_params('delhi'), shared_request_params('kolkata'),
+                           shared_request_params('delhi')]
+        expected_results = [webdatascraper.scrape_data_from_websites([params])[0] for params in scraping_params]
+
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            _SampleRequestHandler.status_codes.clear()
+            scraped_data_list = webdatascraper.scrape_data_from_websites(
+                scraping_params, webdatascraper.ScrapingOptions(fetch_engine))
+
+            self.assertEqual(_SampleRequestHandler.status_codes, [200])
+            self.assertEqual([scraped_data.table_rows for scraped_data in scraped_data_list],
+                             [scraped_data.table_rows for scraped_data in expected_results])
+            self.assertNotEqual(scraped_data_list[0].table_rows, scraped_data_list[1].table_rows)
+
+    def test_host_limits_retry_throttled_request_and_back_off(self):
+        throttled_params = webdatascraper.DataScrapingParams(
+            self._url('/throttled/LifeResources'), None, None, {}, ContentType.JSON, {'name': 'data[*].title'}, {}, {})
+
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            host_limiters = hostlimits.HostLimiterRegistry(initial_concurrency=4)
+            _SampleRequestHandler.status_codes.clear()
+            _SampleRequestHandler.throttled_request_count = 0
+
+            scraped_data_list, scraping_report = webdatascraper.scrape_data_from_websites_with_report(
+                [throttled_params], webdatascraper.ScrapingOptions(fetch_engine, host_limiters=host_limiters))
+
+            self.assertEqual(_SampleRequestHandler.status_codes, [429, 200])
+            self.assertTrue(scraped_data_list[0].table_rows)
+            self.assertEqual(scraping_report.failed_urls, [])
+            self.assertEqual(host_limiters.get_host_limiter(throttled_params.url).concurrency_limit, 2)
+
+    def test_request_host_limits_would_delay_past_deadline_is_cut_off_right_away(self):
+        paused_params = webdatascraper.DataScrapingParams(
+            self._url('/LifeResources'), None, None, {}, ContentType.JSON, {'name': 'data[*].title'}, {}, {})
+
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            host_limiters = hostlimits.HostLimiterRegistry()
+            host_limiter = host_limiters.get_host_limiter(paused_params.url)
+            host_limiter.try_acquire()
+            host_limiter.release_after_response(429, 0.1, 5.0)
+            _SampleRequestHandler.status_codes.clear()
+
+            start_time = time.monotonic()
+            _, scraping_report = webdatascraper.scrape_data_from_websites_with_report(
+                [paused_params], webdatascraper.ScrapingOptions(fetch_engine, deadline_sec=2.0,
+                                                                host_limiters=host_limiters))
+
+            self.assertLess(time.monotonic() - start_time, 1.0)
+            self.assertEqual(_SampleRequestHandler.status_codes, [])
+            self.assertEqual(scraping_report.cut_off_urls, [paused_params.url])
+            self.assertEqual(scraping_report.failed_urls, [])
+
+    def test_request_slower_than_host_p90_is_hedged_within_budget(self):
+        hedged_params = webdatascraper.DataScrapingParams(
+            self._url('/hedged/LifeResources'), None, None, {}, ContentType.JSON, {'name': 'data[*].title'}, {}, {})
+        expected_results = webdatascraper.scrape_data_from_websites(
+            [webdatascraper.DataScrapingParams(
+                self._url('/LifeResources'), None, None, {}, ContentType.JSON, {'name': 'data[*].title'}, {}, {})])
+
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            _SampleRequestHandler.hedged_request_count = 0
+            latency_stats = latencystats.LatencyStatsRegistry()
+            for _ in range(hedging.RequestHedging.DEFAULT_MIN_SAMPLES):
+                latency_stats.record_latency(hedged_params.url, 0.05)
+            request_hedging = hedging.RequestHedging(budget_ratio=1.0, max_budget=1.0)
+            scraping_options = webdatascraper.ScrapingOptions(
+                fetch_engine, latency_stats=latency_stats, request_hedging=request_hedging)
+
+            start_time = time.monotonic()
+            scraped_data_list = webdatascraper.scrape_data_from_websites([hedged_params], scraping_options)
+
+            self.assertLess(time.monotonic() - start_time, 1.0)
+            self.assertEqual(scraped_data_list[0].table_rows, expected_results[0].table_rows)
+            self.assertEqual(request_hedging.get_hedge_count(hedged_params.url), 1)
+            self.assertFalse(request_hedging.try_acquire_hedge(hedged_params.url))
+
+    def test_requests_to_slower_hosts_are_launched_first(self):
+        latency_stats = latencystats.LatencyStatsRegistry()
+        latency_stats.record_latency('https://fast.org', 0.1)
+        latency_stats.record_latency('https://slow.org', 5.0)
+        latency_stats.record_latency('https://medium.org', 1.0)
+        urls = ['https://fast.org/api?city=pune', 'https://slow.org/api', 'https://fast.org/api?city=delhi',
+                'https://new.org/api', 'https://medium.org/api']
+        operation_ctx = webdatascraper.ScrapingOperationCtx([
+            webdatascraper.DataScrapingParams(url, None, None, {}, ContentType.JSON, {'name': 'data[*].name'}, {}, {})
+            for url in urls])
+
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            for latency_stats_option, expected_urls in [
+                    (latency_stats, [urls[3], urls[1], urls[4], urls[0], urls[2]]), (None, urls)]:
+                spider = webdatascraper.create_website_data_spider(
+                    operation_ctx, webdatascraper.ScrapingOptions(fetch_engine, latency_stats=latency_stats_option))
+
+                self.assertEqual([operation_ctx.get_scraping_params_for_request(request_key).url
+                                  for request_key in spider._get_request_keys_in_launch_order()], expected_urls)
+
+    def test_replayed_fixtures_give_same_scraped_data_without_network(self):
+        scraping_params = [self._scraping_params('delhi'), self._scraping_params('kolkata')]
+        unrecorded_params = self._scraping_params('mumbai')
+
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            recorded_results = webdatascraper.scrape_data_from_websites(
+                scraping_params, webdatascraper.ScrapingOptions(
+                    http_fixtures=httpfixtures.HttpFixtureStore(fixture_dir, httpfixtures.FixtureMode.RECORD)))
+
+            for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+                _SampleRequestHandler.status_codes.clear()
+                scraped_data_list, scraping_report = webdatascraper.scrape_data_from_websites_with_report(
+                    scraping_params + [unrecorded_params], webdatascraper.ScrapingOptions(
+                        fetch_engine,
+                        http_fixtures=httpfixtures.HttpFixtureStore(fixture_dir, httpfixtures.FixtureMode.REPLAY)))
+
+                self.assertEqual(_SampleRequestHandler.status_codes, [])
+                self.assertEqual([scraped_data.table_rows for scraped_data in scraped_data_list[:2]],
+                                 [scraped_data.table_rows for scraped_data in recorded_results])
+                self.assertIsNone(scraped_data_list[2])
+                self.assertEqual(scraping_report.failed_urls, [unrecorded_params.url])
+
+    def test_thread_pool_engine_reuses_pooled_connections_across_scrapes(self):
+        scraping_options = webdatascraper.ScrapingOptions(webdatascraper.FetchEngine.THREAD_POOL, 1)
+        _SampleRequestHandler.client_ports.clear()
+
+        for _ in range(3):
+            webdatascraper.scrape_data_from_websites([self._scraping_params('delhi')], scraping_options)
+
+        self.assertEqual(len(_SampleRequestHandler.client_ports), 1)
+        self.assertIs(httpsessions.get_session_for_url(self._url('/a')),
+                      httpsessions.get_session_for_url(self._url('/b?x=1')))
+
+    def test_not_modified_response_reuses_cached_scraped_data(self):
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                for response_cache in [httpcache.InMemoryResponseCacheStore(),
+                                       httpcache.DiskResponseCacheStore(cache_dir)]:
+                    scraping_options = webdatascraper.ScrapingOptions(fetch_engine, 2, response_cache)
+                    _SampleRequestHandler.status_codes.clear()
+
+                    first_results = webdatascraper.scrape_data_from_websites(
+                        [self._scraping_params('delhi')], scraping_options)
+                    second_results = webdatascraper.scrape_data_from_websites(
+                        [self._scraping_params('delhi')], scraping_options)
+                    results_with_other_filter = webdatascraper.scrape_data_from_websites(
+                        [webdatascraper.DataScrapingParams(
+                            self._url('/LifeResources?district=delhi'), None, None, {}, ContentType.JSON,
+                            {'name': 'data[*].title', 'district': 'data[*].district'}, {}, {})],
+                        scraping_options)
+
+                    self.assertEqual(_SampleRequestHandler.status_codes, [200, 304, 304])
+                    self.assertEqual(len(first_results[0].table_rows), 2)
+                    self.assertEqual(first_results[0].table_rows, second_results[0].table_rows)
+                    self.assertEqual(len(results_with_other_filter[0].table_rows), 4)
+
+    def test_same_response_content_reuses_parsed_scraped_data(self):
+        scraping_options = webdatascraper.ScrapingOptions(
+            parsed_data_cache=contentcache.ContentFingerprintCache())
+
+        first_results = webdatascraper.scrape_data_from_websites(
+            [self._scraping_params('delhi')], scraping_options)
+        second_results = webdatascraper.scrape_data_from_websites(
+            [self._scraping_params('delhi')], scraping_options)
+        results_with_other_filter = webdatascraper.scrape_data_from_websites(
+            [self._scraping_params('kolkata')], scraping_options)
+
+        self.assertIs(first_results[0], second_results[0])
+        self.assertIsNotNone(first_results[0].content_fingerprint)
+        self.assertNotEqual(first_results[0].content_fingerprint, results_with_other_filter[0].content_fingerprint)
+
+    def test_partitioned_params_share_one_parse_and_get_same_rows_as_per_filter_parse(self):
+        def partitioned_params(district_filter: str, partition_column: str) -> webdatascraper.DataScrapingParams:
+            return webdatascraper.DataScrapingParams(
+                self._url('/LifeResources?partitioned'), None, None, {}, ContentType.JSON,
+                {'name': 'data[*].title', 'phone': 'data[*].phone_1', 'district': 'data[*].district'},
+                {'district': district_filter}, {}, table_partition_column=partition_column)
+
+        district_filters = ['delhi', 'kolkata', 'mumbai', 'nowhere']
+        expected_results = webdatascraper.scrape_data_from_websites(
+            [partitioned_params(district_filter, None) for district_filter in district_filters])
+
+        with concurrent.futures.ProcessPoolExecutor(1) as parse_executor:
+            for executor in [None, parse_executor]:
+                scraping_options = webdatascraper.ScrapingOptions(
+                    parsed_data_cache=contentcache.ContentFingerprintCache(), parse_executor=executor)
+                scraped_data_list = webdatascraper.scrape_data_from_websites(
+                    [partitioned_params(district_filter, 'district') for district_filter in district_filters],
+                    scraping_options)
+
+                self.assertEqual(len(scraping_options.parsed_data_cache), 1)
+                self.assertEqual([scraped_data.table_rows for scraped_data in scraped_data_list],
+                                 [scraped_data.table_rows for scraped_data in expected_results])
+                self.assertEqual([scraped_data.content_fingerprint for scraped_data in scraped_data_list],
+                                 [scraped_data.content_fingerprint for scraped_data in expected_results])
+                self.assertTrue(scraped_data_list[0].table_rows)
+
+    def test_deadline_returns_partial_results_and_reports_cut_off_and_timed_out_sources(self):
+        for fetch_engine in [webdatascraper.FetchEngine.THREAD_POOL, webdatascraper.FetchEngine.ASYNCIO]:
+            slow_params = webdatascraper.DataScrapingParams(
+                self._url('/slow/LifeResources'), None, None, {}, ContentType.JSON,
+                {'name': 'data[*].title'}, {}, {})
+            slow_params_with_short_timeout = webdatascraper.DataScrapingParams(
+                self._url('/slow/LifeResources?timeout=short'), None, None, {}, ContentType.JSON,
+                {'name': 'data[*].title'}, {}, {}, 0.2)
+            scraping_options = webdatascraper.ScrapingOptions(fetch_engine, deadline_sec=0.7)
+
+            start_time = time.monotonic()
+            scraped_data_list, scraping_report = webdatascraper.scrape_data_from_websites_with_report(
+                [self._scraping_params('delhi'), slow_params, slow_params_with_short_timeout], scraping_options)
+
+            self.assertLess(time.monotonic() - start_time, 1.2)
+            self.assertEqual(len(scraped_data_list[0].table_rows), 2)
+            self.assertIsNone(scraped_data_list[1])
+            self.assertIsNone(scraped_data_list[2])
+            self.assertEqual(scraping_report.cut_off_urls, [slow_params.url])
+            self.assertEqual(scraping_report.timed_out_urls, [slow_params_with_short_timeout.url])
+            self.assertIn(self._scraping_params('delhi').url, scraping_report.elapsed_sec_by_url)
+
+
+class TestJSONSelectorParser(TestCase):
+    def test_compiled_jsonpath_is_shared_across_responses(self):
+        webdatascraper.compile_jsonpath.cache_clear()
+        first_parser = webdatascraper.JSONSelectorParser({'data': [{'name': 'a'}, {'name': 'b'}]})
+        second_parser = webdatascraper.JSONSelectorParser({'data': [{'name': 'c'}]})
+
+        self.assertEqual(first_parser.get_all_vals_matching_selector('data[0:].name'), ['a', 'b'])
+        self.assertEqual(second_parser.get_all_vals_matching_selector('data[0:].name'), ['c'])
+        cache_info = webdatascraper.compile_jsonpath.cache_info()
+        self.assertEqual((cache_info.misses, cache_info.hits), (1, 1))
+
+    def test_simple_selectors_match_jsonpath_ng_for_all_json_shapes(self):
+        json_content = {
+            'data': [{'name': 'a', 'phone': 1}, {'name': None}, None,
+                     {'name': 'b', 'items': [{'id': 1}, {'id': 2}, None]}],
+            'rows': [[5, 6], [7], None],
+            'result': {'items': [{'name': 'c'}], 'single': {'name': 'd'}}
+        }
+        selectors = ['data[*].name', 'data[*].phone', 'rows[*].1', 'data[*].items[*].id', 'result.items[*].name',
+                     '$.result.items[*].name', 'result.single.name', 'result.single[*].name', 'missing[*].name',
+                     'data[1:].name']
+
+        parser = webdatascraper.JSONSelectorParser(json_content)
+        vals_by_selector = parser.get_all_vals_matching_selectors(selectors)
+
+        for selector, vals in zip(selectors, vals_by_selector):
+            selector_tokens = selector.rsplit('.', 1)
+            parent_nodes = [match.value for match in
+                            webdatascraper.compile_jsonpath(selector_tokens[0]).find(json_content)]
+            expected_vals = [webdatascraper.JSONSelectorParser({})._get_str_val_of_field(
+                selector_tokens[1], parent_node) for parent_node in parent_nodes]
+            self.assertEqual(vals, expected_vals, selector)
+            self.assertEqual(
+                webdatascraper.JSONSelectorParser(json_content).get_all_vals_matching_selector(selector),
+                expected_vals, selector)
+
+    def test_root_list_selectors_match_jsonpath_ng(self):
+        json_content = [['x', 'y'], ['z']]
+        parser = webdatascraper.JSONSelectorParser(json_content)
+
+        self.assertEqual(parser.get_all_vals_matching_selectors(['[*].0', '[*].1']), [['x', 'z'], ['y', '']])
+        self.assertEqual(webdatascraper.find_simple_jsonpath_matches('[*]', json_content), json_content)
+        self.assertIsNone(webdatascraper.find_simple_jsonpath_matches('$.[*]', json_content))
+
+
+    def test_bytes_content_parses_same_as_text_content(self):
+        contents = ['var data = {"data": [{"name": "\u0938\u0947\u0935\u093e", "count": 1e400}]};',
+                    'callback([["a", 1], ["b", NaN]])', 'no json here']
+
+        for content in contents:
+            self.assertEqual(
+                webdatascraper.JSONSelectorParser.create_from_string_content(content.encode('utf-8'))._json_content,
+                webdatascraper.JSONSelectorParser.create_from_string_content(content)._json_content, content)
+
+    def test_response_content_is_decoded_with_declared_charset_or_utf8(self):
+        json_content = '{"name": "Caf\u00e9"}'
+
+        self.assertEqual(webdatascraper.decode_response_content(
+            json_content.encode('utf-8'), 'application/json', ContentType.JSON), json_content.encode('utf-8'))
+        self.assertEqual(webdatascraper.decode_response_content(
+            json_content.encode('latin-1'), 'application/json; charset=ISO-8859-1', ContentType.JSON),
+            json_content.encode('utf-8'))
+        self.assertEqual(webdatascraper.decode_response_content(
+            json_content.encode('utf-8'), 'text/html', ContentType.HTML), json_content)
+        self.assertEqual(webdatascraper.decode_response_content(
+            json_content.encode('cp1252'), 'text/html; charset="windows-1252"', ContentType.HTML), json_content)
+
+INDIA_MART_ROW_SELECTOR = '//*[@data-glid]'
+INDIA_MART_COLUMN_SELECTORS = {
+    'name': INDIA_MART_ROW_SELECTOR + "||.//*[contains(@class, 'lcname')]/a/text()",
+    'phone': INDIA_MART_ROW_SELECTOR + "||normalize-space(.//span[contains(@class, 'pns_h')])",
+    'location': INDIA_MART_ROW_SELECTOR + '||@data-location',
+    'products': INDIA_MART_ROW_SELECTOR + "||count(.//ul[contains(@class, 'slrPrdUl')])",
+    'first_product': INDIA_MART_ROW_SELECTOR + "||.//span[contains(@class, 'mListNme')]",
+    'has_price': INDIA_MART_ROW_SELECTOR + "||boolean(.//span[re:test(@class, 'getp')])",
+    'missing': INDIA_MART_ROW_SELECTOR + "||.//blink/text()",
+    'city': "//*[@data-glid]/@data-location||."
+}
+
+
+class TestHTMLSelectorParser(TestCase):
+    def test_row_oriented_extraction_matches_per_column_extraction(self):
+        parser = webdatascraper.HTMLSelectorParser(_read_sample('India Mart').decode('utf-8'))
+        selectors = list(INDIA_MART_COLUMN_SELECTORS.values())
+
+        vals_by_selector = parser.get_all_vals_matching_selectors(selectors)
+
+        self.assertEqual(len(vals_by_selector[0]), 14)
+        self.assertTrue(vals_by_selector[4][0].startswith('<span'))
+        for selector, vals in zip(selectors, vals_by_selector):
+            self.assertEqual(vals, parser.get_all_vals_matching_selector(selector), selector)
+
+    def test_scraped_table_rows_match_per_column_extraction(self):
+        content = _read_sample('India Mart').decode('utf-8')
+        scraping_params = webdatascraper.DataScrapingParams(
+            'https://indiamart.test', None, None, {}, ContentType.HTML, INDIA_MART_COLUMN_SELECTORS,
+            {'location': 'lucknow|delhi'}, {})
+        parser = webdatascraper.HTMLSelectorParser(content)
+        vals_by_column = [parser.get_all_vals_matching_selector(selector)
+                          for selector in INDIA_MART_COLUMN_SELECTORS.values()]
+        expected_table_rows = [dict(zip(INDIA_MART_COLUMN_SELECTORS.keys(), row_vals))
+                               for row_vals in zip(*vals_by_column)]
+        expected_table_rows = [row for row in expected_table_rows
+                               if row['location'].lower() in ['lucknow', 'delhi']]
+
+        scraped_data = webdatascraper.scrape_data_from_response(content, scraping_params)
+
+        self.assertGreater(len(scraped_data.table_rows), 0)
+        self.assertEqual(scraped_data.table_rows, expected_table_rows)
+
+
+class TestScrapeTableFromResponse(TestCase):
+    def test_row_filters_select_same_rows_as_unfiltered_table(self):
+        content = '{"data": [{"city": "New Delhi", "type": "Oxygen"}, {"city": "Mumbai", "type": "Oxygen"},' \
+                  ' {"city": "Dehli", "type": "Beds"}, {"city": "delhi", "type": "oxygen cylinder"}]}'
+        column_selectors = {'city': 'data[*].city', 'type': 'data[*].type'}
+        scraping_params = webdatascraper.DataScrapingParams(
+            'https://test.org', None, None, {}, ContentType.JSON, column_selectors,
+            {'city': '(delhi){e<=1}', 'type': 'oxygen'}, {})
+        unfiltered_params = webdatascraper.DataScrapingParams(
+            'https://test.org', None, None, {}, ContentType.JSON, column_selectors, {}, {})
+
+        table_rows = webdatascraper.scrape_data_from_response(content, scraping_params).table_rows
+        unfiltered_table_rows = webdatascraper.scrape_data_from_response(content, unfiltered_params).table_rows
+
+        self.assertEqual(len(unfiltered_table_rows), 4)
+        self.assertEqual(table_rows, [unfiltered_table_rows[0], unfiltered_table_rows[3]])
+        self.assertIs(scraping_params.compiled_table_row_filters, scraping_params.compiled_table_row_filters)
+
+    def test_partitioned_table_selects_same_rows_as_row_filters(self):
+        content = '{"data": [{"city": "New Delhi", "type": "Oxygen"}, {"city": "Mumbai", "type": "Oxygen"},' \
+                  ' {"city": "Dehli", "type": "Beds"}, {"city": "delhi", "type": "oxygen cylinder"},' \
+                  ' {"city": "Mumbai", "type": "Beds"}]}'
+        column_selectors = {'city': 'data[*].city', 'type': 'data[*].type'}
+        row_filters_list = [{'city': '(delhi){e<=1}', 'type': 'oxygen'}, {'city': 'mumbai'}, {'type': 'beds'}, {}]
+
+        partitioned_table = None
+        for row_filters in row_filters_list:
+            scraping_params = webdatascraper.DataScrapingParams(
+                'https://test.org', None, None, {}, ContentType.JSON, column_selectors, row_filters, {},
+                table_partition_column='city')
+            if partitioned_table is None:
+                partitioned_table = webdatascraper.partition_table_from_response(content, scraping_params, 'content')
+
+            self.assertEqual(partitioned_table.get_scraped_data(scraping_params).table_rows,
+                             webdatascraper.scrape_data_from_response(content, scraping_params).table_rows)
+        self.assertEqual(partitioned_table.partition_count, 4)
+
+    def test_row_filter_on_missing_column_raises_only_if_rows_exist(self):
+        scraping_params = webdatascraper.DataScrapingParams(
+            'https://test.org', None, None, {}, ContentType.JSON, {'city': 'data[*].city'}, {'type': 'oxygen'}, {})
+
+        self.assertEqual(webdatascraper.scrape_data_from_response('{"data": []}', scraping_params).table_rows, [])
+        with self.assertRaises(KeyError):
+            webdatascraper.scrape_data_from_response('{"data": [{"city": "Delhi"}]}', scraping_params)